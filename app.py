@@ -1,13 +1,21 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, g, Response, has_request_context
 from flask_cors import CORS
-import psycopg2
-from twilio.twiml.messaging_response import MessagingResponse
 import hashlib
 import os
-import json
+import time
 from datetime import datetime, timedelta
-import requests
-from psycopg2.extras import RealDictCursor
+
+import cube
+import dedup
+import health_probe
+import live_feed
+import metrics
+import notifications
+import priority
+import replica
+import response_cache
+import slowlog
+import storage
 
 app = Flask(__name__)
 
@@ -16,34 +24,25 @@ app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['SESSION_COOKIE_SECURE'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'None'
 
+CORS_ORIGINS = [
+    "https://i4-c-dashboard-frontend.vercel.app",
+    "http://localhost:5173"
+]
+
 CORS(
     app,
     supports_credentials=True,
-    origins=[
-        "https://i4-c-dashboard-frontend.vercel.app",
-        "http://localhost:5173"
-    ]
+    origins=CORS_ORIGINS
 )
 
-# User conversation state (in-memory)
-user_state = {}
-
-# Import configuration
-try:
-    from config import MESSAGES, FRAUD_MEDIUMS, INCIDENT_TYPES, INDIAN_STATES
-except ImportError:
-    print("⚠️ Config not imported, using basic config")
-    MESSAGES = {}
-    FRAUD_MEDIUMS = {}
-    INCIDENT_TYPES = {}
-    INDIAN_STATES = []
+# Conversation flow and state are shared with the ASGI mode (asgi_app.py)
+from conversation import render_twiml, process_message
 
 # =============================================================================
 # DATABASE
 # =============================================================================
 
-def get_db():
-    """Get database connection"""
+def get_database_url():
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise Exception("DATABASE_URL not set")
@@ -52,92 +51,92 @@ def get_db():
     if database_url.startswith("postgres://"):
         database_url = database_url.replace("postgres://", "postgresql://", 1)
     
-    return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+    return database_url
+
+def get_db():
+    """Get database connection"""
+    # psycopg2 is imported on first use so it stays off the cold-start path
+    import postgres
+    return postgres.connect(get_database_url())
+
+def recent_admin_write():
+    """Whether the logged-in admin changed a report within READ_YOUR_WRITES_SECONDS"""
+    if not has_request_context():
+        return False
+    return session.get('wrote_at', 0) > time.time() - replica.READ_YOUR_WRITES_SECONDS
+
+def note_admin_write():
+    session['wrote_at'] = time.time()
+
+def get_read_db():
+    """Connection for admin reads: the replica (DATABASE_REPLICA_URL) when it's
+    caught up and this admin hasn't just written, else the primary"""
+    return replica.connect(get_db, recent_admin_write())
 
 # =============================================================================
-# HELPER FUNCTIONS
+# INSTRUMENTATION
 # =============================================================================
 
-def generate_reference_id():
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    return f"I4C-{timestamp}"
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - started, request.method, route, response.status_code
+        )
+    return response
+
+@app.teardown_request
+def record_request_exception(exc):
+    if exc is not None:
+        metrics.EXCEPTIONS.inc("request", type(exc).__name__)
 
-def hash_evidence(text):
-    return hashlib.sha256(text.encode()).hexdigest()
+# =============================================================================
+# REPORT STORAGE
+# =============================================================================
 
-def get_message(lang, key, **kwargs):
-    lang = lang if lang in MESSAGES else 'en'
-    msg = MESSAGES.get(lang, {}).get(key, f"Message: {key}")
-    return msg.format(**kwargs) if kwargs else msg
+repository = storage.create_repository(get_db, get_read_db)
+
+@app.teardown_request
+def release_connection(exc):
+    repository.release()
 
 def save_report(data):
     """Save report to database"""
-    conn = get_db()
-    c = conn.cursor()
-    
-    reference_id = generate_reference_id()
-    
-    c.execute("""
-        INSERT INTO cyber_reports (
-            phone, location_city, location_state, language_preference,
-            fraud_medium, incident_type, incident_description,
-            suspect_phone, suspect_email, suspect_upi_id,
-            suspect_other_details, amount_involved,
-            evidence_text, evidence_hash, media_files,
-            anonymous, reference_id, status, priority,
-            consent_given, data_retention_date, created_at
-        ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        RETURNING id
-    """, (
-        data.get("phone", "ANONYMOUS"),
-        data.get("location_city"),
-        data.get("location_state"),
-        data.get("language", "en"),
-        data.get("fraud_medium"),
-        data.get("incident_type"),
-        data.get("description"),
-        data.get("suspect_phone"),
-        data.get("suspect_email"),
-        data.get("suspect_upi"),
-        data.get("suspect_other"),
-        data.get("amount", 0),
-        data.get("evidence_text"),
-        data.get("evidence_hash"),
-        json.dumps(data.get("media_files", [])),
-        data.get("anonymous", "NO"),
-        reference_id,
-        "NEW",
-        "MEDIUM",
-        1,
-        (datetime.now() + timedelta(days=365)).strftime("%Y-%m-%d"),
-        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ))
-    report_id = c.fetchone()['id']
-    conn.commit()
-    conn.close()
-    
+    signature = dedup.link(data)
+    priority.assess(data, repository)
+    reference_id = repository.save_report(data)
+    dedup.remember(reference_id, signature, data)
+    # Other workers hear about it through the live feed
+    response_cache.cache.invalidate("reports", "analytics",
+                                    f"cluster:{data['cluster_id'] or reference_id}")
     return reference_id
 
+def lookup_status(reference_id):
+    """Status row for a citizen's "status <reference ID>", through the status cache"""
+    cache = response_cache.status_cache
+    if not cache.enabled:
+        return repository.report_status(reference_id)
+    if repository.name == "postgres":
+        # Status changes made on other workers evict through LISTEN
+        live_feed.ensure_listener(get_database_url())
+    key = ("status", reference_id)
+    report = cache.get(key)
+    if report is None:
+        generation = cache.generation
+        report = repository.report_status(reference_id)
+        if report is not None:
+            cache.put(key, report, [f"report:{report['id']}"], generation)
+    return report
+
 # =============================================================================
 # WHATSAPP BOT
 # =============================================================================
-def format_state_list(page=0, per_page=10):
-    start = page * per_page
-    end = start + per_page
-    states = INDIAN_STATES[start:end]
-
-    if not states:
-        return "No more states available."
-
-    msg = "📍 *Your Location*\n\nPlease select your state:\n\n"
-
-    for i, state in enumerate(states, 1):
-        msg += f"{i}. {state}\n"
-
-    if end < len(INDIAN_STATES):
-        msg += "\nType 'more' to see more states."
-
-    return msg
 
 @app.route("/whatsapp", methods=["POST"])
 def whatsapp_bot():
@@ -145,146 +144,88 @@ def whatsapp_bot():
     msg = request.values.get("Body", "").strip()
     phone = request.values.get("From", "")
     
-    resp = MessagingResponse()
-    reply = resp.message()
-    
-    if phone not in user_state:
-        user_state[phone] = {"language": "en", "step": "welcome"}
-    
-    state = user_state[phone]
-    lang = state.get("language", "en")
-    
-    try:
-        # Welcome
-        if state.get("step") == "welcome" or msg.lower() in ["start", "hi", "hello"]:
-            print("DEBUG MESSAGE:", get_message("en", "welcome"))
-            reply.body(get_message("en", "welcome"))
-            state["step"] = "language"
-        
-        # Language
-        elif state.get("step") == "language":
-            lang_map = {"1": "en", "2": "hi", "3": "gu"}
-            msg_clean = msg.strip()
-
-            if msg_clean in lang_map:
-                state["language"] = lang_map[msg_clean]
-                lang = state["language"]
-                reply.body(get_message(lang, "consent"))
-                state["step"] = "consent"
-            else:
-                reply.body(get_message(lang, "invalid_input"))
+    reply = process_message(phone, msg, save_report, lookup_status)
+    return render_twiml(reply)
 
-        
-        # Consent
-        elif state.get("step") == "consent":
-            if msg == "1":
-                state["consent"] = True
-                reply.body(get_message(lang, "fraud_medium"))
-                state["step"] = "fraud_medium"
-            elif msg == "2":
-                reply.body("Thank you. Call 1930 for help.")
-                user_state.pop(phone, None)
-            else:
-                reply.body(get_message(lang, "invalid_input"))
-        
-        # Fraud Medium
-        elif state.get("step") == "fraud_medium":
-            if msg in FRAUD_MEDIUMS.get(lang, {}):
-                state["fraud_medium"] = FRAUD_MEDIUMS['en'][msg]
-                reply.body(get_message(lang, "incident_type"))
-                state["step"] = "incident_type"
-            else:
-                reply.body(get_message(lang, "invalid_input"))
-        
-        # Incident Type
-        elif state.get("step") == "incident_type":
-            if msg in INCIDENT_TYPES.get(lang, {}):
-                state["incident_type"] = INCIDENT_TYPES['en'][msg]
-                state["state_page"] = 0
-                reply.body(format_state_list(0))
-                state["step"] = "location_state"
-            else:
-                reply.body(get_message(lang, "invalid_input"))
-        
-        # State
-        elif state.get("step") == "location_state":
-            page = state.get("state_page", 0)
-            per_page = 10
-            start = page * per_page
-            end = start + per_page
-            current_states = INDIAN_STATES[start:end]
-        # If user typed "more"
-            if msg.lower() == "more":
-                if end >= len(INDIAN_STATES):
-                    reply.body("No more states available.")
-                else:
-                    state["state_page"] = page + 1
-                    reply.body(format_state_list(state["state_page"]))
-        # If user selected a number
-            elif msg.isdigit() and 1 <= int(msg) <= len(current_states):
-                selected_state = current_states[int(msg) - 1]
-                state["location_state"] = selected_state
-                state["state_page"] = 0
-                reply.body(get_message(lang, "location_city"))
-                state["step"] = "location_city"
-            else:
-                reply.body(get_message(lang, "invalid_input"))
-
-        # City
-        elif state.get("step") == "location_city":
-            state["location_city"] = msg.title()
-            reply.body(get_message(lang, "description"))
-            state["step"] = "description"
-        
-        # Description
-        elif state.get("step") == "description":
-            state["description"] = msg
-            state["evidence_hash"] = hash_evidence(msg)
-            reply.body(get_message(lang, "suspect_details"))
-            state["step"] = "suspect_details"
-        
-        # Suspect
-        elif state.get("step") == "suspect_details":
-            state["suspect_other"] = msg
-            reply.body(get_message(lang, "amount"))
-            state["step"] = "amount"
-        
-        # Amount
-        elif state.get("step") == "amount":
+# =============================================================================
+# ADMIN RESPONSES (shared with asgi_app.py)
+# =============================================================================
+
+def cached_json(key, compute):
+    """Serve compute() -> (payload, tags) through the response cache.
+
+    A None payload means not found and is never cached.
+    """
+    cache = response_cache.cache
+    if not cache.enabled or request.headers.get(response_cache.BYPASS_HEADER) == "1":
+        payload, _ = compute()
+        status = "BYPASS"
+    else:
+        if repository.name == "postgres":
+            # Writes from other workers invalidate through LISTEN
+            live_feed.ensure_listener(get_database_url())
+        body = cache.get(key)
+        if body is not None:
+            return Response(body, mimetype="application/json", headers={"X-Cache": "HIT"})
+        generation = cache.generation
+        payload, tags = compute()
+        status = "MISS"
+
+    if payload is None:
+        return jsonify({"error": "Not found"}), 404
+    body = app.json.dumps(payload)
+    if status == "MISS":
+        cache.put(key, body, tags, generation)
+    return Response(body, mimetype="application/json", headers={"X-Cache": status})
+
+def parse_date_range(args):
+    """from/to query args (YYYY-MM-DD, both inclusive) -> created_at bounds.
+
+    Raises ValueError on a malformed date.
+    """
+    date_from = args.get('from')
+    date_to = args.get('to')
+    if date_from:
+        date_from = datetime.strptime(date_from, "%Y-%m-%d").strftime("%Y-%m-%d")
+    if date_to:
+        # created_at holds a time too, so compare against the next day
+        date_to = (datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    return date_from, date_to
+
+def parse_cube_query(args):
+    """Cube query arguments -> Cube.query() keyword arguments.
+
+    dimensions=location_state,month groups the result; any dimension other
+    than month filters by a comma-separated list of values; from/to bound
+    the month (YYYY-MM, inclusive). Raises ValueError on bad input.
+    """
+    dimensions = [d for d in args.get('dimensions', '').split(',') if d]
+    filters = {dim: args[dim].split(',') for dim in cube.DIMENSIONS
+               if dim != "month" and args.get(dim)}
+    months = {}
+    for arg in ("from", "to"):
+        if args.get(arg):
             try:
-                state["amount"] = float(msg.replace(",", "").replace("₹", ""))
-            except:
-                state["amount"] = 0
-            reply.body(get_message(lang, "evidence"))
-            state["step"] = "evidence"
-        
-        # Evidence
-        elif state.get("step") == "evidence":
-            state["evidence_text"] = msg
-            reply.body(get_message(lang, "anonymous"))
-            state["step"] = "anonymous"
-        
-        # Anonymous
-        elif state.get("step") == "anonymous":
-            if msg in ["1", "2"]:
-                state["anonymous"] = "YES" if msg == "1" else "NO"
-                state["phone"] = "ANONYMOUS" if msg == "1" else phone
-                
-                reference_id = save_report(state)
-                reply.body(get_message(lang, "confirmation", reference_id=reference_id))
-                user_state.pop(phone, None)
-            else:
-                reply.body(get_message(lang, "invalid_input"))
-        
-        else:
-            reply.body(get_message(lang, "welcome"))
-            state["step"] = "welcome"
-    
-    except Exception as e:
-        print(f"Error: {e}")
-        reply.body("Error occurred. Please try again or call 1930.")
-    
-    return str(resp)
+                months[f"month_{arg}"] = datetime.strptime(args[arg], "%Y-%m").strftime("%Y-%m")
+            except ValueError:
+                raise ValueError("from/to must be YYYY-MM")
+    return {"dimensions": dimensions, "filters": filters, "sort": args.get('sort', 'count'),
+            "limit": int(args.get('limit', 100)), **months}
+
+def triage_page(reports, status):
+    """Triage queue response; reports are highest priority, then oldest, first"""
+    reports = [dict(r) for r in reports]
+    return {"status": status, "reports": reports,
+            "levels": [level for level, _ in priority.rules.levels], "count": len(reports)}
+
+def reports_page(reports, total, page, per_page):
+    return {
+        "reports": [dict(r) for r in reports],
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total + per_page - 1) // per_page
+    }
 
 # =============================================================================
 # ADMIN API
@@ -301,14 +242,7 @@ def admin_login():
     
     password_hash = hashlib.sha256(password.encode()).hexdigest()
     
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("""
-        SELECT * FROM admin_users 
-        WHERE username = %s AND password_hash = %s AND is_active = 1
-    """, (username, password_hash))
-    admin = c.fetchone()
-    conn.close()
+    admin = repository.authenticate_admin(username, password_hash)
     
     if admin:
         session['admin_id'] = admin['id']
@@ -339,28 +273,17 @@ def get_reports():
     
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 20))
+    try:
+        date_from, date_to = parse_date_range(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
     
-    conn = get_db()
-    c = conn.cursor()
-    
-    c.execute("SELECT COUNT(*) as count FROM cyber_reports")
-    total = c.fetchone()['count']
-    
-    c.execute("""
-        SELECT * FROM cyber_reports 
-        ORDER BY created_at DESC 
-        LIMIT %s OFFSET %s
-    """, (per_page, (page - 1) * per_page))
-    reports = c.fetchall()
-    conn.close()
-    
-    return jsonify({
-        "reports": [dict(r) for r in reports],
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": (total + per_page - 1) // per_page
-    })
+    def compute():
+        reports, total = repository.list_reports(page, per_page, date_from, date_to)
+        tags = ["reports"] + response_cache.report_tags(reports)
+        return reports_page(reports, total, page, per_page), tags
+
+    return cached_json(("reports", page, per_page, date_from, date_to), compute)
 
 @app.route("/api/admin/reports/<int:report_id>", methods=["GET"])
 def get_report_details(report_id):
@@ -368,31 +291,14 @@ def get_report_details(report_id):
     if 'admin_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
-    conn = get_db()
-    c = conn.cursor()
-
-    c.execute("SELECT * FROM cyber_reports WHERE id = %s", (report_id,))
-    report = c.fetchone()
-
-    if not report:
-        conn.close()
-        return jsonify({"error": "Not found"}), 404
-
-    c.execute("""
-        SELECT cn.*, au.username, au.full_name
-        FROM case_notes cn
-        JOIN admin_users au ON cn.admin_id = au.id
-        WHERE cn.report_id = %s
-        ORDER BY cn.created_at DESC
-    """, (report_id,))
-    notes = c.fetchall()
+    def compute():
+        report, notes = repository.get_report(report_id)
+        if not report:
+            return None, ()
+        tags = [f"report:{report_id}", f"cluster:{report['cluster_id']}"]
+        return {"report": report, "notes": notes}, tags
 
-    conn.close()
-
-    return jsonify({
-        "report": dict(report),
-        "notes": [dict(n) for n in notes]
-    })
+    return cached_json(("report", report_id), compute)
 
 @app.route("/api/admin/reports/<int:report_id>/status", methods=["PUT", "OPTIONS"])
 def update_report_status(report_id):
@@ -411,115 +317,277 @@ def update_report_status(report_id):
     if not new_status:
         return jsonify({"error": "Status required"}), 400
 
-    conn = get_db()
-    c = conn.cursor()
+    if not repository.update_status(report_id, new_status, priority):
+        return jsonify({"error": "Not found"}), 404
+    note_admin_write()
 
-    # Check report exists
-    c.execute("SELECT * FROM cyber_reports WHERE id = %s", (report_id,))
-    report = c.fetchone()
+    response_cache.cache.invalidate(*response_cache.updated_report_tags(report_id))
+    response_cache.status_cache.invalidate(f"report:{report_id}")
+    # Tell the citizen about escalations and resolutions (sent in the background)
+    notifications.queue(repository, report_id, new_status)
 
-    if not report:
-        conn.close()
-        return jsonify({"error": "Not found"}), 404
+    return jsonify({"success": True, "status": new_status})
 
-    # UPDATE REPORT
-    updates = ["status = %s", "updated_at = NOW()"]
-    params = [new_status]
+@app.route("/api/admin/analytics/overview", methods=["GET"])
+def get_analytics():
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    try:
+        date_from, date_to = parse_date_range(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
 
-    if priority:
-        updates.append("priority = %s")
-        params.append(priority)
+    return cached_json(("analytics", date_from, date_to),
+                       lambda: (repository.analytics(date_from, date_to), ["analytics"]))
 
-    if new_status == "RESOLVED":
-        updates.append("resolved_at = NOW()")
+@app.route("/api/admin/analytics/cube", methods=["GET"])
+def get_analytics_cube():
+    """Counts and rupee totals sliced by any of cube.DIMENSIONS"""
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
 
-    params.append(report_id)
+    if repository.name == "postgres":
+        # The cube stays current from report events
+        live_feed.ensure_listener(get_database_url())
 
-    c.execute(
-        f"UPDATE cyber_reports SET {', '.join(updates)} WHERE id = %s",
-        params
-    )
+    try:
+        return jsonify(cube.get_cube(repository).query(**parse_cube_query(request.args)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    conn.commit()
-    conn.close()
+@app.route("/api/admin/triage", methods=["GET"])
+def get_triage():
+    """Reports to work next: highest priority level first, oldest first within it"""
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
 
-    return jsonify({"success": True, "status": new_status})
+    status = request.args.get('status', 'NEW')
+    limit = min(int(request.args.get('limit', 50)), 500)
 
-@app.route("/api/admin/analytics/overview", methods=["GET"])
-def get_analytics():
+    def compute():
+        levels = [level for level, _ in priority.rules.levels]
+        reports = repository.triage(levels, status, limit)
+        return triage_page(reports, status), ["reports", "triage"] + response_cache.report_tags(reports)
+
+    return cached_json(("triage", status, limit), compute)
+
+@app.route("/api/admin/queue", methods=["GET"])
+def get_work_queue():
+    """Open reports per priority level: unassigned, under a live claim, or
+    with an expired claim (next in line to be reclaimed)"""
     if 'admin_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
-    
-    conn = get_db()
-    c = conn.cursor()
-    
-    c.execute("SELECT COUNT(*) as count FROM cyber_reports")
-    total = c.fetchone()['count']
-    
-    c.execute("""
-        SELECT status, COUNT(*) as count 
-        FROM cyber_reports GROUP BY status
-    """)
-    status_breakdown = c.fetchall()
-    
-    c.execute("""
-        SELECT fraud_medium, COUNT(*) as count 
-        FROM cyber_reports 
-        GROUP BY fraud_medium ORDER BY count DESC
-    """)
-    fraud_breakdown = c.fetchall()
-    
-    c.execute("""
-        SELECT COALESCE(SUM(amount_involved), 0) as total 
-        FROM cyber_reports
-    """)
-    total_amount = c.fetchone()['total']
-    # STATE BREAKDOWN (Top 5)
-    c.execute("""
-        SELECT location_state, COUNT(*) as count
-        FROM cyber_reports
-        WHERE location_state IS NOT NULL
-        GROUP BY location_state
-        ORDER BY count DESC
-        LIMIT 5
-    """)
-    state_breakdown = c.fetchall()
-    conn.close()
-    
-    return jsonify({
-        "total_reports": total,
-        "status_breakdown": [dict(r) for r in status_breakdown],
-        "fraud_medium_breakdown": [dict(r) for r in fraud_breakdown],
-        "state_breakdown": [dict(r) for r in state_breakdown],
-        "daily_trend": [],
-        "total_amount_involved": float(total_amount)
-    })
+
+    stats = {row['priority']: row for row in repository.queue_stats()}
+    levels = []
+    for level, _ in priority.rules.levels:
+        row = stats.get(level) or {}
+        levels.append({"priority": level, **{key: int(row.get(key) or 0)
+                                             for key in ("unassigned", "claimed", "expired")}})
+    return jsonify({"levels": levels,
+                    "lease_minutes": int(storage.CLAIM_LEASE.total_seconds() // 60)})
+
+@app.route("/api/admin/queue/claim", methods=["POST", "OPTIONS"])
+def claim_next_case():
+    """Assign the next report to the logged-in analyst for CLAIM_LEASE_MINUTES"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    levels = [level for level, _ in priority.rules.levels]
+    report = repository.claim_next(levels, session['admin_username'])
+    if report is None:
+        return jsonify({"error": "No open reports"}), 404
+    note_admin_write()
+
+    response_cache.cache.invalidate(*response_cache.updated_report_tags(report['id']))
+    return jsonify({"report": report, "claim_expires_at": report['claim_expires_at']})
+
+@app.route("/api/admin/reports/<int:report_id>/claim", methods=["PUT", "DELETE", "OPTIONS"])
+def update_claim(report_id):
+    """PUT renews the analyst's lease on a report, DELETE hands it back"""
+    if request.method == "OPTIONS":
+        return '', 200
+
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    analyst = session['admin_username']
+    note_admin_write()
+    if request.method == "PUT":
+        expires = repository.renew_claim(report_id, analyst)
+        if expires is None:
+            return jsonify({"error": "Report is not claimed by you"}), 409
+        return jsonify({"success": True, "claim_expires_at": expires})
+
+    if not repository.release_claim(report_id, analyst):
+        return jsonify({"error": "Report is not claimed by you"}), 409
+    response_cache.cache.invalidate(*response_cache.updated_report_tags(report_id))
+    return jsonify({"success": True})
+
+@app.route("/api/admin/clusters", methods=["GET"])
+def get_clusters():
+    """Near-duplicate clusters, largest first"""
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    min_size = int(request.args.get('min_size', 2))
+    limit = min(int(request.args.get('limit', 50)), 500)
+    try:
+        date_from, date_to = parse_date_range(request.args)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
+    def compute():
+        clusters = repository.clusters(min_size, limit, date_from, date_to)
+        return {"clusters": clusters}, ["reports", "clusters"]
+
+    return cached_json(("clusters", min_size, limit, date_from, date_to), compute)
+
+@app.route("/api/admin/clusters/<cluster_id>", methods=["GET"])
+def get_cluster_reports(cluster_id):
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    limit = min(int(request.args.get('limit', 200)), 1000)
+
+    def compute():
+        reports = repository.cluster_reports(cluster_id, limit)
+        if not reports:
+            return None, ()
+        payload = {"cluster_id": cluster_id, "reports": reports}
+        return payload, [f"cluster:{cluster_id}"] + response_cache.report_tags(reports)
+
+    return cached_json(("cluster", cluster_id, limit), compute)
+
+@app.route("/api/admin/events", methods=["GET"])
+def live_events():
+    """Server-sent events: report_created, report_updated and reset"""
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if repository.name == "postgres":
+        live_feed.ensure_listener(get_database_url())
+
+    # EventSource sends Last-Event-ID itself when it reconnects
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    return Response(live_feed.stream(last_event_id), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/admin/cache", methods=["GET"])
+def get_cache_stats():
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify(response_cache.cache.stats())
+
+@app.route("/api/admin/cache", methods=["DELETE"])
+def clear_cache():
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    response_cache.cache.clear()
+    return jsonify({"success": True})
+
+@app.route("/api/admin/slow-queries", methods=["GET"])
+def get_slow_queries():
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    limit = int(request.args.get('limit', 20))
+    order_by = request.args.get('order_by', 'total_ms')
+    return jsonify(slowlog.snapshot(limit, order_by))
+
+@app.route("/api/admin/slow-queries", methods=["DELETE"])
+def reset_slow_queries():
+    if 'admin_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    slowlog.reset()
+    return jsonify({"success": True})
 
 # =============================================================================
 # HEALTH
 # =============================================================================
 
+def check_database():
+    detail = repository.ping() or {}
+    return {"backend": repository.name,
+            "connections_open": metrics.DB_CONNECTIONS_OPEN.value(), **detail}
+
+health_probe.register_check("database", check_database)
+
+if repository.name == "postgres":
+    import partitions
+    # Also creates upcoming monthly partitions, at most once an hour
+    health_probe.register_check("partitions", lambda: partitions.check(get_db), critical=False)
+
+health_probe.register_check("dedup", dedup.check, critical=False)
+health_probe.register_check("notifications", lambda: notifications.check(repository), critical=False)
+
+if repository.name == "postgres" and replica.configured():
+    # Reads fall back to the primary while this fails
+    health_probe.register_check("replica", replica.check, critical=False)
+    replica.ensure_started()
+
+# Start probing at import instead of on the first request: the first probe
+# loads the database driver and opens a connection in the background, so
+# the first webhook after a cold start doesn't pay for it
+health_probe.ensure_started()
+dedup.ensure_loaded(repository)
+notifications.ensure_started(repository)
+
+@app.before_request
+def start_health_prober():
+    health_probe.ensure_started()
+    dedup.ensure_loaded(repository)
+    notifications.ensure_started(repository)
+
 @app.route("/health", methods=["GET"])
 def health():
-    try:
-        conn = get_db()
-        conn.close()
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+    snapshot = health_probe.snapshot()
+    if snapshot is None:
+        db_status = "pending"
+    else:
+        db = snapshot["checks"].get("database", {})
+        db_status = "connected" if db.get("ok") else f"error: {db.get('error')}"
     
     return jsonify({
         "status": "healthy",
         "database": db_status,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "probe": snapshot
     })
 
+@app.route("/health/live", methods=["GET"])
+def health_live():
+    return jsonify({"status": "alive", "uptime_seconds": health_probe.uptime_seconds()})
+
+@app.route("/health/ready", methods=["GET"])
+def health_ready():
+    snapshot = health_probe.snapshot()
+    if snapshot is None:
+        return jsonify({"status": "starting"}), 503
+    ready = snapshot["ready"] and not snapshot["stale"]
+    return jsonify({"status": "ready" if ready else "not_ready", **snapshot}), 200 if ready else 503
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({
         "service": "I4C Cyber Reporting Bot",
         "status": "running",
-        "endpoints": ["/whatsapp", "/health", "/api/admin/login"]
+        "endpoints": ["/whatsapp", "/health", "/health/live", "/health/ready",
+                      "/metrics", "/api/admin/login"]
     })
 
 if __name__ == "__main__":
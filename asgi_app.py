@@ -0,0 +1,529 @@
+"""
+Asyncio (ASGI) serving mode for the WhatsApp webhook and read-only admin API.
+
+Shares the conversation flow, message catalog, SQL and session cookie with
+the Flask app, but talks to Postgres through an async connection pool so an
+in-flight webhook no longer pins a worker thread. Login, status updates and
+work queue claims stay on the Flask app; a session cookie issued there is
+accepted here.
+
+Requires: pip install "psycopg[binary,pool]" uvicorn
+Run:      uvicorn asgi_app:app --port 8000
+Compare:  python bench_webhook.py --url http://localhost:8000/whatsapp
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from itsdangerous import BadSignature
+
+import app as flask_app
+import conversation
+import cube
+import dedup
+import health_probe
+import live_feed
+import metrics
+import notifications
+import priority
+import replica
+import response_cache
+import storage
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    AsyncConnectionPool = None
+
+pool = None
+replica_pool = None
+
+# =============================================================================
+# DATABASE
+# =============================================================================
+
+async def open_pool():
+    global pool
+    if AsyncConnectionPool is None:
+        raise RuntimeError('ASGI mode needs psycopg 3: pip install "psycopg[binary,pool]"')
+
+    pool = AsyncConnectionPool(
+        flask_app.get_database_url(),
+        min_size=int(os.getenv("ASYNC_POOL_MIN", 2)),
+        max_size=int(os.getenv("ASYNC_POOL_MAX", 20)),
+        kwargs={"row_factory": dict_row},
+        open=False,
+    )
+    await pool.open()
+    health_probe.register_check("async_pool", pool_stats)
+
+    global replica_pool
+    if replica.configured():
+        replica_pool = AsyncConnectionPool(
+            replica.database_url(),
+            min_size=replica.POOL_MIN,
+            max_size=replica.POOL_MAX,
+            kwargs={"row_factory": dict_row},
+            open=False,
+        )
+        # Don't wait for the replica: reads use the primary until it's caught up
+        await replica_pool.open(wait=False)
+        replica.ensure_started()
+
+def pool_stats():
+    if pool is None or pool.closed:
+        raise RuntimeError("async pool not open")
+    stats = pool.get_stats()
+    return {
+        "pool_size": stats.get("pool_size", 0),
+        "pool_available": stats.get("pool_available", 0),
+        "requests_waiting": stats.get("requests_waiting", 0),
+    }
+
+def read_pool(req):
+    """The replica pool for an admin read when replica.use_replica() allows,
+    else the primary pool"""
+    if replica_pool is None:
+        return pool
+    recent_write = req.session.get('wrote_at', 0) > time.time() - replica.READ_YOUR_WRITES_SECONDS
+    return replica_pool if replica.use_replica(recent_write) else pool
+
+async def run_queries(queries, target=None):
+    """Run [(sql, params)] on one connection from target (default: the
+    primary pool); returns the rows of each.
+
+    The pool commits when the connection is returned without an error.
+    """
+    results = []
+    async with (target or pool).connection() as conn:
+        for sql, params in queries:
+            started = time.perf_counter()
+            cur = await conn.execute(sql, params)
+            rows = await cur.fetchall() if cur.description else []
+            statement = metrics.normalize_sql(sql)
+            metrics.QUERY_LATENCY.observe(time.perf_counter() - started, statement)
+            metrics.QUERY_ROWS.observe(max(cur.rowcount, 0), statement)
+            results.append(rows)
+    return results
+
+async def save_report(data):
+    """Save report to database"""
+    signature = dedup.link(data)
+    record = priority.prepare(data)
+    queries = priority.signal_queries(record)
+    rows = await run_queries(list(queries.values())) if queries else []
+    priority.apply(data, record, {name: r[0]['count'] for name, r in zip(queries, rows)})
+    reference_id = conversation.generate_reference_id()
+    params = storage.report_insert_params(data, reference_id)
+    await run_queries([(storage.INSERT_REPORT_SQL, params)])
+    dedup.remember(reference_id, signature, data)
+    response_cache.cache.invalidate("reports", "analytics",
+                                    f"cluster:{data['cluster_id'] or reference_id}")
+    return reference_id
+
+async def lookup_status(reference_id):
+    """Status row for a citizen's "status <reference ID>", through the status cache"""
+    query = storage.report_status_query(reference_id)
+    if query is None:
+        return None
+    cache = response_cache.status_cache
+    key = ("status", reference_id)
+    report = cache.get(key) if cache.enabled else None
+    if report is None:
+        # Status changes made on other workers evict through LISTEN
+        live_feed.ensure_listener(flask_app.get_database_url())
+        generation = cache.generation
+        (rows,) = await run_queries([query])
+        report = dict(rows[0]) if rows else None
+        if report is not None and cache.enabled:
+            cache.put(key, report, [f"report:{report['id']}"], generation)
+    return report
+
+# =============================================================================
+# REQUEST HELPERS
+# =============================================================================
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope["method"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1")
+                        for k, v in scope.get("headers", [])}
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.body = body
+        self.path_params = {}
+        self.response_headers = []
+
+    @property
+    def values(self):
+        """Query string and form fields merged, like Flask's request.values"""
+        form = {}
+        if self.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+            form = dict(parse_qsl(self.body.decode("utf-8", "replace"), keep_blank_values=True))
+        return {**self.args, **form}
+
+    @property
+    def session(self):
+        """Decode the Flask session cookie so admin logins carry over"""
+        cookie = SimpleCookie(self.headers.get("cookie", ""))
+        name = flask_app.app.config["SESSION_COOKIE_NAME"]
+        if name not in cookie:
+            return {}
+        serializer = flask_app.app.session_interface.get_signing_serializer(flask_app.app)
+        max_age = int(flask_app.app.permanent_session_lifetime.total_seconds())
+        try:
+            return serializer.loads(cookie[name].value, max_age=max_age)
+        except BadSignature:
+            return {}
+
+def json_response(payload, status=200):
+    body = json.dumps(payload, default=str).encode()
+    return status, body, "application/json"
+
+def unauthorized():
+    return json_response({"error": "Unauthorized"}, 401)
+
+async def cached_json(req, key, compute):
+    """Async twin of app.cached_json: awaits compute() -> (payload, tags)"""
+    cache = response_cache.cache
+    if not cache.enabled or req.headers.get(response_cache.BYPASS_HEADER.lower()) == "1":
+        payload, _ = await compute()
+        status = "BYPASS"
+    else:
+        live_feed.ensure_listener(flask_app.get_database_url())
+        body = cache.get(key)
+        if body is not None:
+            req.response_headers.append((b"x-cache", b"HIT"))
+            return 200, body, "application/json"
+        generation = cache.generation
+        payload, tags = await compute()
+        status = "MISS"
+
+    if payload is None:
+        return json_response({"error": "Not found"}, 404)
+    _, body, content_type = json_response(payload)
+    if status == "MISS":
+        cache.put(key, body, tags, generation)
+    req.response_headers.append((b"x-cache", status.encode()))
+    return 200, body, content_type
+
+# =============================================================================
+# HANDLERS
+# =============================================================================
+
+async def whatsapp_bot(req):
+    """WhatsApp webhook"""
+    values = req.values
+    msg = values.get("Body", "").strip()
+    phone = values.get("From", "")
+
+    reply = await conversation.process_message_async(phone, msg, save_report, lookup_status)
+    return 200, conversation.render_twiml(reply).encode(), "application/xml"
+
+async def get_reports(req):
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    page = int(req.args.get('page', 1))
+    per_page = int(req.args.get('per_page', 20))
+    try:
+        date_from, date_to = flask_app.parse_date_range(req.args)
+    except ValueError:
+        return json_response({"error": "Dates must be YYYY-MM-DD"}, 400)
+
+    async def compute():
+        total_rows, reports = await run_queries(
+            storage.report_list_queries(page, per_page, date_from, date_to), read_pool(req))
+        total = total_rows[0]['count']
+        tags = ["reports"] + response_cache.report_tags(reports)
+        return flask_app.reports_page(reports, total, page, per_page), tags
+
+    return await cached_json(req, ("reports", page, per_page, date_from, date_to), compute)
+
+async def get_report_details(req):
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    report_id = int(req.path_params["report_id"])
+
+    async def compute():
+        report_rows, notes, cluster_size = await run_queries([
+            (storage.REPORT_BY_ID_SQL, (report_id,)),
+            (storage.REPORT_NOTES_SQL, (report_id,)),
+            (storage.CLUSTER_SIZE_SQL, (report_id,)),
+        ], read_pool(req))
+        if not report_rows:
+            return None, ()
+        report = dict(report_rows[0], cluster_size=cluster_size[0]['count'])
+        payload = {"report": report, "notes": [dict(n) for n in notes]}
+        return payload, [f"report:{report_id}", f"cluster:{report['cluster_id']}"]
+
+    return await cached_json(req, ("report", report_id), compute)
+
+async def get_analytics(req):
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    try:
+        date_from, date_to = flask_app.parse_date_range(req.args)
+    except ValueError:
+        return json_response({"error": "Dates must be YYYY-MM-DD"}, 400)
+
+    async def compute():
+        queries = storage.analytics_queries(date_from, date_to)
+        rows = await run_queries(list(queries.values()), read_pool(req))
+        return storage.analytics_overview(dict(zip(queries, rows))), ["analytics"]
+
+    return await cached_json(req, ("analytics", date_from, date_to), compute)
+
+async def get_analytics_cube(req):
+    """Counts and rupee totals sliced by any of cube.DIMENSIONS"""
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    live_feed.ensure_listener(flask_app.get_database_url())
+    try:
+        query = flask_app.parse_cube_query(req.args)
+        # Refreshes query Postgres through the sync repository; keep them off the loop
+        result = await asyncio.to_thread(cube.get_cube(flask_app.repository).query, **query)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    return json_response(result)
+
+async def get_triage(req):
+    """Reports to work next: highest priority level first, oldest first within it"""
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    status = req.args.get('status', 'NEW')
+    limit = min(int(req.args.get('limit', 50)), 500)
+
+    async def compute():
+        # One pool checkout: each level is an index range scan of at most `limit` rows
+        levels = await run_queries([(storage.TRIAGE_SQL, (level, status, limit))
+                                    for level, _ in priority.rules.levels], read_pool(req))
+        reports = [r for rows in levels for r in rows][:limit]
+        tags = ["reports", "triage"] + response_cache.report_tags(reports)
+        return flask_app.triage_page(reports, status), tags
+
+    return await cached_json(req, ("triage", status, limit), compute)
+
+async def get_clusters(req):
+    """Near-duplicate clusters, largest first"""
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    min_size = int(req.args.get('min_size', 2))
+    limit = min(int(req.args.get('limit', 50)), 500)
+    try:
+        date_from, date_to = flask_app.parse_date_range(req.args)
+    except ValueError:
+        return json_response({"error": "Dates must be YYYY-MM-DD"}, 400)
+
+    async def compute():
+        (clusters,) = await run_queries([storage.cluster_query(min_size, limit, date_from, date_to)],
+                                        read_pool(req))
+        return {"clusters": clusters}, ["reports", "clusters"]
+
+    return await cached_json(req, ("clusters", min_size, limit, date_from, date_to), compute)
+
+async def get_cluster_reports(req):
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    cluster_id = req.path_params["cluster_id"]
+    limit = min(int(req.args.get('limit', 200)), 1000)
+
+    async def compute():
+        (reports,) = await run_queries([(storage.CLUSTER_REPORTS_SQL, (cluster_id, limit))],
+                                       read_pool(req))
+        if not reports:
+            return None, ()
+        payload = {"cluster_id": cluster_id, "reports": reports}
+        return payload, [f"cluster:{cluster_id}"] + response_cache.report_tags(reports)
+
+    return await cached_json(req, ("cluster", cluster_id, limit), compute)
+
+async def live_events(req):
+    """Server-sent events: report_created, report_updated and reset"""
+    if 'admin_id' not in req.session:
+        return unauthorized()
+
+    # ASGI mode always runs on Postgres, so events arrive through LISTEN
+    live_feed.ensure_listener(flask_app.get_database_url())
+    last_event_id = req.headers.get("last-event-id") or req.args.get("last_event_id")
+    return 200, live_feed.stream_async(last_event_id), "text/event-stream"
+
+async def health_live(req):
+    return json_response({"status": "alive", "uptime_seconds": health_probe.uptime_seconds()})
+
+async def health_ready(req):
+    snapshot = health_probe.snapshot()
+    if snapshot is None:
+        return json_response({"status": "starting"}, 503)
+    ready = snapshot["ready"] and not snapshot["stale"]
+    return json_response({"status": "ready" if ready else "not_ready", **snapshot},
+                         200 if ready else 503)
+
+async def metrics_endpoint(req):
+    token = os.getenv("METRICS_TOKEN")
+    if token and req.headers.get("authorization") != f"Bearer {token}":
+        return unauthorized()
+    return 200, metrics.render().encode(), "text/plain; version=0.0.4"
+
+ROUTES = [
+    ("POST", "/whatsapp", whatsapp_bot),
+    ("GET", "/api/admin/reports", get_reports),
+    ("GET", "/api/admin/reports/<int:report_id>", get_report_details),
+    ("GET", "/api/admin/analytics/overview", get_analytics),
+    ("GET", "/api/admin/analytics/cube", get_analytics_cube),
+    ("GET", "/api/admin/triage", get_triage),
+    ("GET", "/api/admin/clusters", get_clusters),
+    ("GET", "/api/admin/clusters/<cluster_id>", get_cluster_reports),
+    ("GET", "/api/admin/events", live_events),
+    ("GET", "/health/live", health_live),
+    ("GET", "/health/ready", health_ready),
+    ("GET", "/metrics", metrics_endpoint),
+]
+
+def _compile(rule):
+    pattern = re.sub(r"<int:(\w+)>", r"(?P<\1>\\d+)", rule)
+    pattern = re.sub(r"(?<!\?P)<(\w+)>", r"(?P<\1>[^/]+)", pattern)
+    return re.compile(f"^{pattern}$")
+
+_ROUTE_TABLE = [(method, _compile(rule), rule, handler) for method, rule, handler in ROUTES]
+
+def resolve(method, path):
+    """Returns (handler, rule, path_params); handler is None when unmatched"""
+    path_matched = False
+    for route_method, pattern, rule, handler in _ROUTE_TABLE:
+        match = pattern.match(path)
+        if match:
+            path_matched = True
+            if route_method == method:
+                return handler, rule, match.groupdict()
+    return None, "unmatched" if not path_matched else "method_not_allowed", {}
+
+# =============================================================================
+# ASGI ENTRY POINT
+# =============================================================================
+
+def cors_headers(req):
+    origin = req.headers.get("origin")
+    if origin not in flask_app.CORS_ORIGINS:
+        return []
+    return [
+        (b"access-control-allow-origin", origin.encode()),
+        (b"access-control-allow-credentials", b"true"),
+        (b"vary", b"Origin"),
+    ]
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await open_pool()
+                health_probe.ensure_started()
+                dedup.ensure_loaded(flask_app.repository)
+                notifications.ensure_started(flask_app.repository)
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if pool is not None:
+                await pool.close()
+            if replica_pool is not None:
+                await replica_pool.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+async def stream_body(receive, send, chunks):
+    """Send an async iterator of str chunks until it ends or the client leaves"""
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        async for chunk in chunks:
+            if disconnected.done():
+                break
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        await chunks.aclose()
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    started = time.perf_counter()
+    req = Request(scope, await read_body(receive))
+    extra_headers = cors_headers(req)
+
+    if req.method == "OPTIONS":
+        status, body, content_type = 200, b"", "text/plain"
+        extra_headers += [
+            (b"access-control-allow-methods", b"GET, POST, PUT, OPTIONS"),
+            (b"access-control-allow-headers",
+             req.headers.get("access-control-request-headers", "content-type").encode()),
+        ]
+        rule = "preflight"
+    else:
+        handler, rule, req.path_params = resolve(req.method, scope["path"])
+        if handler is None:
+            status, body, content_type = json_response(
+                {"error": "Not found" if rule == "unmatched" else "Method not allowed"},
+                404 if rule == "unmatched" else 405)
+        else:
+            try:
+                status, body, content_type = await handler(req)
+            except Exception as e:
+                print(f"Error: {e}")
+                metrics.EXCEPTIONS.inc("request", type(e).__name__)
+                status, body, content_type = json_response({"error": "Internal server error"}, 500)
+
+    if not isinstance(body, bytes):
+        # Streaming response (server-sent events); latency is time to headers
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode()),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ] + extra_headers,
+        })
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, req.method, rule, status)
+        await stream_body(receive, send, body)
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ] + extra_headers + req.response_headers,
+    })
+    await send({"type": "http.response.body", "body": body})
+    metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, req.method, rule, status)
@@ -0,0 +1,391 @@
+"""
+Synthetic data generator and query benchmark for the admin endpoints.
+
+Seeds cyber_reports/case_notes with realistic synthetic rows using COPY,
+then times the admin API (deep report pages, analytics, report detail,
+status updates) and captures EXPLAIN plans for the statements behind them.
+
+Run against a scratch database, status updates modify rows:
+    DATABASE_URL=postgresql://... python bench_admin.py seed --rows 2000000
+    DATABASE_URL=postgresql://... python bench_admin.py run --save bench_results/admin.json
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import partitions
+from config import FRAUD_MEDIUMS, INCIDENT_TYPES, INDIAN_STATES
+
+REPORT_COLUMNS = [
+    "phone", "location_city", "location_state", "language_preference",
+    "fraud_medium", "incident_type", "incident_description",
+    "suspect_phone", "suspect_email", "suspect_upi_id", "suspect_other_details",
+    "amount_involved", "evidence_text", "evidence_hash", "media_files",
+    "anonymous", "reference_id", "status", "priority", "assigned_to",
+    "created_at", "updated_at", "resolved_at", "consent_given", "data_retention_date",
+]
+NOTE_COLUMNS = ["report_id", "admin_id", "note", "note_type", "created_at"]
+
+STATUS_WEIGHTS = {"NEW": 45, "IN_PROGRESS": 25, "ESCALATED": 8, "RESOLVED": 17, "CLOSED": 5}
+PRIORITY_WEIGHTS = {"LOW": 20, "MEDIUM": 55, "HIGH": 20, "CRITICAL": 5}
+LANGUAGE_WEIGHTS = {"en": 60, "hi": 30, "gu": 10}
+NOTE_TYPES = ["COMMENT", "COMMENT", "COMMENT", "STATUS_UPDATE", "ESCALATION"]
+CITIES = ["Ahmedabad", "Surat", "Pune", "Mumbai", "Lucknow", "Patna", "Jaipur",
+          "Bengaluru", "Chennai", "Kolkata", "Bhopal", "Indore", "Guwahati", "Delhi"]
+SCAM_TEXTS = [
+    "Caller posing as bank official asked for OTP to unblock my card",
+    "Received link on WhatsApp for electricity bill payment, money debited",
+    "Fake job offer asked for registration fee via UPI",
+    "Investment group promised 30% monthly returns, cannot withdraw",
+    "Someone created a fake profile with my photos and asks friends for money",
+    "Courier scam call saying parcel contains drugs, demanded payment",
+]
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def cumulative(weights):
+    total, out = 0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+class ReportGenerator:
+    """Produces synthetic report rows with skewed, config-driven distributions"""
+
+    def __init__(self, seed=1930, days=730):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.now = datetime.now()
+
+        # Zipf-like state skew: a few states file most complaints
+        states = list(INDIAN_STATES)
+        self.rng.shuffle(states)
+        self.states = states
+        self.state_cum = cumulative([1 / (rank + 1) ** 0.8 for rank in range(len(states))])
+
+        self.mediums = list(FRAUD_MEDIUMS["en"].values())
+        self.medium_cum = cumulative([30, 10, 25, 12, 12, 5, 4, 2][:len(self.mediums)])
+        self.incidents = list(INCIDENT_TYPES["en"].values())
+        self.incident_cum = cumulative([22, 30, 12, 4, 14, 13, 5][:len(self.incidents)])
+
+        self.statuses = list(STATUS_WEIGHTS)
+        self.status_cum = cumulative(STATUS_WEIGHTS.values())
+        self.priorities = list(PRIORITY_WEIGHTS)
+        self.priority_cum = cumulative(PRIORITY_WEIGHTS.values())
+        self.languages = list(LANGUAGE_WEIGHTS)
+        self.language_cum = cumulative(LANGUAGE_WEIGHTS.values())
+
+    def pick(self, values, cum):
+        return self.rng.choices(values, cum_weights=cum)[0]
+
+    def created_at(self):
+        # Exponentially more reports in recent weeks than two years ago
+        days_ago = min(self.rng.expovariate(1 / 90), self.days)
+        return self.now - timedelta(days=days_ago, seconds=self.rng.randrange(86400))
+
+    def amount(self):
+        if self.rng.random() < 0.4:
+            return 0
+        return round(min(self.rng.lognormvariate(8.5, 1.6), 5_000_000), 2)
+
+    def report(self, n):
+        rng = self.rng
+        created = self.created_at()
+        status = self.pick(self.statuses, self.status_cum)
+        anonymous = rng.random() < 0.3
+        touched = created + timedelta(hours=rng.randrange(1, 24 * 14))
+        description = f"{rng.choice(SCAM_TEXTS)} (case {n})"
+        return [
+            # Indian numbers never start with 0: nothing can reach these
+            "ANONYMOUS" if anonymous else f"whatsapp:+910{rng.randrange(10 ** 8, 10 ** 9)}",
+            rng.choice(CITIES),
+            self.pick(self.states, self.state_cum),
+            self.pick(self.languages, self.language_cum),
+            self.pick(self.mediums, self.medium_cum),
+            self.pick(self.incidents, self.incident_cum),
+            description,
+            f"+91{rng.randrange(6 * 10 ** 9, 10 ** 10)}" if rng.random() < 0.6 else None,
+            f"user{rng.randrange(10 ** 6)}@mail.example" if rng.random() < 0.2 else None,
+            f"pay{rng.randrange(10 ** 6)}@upi" if rng.random() < 0.3 else None,
+            None,
+            self.amount(),
+            "skip",
+            f"{rng.getrandbits(256):064x}",
+            "[]",
+            "YES" if anonymous else "NO",
+            f"I4C-SYN-{n:010d}",
+            status,
+            self.pick(self.priorities, self.priority_cum),
+            None if status == "NEW" else f"analyst{rng.randrange(1, 40)}",
+            created.strftime("%Y-%m-%d %H:%M:%S"),
+            None if status == "NEW" else touched.strftime("%Y-%m-%d %H:%M:%S"),
+            touched.strftime("%Y-%m-%d %H:%M:%S") if status == "RESOLVED" else None,
+            1,
+            (created + timedelta(days=365)).strftime("%Y-%m-%d"),
+        ]
+
+
+def copy_rows(conn, table, columns, rows, chunk_size=50_000):
+    """Stream rows into a table with COPY in fixed-size CSV chunks"""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    cur = conn.cursor()
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    pending = 0
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+        pending += 1
+        if pending == chunk_size:
+            buf.seek(0)
+            cur.copy_expert(sql, buf)
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    if pending:
+        buf.seek(0)
+        cur.copy_expert(sql, buf)
+    conn.commit()
+
+
+def seed(conn, rows, notes_per_report=0.5, seed_value=1930, days=730):
+    gen = ReportGenerator(seed_value, days)
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM cyber_reports")
+    first_id = cur.fetchone()["max_id"] + 1
+    cur.execute("SELECT COUNT(*) AS count FROM cyber_reports WHERE reference_id LIKE 'I4C-SYN-%'")
+    offset = cur.fetchone()["count"]
+    cur.execute("SELECT id FROM admin_users ORDER BY id LIMIT 1")
+    admin = cur.fetchone()
+    # Don't push millions of synthetic rows through the live feed trigger
+    cur.execute("SET i4c.live_feed = 'off'")
+    if partitions.is_partitioned(cur):
+        created = partitions.ensure_partitions(cur, first_month=gen.now - timedelta(days=days))
+        print(f"📅 Created {len(created)} monthly partitions")
+    conn.commit()
+
+    started = time.perf_counter()
+    copy_rows(conn, "cyber_reports", REPORT_COLUMNS,
+              (gen.report(offset + i) for i in range(rows)))
+    report_s = time.perf_counter() - started
+    print(f"📥 {rows} reports loaded in {report_s:.1f}s ({rows / report_s:,.0f} rows/s)")
+
+    if admin and notes_per_report > 0:
+        cur.execute("SELECT MAX(id) AS max_id FROM cyber_reports")
+        last_id = cur.fetchone()["max_id"]
+        conn.commit()
+        rng = gen.rng
+        note_count = int(rows * notes_per_report)
+
+        def notes():
+            for _ in range(note_count):
+                ts = gen.created_at().strftime("%Y-%m-%d %H:%M:%S")
+                yield [rng.randint(first_id, last_id), admin["id"],
+                       "Called complainant, awaiting bank statement",
+                       rng.choice(NOTE_TYPES), ts]
+
+        started = time.perf_counter()
+        copy_rows(conn, "case_notes", NOTE_COLUMNS, notes())
+        print(f"📥 {note_count} case notes loaded in {time.perf_counter() - started:.1f}s")
+    elif notes_per_report > 0:
+        print("⚠️ No admin_users row found, skipping case_notes (run db_init.py first)")
+
+    cur.execute("ANALYZE cyber_reports")
+    cur.execute("ANALYZE case_notes")
+    conn.commit()
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+# Statements issued by the admin endpoints in app.py
+EXPLAIN_STATEMENTS = {
+    "reports.count": ("SELECT COUNT(*) as count FROM cyber_reports", ()),
+    "reports.page": ("SELECT * FROM cyber_reports ORDER BY created_at DESC LIMIT %s OFFSET %s",
+                     "page"),
+    "reports.page_30d": ("SELECT * FROM cyber_reports WHERE created_at >= %s "
+                         "ORDER BY created_at DESC LIMIT %s OFFSET %s", "recent_page"),
+    "analytics.status_90d": ("SELECT status, COUNT(*) as count FROM cyber_reports "
+                             "WHERE created_at >= %s GROUP BY status", "quarter"),
+    "analytics.status": ("SELECT status, COUNT(*) as count FROM cyber_reports GROUP BY status", ()),
+    "analytics.fraud_medium": ("SELECT fraud_medium, COUNT(*) as count FROM cyber_reports "
+                               "GROUP BY fraud_medium ORDER BY count DESC", ()),
+    "analytics.amount": ("SELECT COALESCE(SUM(amount_involved), 0) as total FROM cyber_reports", ()),
+    "analytics.state": ("SELECT location_state, COUNT(*) as count FROM cyber_reports "
+                        "WHERE location_state IS NOT NULL GROUP BY location_state "
+                        "ORDER BY count DESC LIMIT 5", ()),
+    "detail.report": ("SELECT * FROM cyber_reports WHERE id = %s", "report_id"),
+    "detail.notes": ("SELECT cn.*, au.username, au.full_name FROM case_notes cn "
+                     "JOIN admin_users au ON cn.admin_id = au.id "
+                     "WHERE cn.report_id = %s ORDER BY cn.created_at DESC", "report_id"),
+    "status.update": ("UPDATE cyber_reports SET status = %s, updated_at = NOW() WHERE id = %s",
+                      "update"),
+}
+
+
+def summarize(values):
+    values = sorted(values)
+    pick = lambda pct: values[min(len(values) - 1, int(pct / 100 * len(values)))]
+    return {
+        "count": len(values),
+        "p50_ms": round(pick(50), 3),
+        "p95_ms": round(pick(95), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+# Time the database path, not the response cache
+NO_CACHE = {"X-Cache-Bypass": "1"}
+
+
+def time_endpoint(client, method, path, repeat, json_body=None):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        resp = client.open(path, method=method, json=json_body, headers=NO_CACHE)
+        samples.append((time.perf_counter() - started) * 1000)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{method} {path} returned {resp.status_code}")
+    return summarize(samples)
+
+
+def explain(conn, sql, params):
+    """Capture EXPLAIN ANALYZE output; writes are rolled back"""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) {sql}", params)
+        return "\n".join(row["QUERY PLAN"] for row in cur.fetchall())
+    finally:
+        conn.rollback()
+
+
+def run(conn, repeat=20, per_page=20, seed_value=1930):
+    import app as bot
+
+    rng = random.Random(seed_value)
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) AS count, MIN(id) AS min_id, MAX(id) AS max_id FROM cyber_reports")
+    stats = cur.fetchone()
+    conn.commit()
+    if not stats["count"]:
+        raise SystemExit("cyber_reports is empty, run 'bench_admin.py seed' first")
+
+    total_pages = (stats["count"] + per_page - 1) // per_page
+    pages = sorted({p for p in (1, 10, 100, 1000, 10_000, 100_000, total_pages) if p <= total_pages})
+    report_ids = [rng.randint(stats["min_id"], stats["max_id"]) for _ in range(repeat)]
+
+    client = bot.app.test_client()
+    with client.session_transaction() as sess:
+        sess["admin_id"] = 0
+        sess["admin_username"] = "bench"
+        sess["admin_role"] = "SUPER_ADMIN"
+
+    timings = {}
+    for page in pages:
+        timings[f"GET reports page={page}"] = time_endpoint(
+            client, "GET", f"/api/admin/reports?page={page}&per_page={per_page}", repeat)
+    timings["GET analytics/overview"] = time_endpoint(
+        client, "GET", "/api/admin/analytics/overview", repeat)
+
+    # Date-filtered variants, which prune to the matching monthly partitions
+    month_ago = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    quarter_ago = (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d")
+    timings["GET reports last 30 days"] = time_endpoint(
+        client, "GET", f"/api/admin/reports?per_page={per_page}&from={month_ago}", repeat)
+    timings["GET analytics last 90 days"] = time_endpoint(
+        client, "GET", f"/api/admin/analytics/overview?from={quarter_ago}", repeat)
+
+    detail, update = [], []
+    for report_id in report_ids:
+        started = time.perf_counter()
+        client.get(f"/api/admin/reports/{report_id}", headers=NO_CACHE)
+        detail.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        client.put(f"/api/admin/reports/{report_id}/status",
+                   json={"status": rng.choice(list(STATUS_WEIGHTS))})
+        update.append((time.perf_counter() - started) * 1000)
+    timings["GET report detail"] = summarize(detail)
+    timings["PUT report status"] = summarize(update)
+
+    deepest = pages[-1]
+    param_sets = {
+        "page": (per_page, (deepest - 1) * per_page),
+        "report_id": (report_ids[0],),
+        "update": ("IN_PROGRESS", report_ids[0]),
+        "recent_page": (month_ago, per_page, 0),
+        "quarter": (quarter_ago,),
+    }
+    plans = {}
+    for name, (sql, params) in EXPLAIN_STATEMENTS.items():
+        plans[name] = explain(conn, sql, param_sets.get(params, params))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "rows": stats["count"],
+            "repeat": repeat,
+            "per_page": per_page,
+            "deepest_page": deepest,
+        },
+        "timings": timings,
+        "explain": plans,
+    }
+
+
+def print_report(result):
+    meta = result["meta"]
+    print(f"\n📊 Admin endpoints over {meta['rows']:,} reports ({meta['repeat']} runs each)")
+    print(f"\n{'endpoint':<36}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, s in result["timings"].items():
+        print(f"{name:<36}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['max_ms']:>10.2f}")
+    for name, plan in result["explain"].items():
+        print(f"\n--- EXPLAIN {name} ---\n{plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed and benchmark the admin endpoints")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_cmd = sub.add_parser("seed", help="Bulk-load synthetic reports and case notes")
+    seed_cmd.add_argument("--rows", type=int, default=1_000_000)
+    seed_cmd.add_argument("--notes-per-report", type=float, default=0.5)
+    seed_cmd.add_argument("--days", type=int, default=730)
+    seed_cmd.add_argument("--seed", type=int, default=1930)
+
+    run_cmd = sub.add_parser("run", help="Time admin endpoints and capture EXPLAIN plans")
+    run_cmd.add_argument("--repeat", type=int, default=20)
+    run_cmd.add_argument("--per-page", type=int, default=20)
+    run_cmd.add_argument("--seed", type=int, default=1930)
+    run_cmd.add_argument("--save", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    # Before app is imported: run()'s status updates would otherwise have
+    # the app's sender notify the synthetic citizens
+    os.environ["NOTIFY_SENDER"] = "0"
+    from app import get_db
+    conn = get_db()
+    try:
+        if args.command == "seed":
+            seed(conn, args.rows, args.notes_per_report, args.seed, args.days)
+        else:
+            result = run(conn, args.repeat, args.per_page, args.seed)
+            print_report(result)
+            if args.save:
+                os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+                with open(args.save, "w") as f:
+                    json.dump(result, f, indent=2)
+                print(f"\n💾 Saved report to {args.save}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
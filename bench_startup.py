@@ -0,0 +1,169 @@
+"""
+Cold-start benchmark.
+
+Starts fresh interpreters that import the app and serve one /whatsapp
+message through the Flask test client, then reports time to import, time
+to the first reply and an import-time breakdown from `python -X importtime`.
+
+Usage:
+    python bench_startup.py --runs 10
+    python bench_startup.py --save bench_results/startup.json
+    python bench_startup.py --compare bench_results/startup.json
+
+Deploy builds should run `python -m compileall -q .` so cold starts load
+cached bytecode instead of compiling app, config and the rest from source.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.post("/whatsapp", data={"From": "whatsapp:+910000000000", "Body": "hi"})
+replied = time.perf_counter()
+print("STARTUP_RESULT " + json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_reply_ms": (replied - imported) * 1000,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Yield (depth, module, self_us, cumulative_us) from -X importtime output"""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cumulative_us, raw_name = int(parts[0]), int(parts[1]), parts[2]
+        name = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        yield depth, name, self_us, cumulative_us
+
+
+def run_once(env):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup probe failed:\n{proc.stderr[-2000:]}")
+
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP_RESULT "):
+            result = json.loads(line[len("STARTUP_RESULT "):])
+    result["process_ms"] = wall_ms
+    result["imports"] = list(parse_importtime(proc.stderr))
+    return result
+
+
+def breakdown(imports):
+    """Direct imports of app.py and self time per top-level package"""
+    app_children, packages = {}, {}
+    in_app = False
+    for depth, name, self_us, cumulative_us in reversed(imports):
+        # importtime prints children before their parent, so walk backwards
+        if depth == 0:
+            in_app = name == "app"
+        elif in_app and depth == 1:
+            app_children[name] = cumulative_us / 1000
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us / 1000
+    return app_children, packages
+
+
+def summarize(runs, top):
+    def stats(key):
+        values = [r[key] for r in runs]
+        return {"median_ms": round(statistics.median(values), 3),
+                "min_ms": round(min(values), 3), "max_ms": round(max(values), 3)}
+
+    children, packages = {}, {}
+    for r in runs:
+        c, p = breakdown(r["imports"])
+        for name, ms in c.items():
+            children.setdefault(name, []).append(ms)
+        for name, ms in p.items():
+            packages.setdefault(name, []).append(ms)
+
+    med = lambda d: sorted(((n, round(statistics.median(v), 3)) for n, v in d.items()),
+                           key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "meta": {"timestamp": datetime.now().isoformat(), "runs": len(runs),
+                 "python": sys.version.split()[0]},
+        "process": stats("process_ms"),
+        "import_app": stats("import_ms"),
+        "first_reply": stats("first_reply_ms"),
+        "app_imports_ms": dict(med(children)),
+        "package_self_ms": dict(med(packages)),
+    }
+
+
+def print_report(result):
+    print(f"\n🚀 Cold start over {result['meta']['runs']} runs (median / min / max ms)")
+    for key, label in (("process", "process to exit"), ("import_app", "import app"),
+                       ("first_reply", "first /whatsapp reply")):
+        s = result[key]
+        print(f"   {label:<24}{s['median_ms']:>10.1f}{s['min_ms']:>10.1f}{s['max_ms']:>10.1f}")
+    print("\n   Direct imports of app.py (cumulative ms)")
+    for name, ms in result["app_imports_ms"].items():
+        print(f"   {name:<34}{ms:>10.1f}")
+    print("\n   Self time by top-level package (ms)")
+    for name, ms in result["package_self_ms"].items():
+        print(f"   {name:<34}{ms:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save", help="Write the JSON result to this path")
+    parser.add_argument("--compare", help="Baseline JSON result to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not env.get("DATABASE_URL") and not env.get("DATABASE_PATH"):
+        # Keep the background warm-up away from the checked-in database file
+        env["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="i4c-startup-"), "startup.db")
+    runs = [run_once(env) for _ in range(args.runs)]
+    result = summarize(runs, args.top)
+    print_report(result)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{key} {result[key]['median_ms']}ms > baseline {baseline[key]['median_ms']}ms"
+            for key in ("import_app", "first_reply")
+            if result[key]["median_ms"] > baseline[key]["median_ms"] * (1 + args.tolerance)
+        ]
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            raise SystemExit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
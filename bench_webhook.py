@@ -0,0 +1,315 @@
+"""
+Conversation load-test harness for the /whatsapp webhook.
+
+Simulates many concurrent WhatsApp conversations (all languages, invalid
+inputs, typed state names, state pagination with 'more', abandonment) and reports latency
+percentiles per conversation step plus overall throughput.
+
+Usage:
+    python bench_webhook.py --conversations 2000 --concurrency 50
+    python bench_webhook.py --backend sqlite
+    python bench_webhook.py --url http://localhost:5000/whatsapp   # Flask (sync)
+    python bench_webhook.py --url http://localhost:8000/whatsapp   # asgi_app (async)
+    python bench_webhook.py --save bench_results/webhook.json
+    python bench_webhook.py --compare bench_results/webhook.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlparse
+
+from config import FRAUD_MEDIUMS, INCIDENT_TYPES, INDIAN_STATES
+
+LANGUAGES = {"1": "en", "2": "hi", "3": "gu"}
+STATES_PER_PAGE = 10
+
+# =============================================================================
+# CONVERSATION SCRIPTS
+# =============================================================================
+
+def build_script(rng, invalid_rate=0.1, abandon_rate=0.15, typed_state_rate=0.3):
+    """Build one citizen conversation as a list of (step, message) pairs"""
+    script = [("welcome", rng.choice(["hi", "Hi", "hello", "start"]))]
+
+    def choice_step(step, valid):
+        if rng.random() < invalid_rate:
+            script.append((f"{step}:invalid", rng.choice(["0", "99", "abc", "", "yes"])))
+        script.append((step, valid))
+
+    choice_step("language", rng.choice(list(LANGUAGES)))
+    choice_step("consent", "1")
+    choice_step("fraud_medium", rng.choice(list(FRAUD_MEDIUMS["en"])))
+    choice_step("incident_type", rng.choice(list(INCIDENT_TYPES["en"])))
+
+    # Pick a state and either type its name or page through the list with 'more'
+    state_index = rng.randrange(len(INDIAN_STATES))
+    if rng.random() < typed_state_rate:
+        script.append(("location_state:name", INDIAN_STATES[state_index].lower()))
+    else:
+        for _ in range(state_index // STATES_PER_PAGE):
+            script.append(("location_state:more", "more"))
+        choice_step("location_state", str(state_index % STATES_PER_PAGE + 1))
+
+    script.append(("location_city", rng.choice(["ahmedabad", "pune", "lucknow", "patna", "surat"])))
+    script.append(("description", "Caller claimed to be from my bank and asked for OTP "
+                                  f"#{rng.randrange(10 ** 6)}"))
+    script.append(("suspect_details", f"+91 9{rng.randrange(10 ** 9):09d}"))
+    script.append(("amount", rng.choice(["0", "500", "12,000", "₹45000", "not sure"])))
+    script.append(("evidence", rng.choice(["skip", "screenshot sent to bank"])))
+    choice_step("anonymous", rng.choice(["1", "2"]))
+
+    if rng.random() < abandon_rate:
+        # Citizen walks away somewhere after the welcome message
+        script = script[:rng.randrange(1, len(script))]
+    return script
+
+# =============================================================================
+# TRANSPORTS
+# =============================================================================
+
+class TestClientTransport:
+    """Drives the Flask app in-process through its test client"""
+
+    def __init__(self, backend):
+        if backend == "sqlite":
+            # Fresh embedded database per run so results are comparable
+            path = os.path.join(tempfile.mkdtemp(prefix="i4c-bench-"), "bench.db")
+            os.environ["STORAGE_BACKEND"] = "sqlite"
+            os.environ["DATABASE_PATH"] = path
+            import db_init
+            db_init.init_sqlite_database(path)
+        import app as bot
+        self.bot = bot
+        if backend == "memory":
+            self.reports = []
+            self._lock = threading.Lock()
+            bot.save_report = self._save_report
+        self._local = threading.local()
+
+    def _save_report(self, data):
+        with self._lock:
+            self.reports.append(dict(data))
+            return f"I4C-BENCH-{len(self.reports):08d}"
+
+    def post(self, phone, body):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.bot.app.test_client()
+        resp = client.post("/whatsapp", data={"From": phone, "Body": body})
+        return resp.status_code, resp.get_data(as_text=True)
+
+
+class HTTPTransport:
+    """Drives a running server over keep-alive HTTP connections"""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.path = parsed.path or "/whatsapp"
+        self.conn_class = (http.client.HTTPSConnection if parsed.scheme == "https"
+                           else http.client.HTTPConnection)
+        self._local = threading.local()
+
+    def post(self, phone, body):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.conn_class(self.host, self.port, timeout=30)
+        payload = urlencode({"From": phone, "Body": body})
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        try:
+            conn.request("POST", self.path, payload, headers)
+            resp = conn.getresponse()
+            return resp.status, resp.read().decode("utf-8", "replace")
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_worker(transport, conversations, samples, errors, lock):
+    """Advance a batch of conversations round-robin so they overlap in time"""
+    local_samples = {}
+    local_errors = {"http": 0, "bot": 0, "exception": 0}
+    active = [(phone, iter(script)) for phone, script in conversations]
+
+    while active:
+        still_active = []
+        for phone, steps in active:
+            step = next(steps, None)
+            if step is None:
+                continue
+            label, body = step
+            started = time.perf_counter()
+            try:
+                status, text = transport.post(phone, body)
+            except Exception:
+                local_errors["exception"] += 1
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            local_samples.setdefault(label, []).append(elapsed_ms)
+            if status != 200:
+                local_errors["http"] += 1
+            elif "Error occurred" in text:
+                local_errors["bot"] += 1
+            still_active.append((phone, steps))
+        active = still_active
+
+    with lock:
+        for label, values in local_samples.items():
+            samples.setdefault(label, []).extend(values)
+        for key, count in local_errors.items():
+            errors[key] += count
+
+
+def run_benchmark(transport, conversations=1000, concurrency=20, seed=1930,
+                  invalid_rate=0.1, abandon_rate=0.15):
+    rng = random.Random(seed)
+    scripts = [
+        (f"whatsapp:+9170{i:08d}", build_script(rng, invalid_rate, abandon_rate))
+        for i in range(conversations)
+    ]
+    batches = [scripts[i::concurrency] for i in range(concurrency)]
+
+    samples = {}
+    errors = {"http": 0, "bot": 0, "exception": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_worker, args=(transport, batch, samples, errors, lock))
+        for batch in batches if batch
+    ]
+
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - started
+
+    total_requests = sum(len(v) for v in samples.values())
+    completed = sum(1 for _, script in scripts if script[-1][0] == "anonymous")
+    steps = {}
+    for label in sorted(samples):
+        values = sorted(samples[label])
+        steps[label] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(values[-1], 3),
+        }
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "conversations": conversations,
+            "completed_conversations": completed,
+            "concurrency": concurrency,
+            "seed": seed,
+            "invalid_rate": invalid_rate,
+            "abandon_rate": abandon_rate,
+        },
+        "wall_seconds": round(wall_s, 3),
+        "requests": total_requests,
+        "throughput_rps": round(total_requests / wall_s, 1) if wall_s else 0.0,
+        "conversations_per_second": round(conversations / wall_s, 1) if wall_s else 0.0,
+        "errors": errors,
+        "steps": steps,
+    }
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def print_report(result):
+    print(f"\n📊 {result['requests']} requests in {result['wall_seconds']}s "
+          f"({result['throughput_rps']} req/s, "
+          f"{result['conversations_per_second']} conversations/s)")
+    print(f"   errors: {result['errors']}")
+    print(f"\n{'step':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, s in result["steps"].items():
+        print(f"{label:<28}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}"
+              f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+
+
+def compare(result, baseline, tolerance):
+    """Return a list of regressions against a stored baseline result"""
+    regressions = []
+    limit = 1 + tolerance
+
+    if result["throughput_rps"] * limit < baseline["throughput_rps"]:
+        regressions.append(f"throughput {result['throughput_rps']} req/s "
+                           f"< baseline {baseline['throughput_rps']} req/s")
+
+    for label, s in result["steps"].items():
+        base = baseline.get("steps", {}).get(label)
+        if not base:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if s[key] > base[key] * limit:
+                regressions.append(f"{label} {key} {s[key]} > baseline {base[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the /whatsapp webhook")
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1930)
+    parser.add_argument("--invalid-rate", type=float, default=0.1)
+    parser.add_argument("--abandon-rate", type=float, default=0.15)
+    parser.add_argument("--url", help="Target a running server instead of the Flask test client")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "database"], default="memory",
+                        help="Storage used by the in-process app: in-memory stub, a fresh "
+                             "SQLite file, or the configured repository (ignored with --url)")
+    parser.add_argument("--save", help="Write the JSON result to this path")
+    parser.add_argument("--compare", help="Baseline JSON result to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    transport = HTTPTransport(args.url) if args.url else TestClientTransport(args.backend)
+    result = run_benchmark(transport, args.conversations, args.concurrency, args.seed,
+                           args.invalid_rate, args.abandon_rate)
+    result["meta"]["target"] = args.url or f"test-client/{args.backend}"
+    if not args.url:
+        result["meta"]["open_conversation_states"] = len(transport.bot.user_state)
+    print_report(result)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            raise SystemExit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,8 @@ class Config:
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
     TWILIO_WHATSAPP_NUMBER = os.environ.get('TWILIO_WHATSAPP_NUMBER', 'whatsapp:+14155238886')
+    # Point at a local stand-in to test outbound notifications
+    TWILIO_API_BASE = os.environ.get('TWILIO_API_BASE', 'https://api.twilio.com')
     
     # DPDP Compliance
     DATA_RETENTION_DAYS = 365  # 1 year
@@ -91,6 +93,31 @@ INCIDENT_TYPES = {
     }
 }
 
+# Report statuses as told to citizens ("status <reference ID>" on WhatsApp)
+STATUS_NAMES = {
+    'en': {
+        'NEW': 'Received, awaiting review',
+        'IN_PROGRESS': 'Under investigation',
+        'ESCALATED': 'Escalated to the investigating agency',
+        'RESOLVED': 'Resolved',
+        'CLOSED': 'Closed'
+    },
+    'hi': {
+        'NEW': 'प्राप्त, समीक्षा की प्रतीक्षा में',
+        'IN_PROGRESS': 'जांच जारी है',
+        'ESCALATED': 'जांच एजेंसी को भेजा गया',
+        'RESOLVED': 'समाधान हो गया',
+        'CLOSED': 'बंद'
+    },
+    'gu': {
+        'NEW': 'પ્રાપ્ત, સમીક્ષાની રાહ જોઈ રહ્યું છે',
+        'IN_PROGRESS': 'તપાસ ચાલુ છે',
+        'ESCALATED': 'તપાસ એજન્સીને મોકલવામાં આવ્યું',
+        'RESOLVED': 'ઉકેલાઈ ગયું',
+        'CLOSED': 'બંધ'
+    }
+}
+
 # Indian States
 INDIAN_STATES = [
     "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh",
@@ -102,6 +129,148 @@ INDIAN_STATES = [
     "Delhi", "Jammu and Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
 ]
 
+# Localized state names, used to match free-text replies at the state step
+STATE_NAMES = {
+    'hi': {
+        "Andhra Pradesh": "आंध्र प्रदेश",
+        "Arunachal Pradesh": "अरुणाचल प्रदेश",
+        "Assam": "असम",
+        "Bihar": "बिहार",
+        "Chhattisgarh": "छत्तीसगढ़",
+        "Goa": "गोवा",
+        "Gujarat": "गुजरात",
+        "Haryana": "हरियाणा",
+        "Himachal Pradesh": "हिमाचल प्रदेश",
+        "Jharkhand": "झारखंड",
+        "Karnataka": "कर्नाटक",
+        "Kerala": "केरल",
+        "Madhya Pradesh": "मध्य प्रदेश",
+        "Maharashtra": "महाराष्ट्र",
+        "Manipur": "मणिपुर",
+        "Meghalaya": "मेघालय",
+        "Mizoram": "मिज़ोरम",
+        "Nagaland": "नागालैंड",
+        "Odisha": "ओडिशा",
+        "Punjab": "पंजाब",
+        "Rajasthan": "राजस्थान",
+        "Sikkim": "सिक्किम",
+        "Tamil Nadu": "तमिलनाडु",
+        "Telangana": "तेलंगाना",
+        "Tripura": "त्रिपुरा",
+        "Uttar Pradesh": "उत्तर प्रदेश",
+        "Uttarakhand": "उत्तराखंड",
+        "West Bengal": "पश्चिम बंगाल",
+        "Andaman and Nicobar Islands": "अंडमान और निकोबार द्वीपसमूह",
+        "Chandigarh": "चंडीगढ़",
+        "Dadra and Nagar Haveli and Daman and Diu": "दादरा और नगर हवेली और दमन और दीव",
+        "Delhi": "दिल्ली",
+        "Jammu and Kashmir": "जम्मू और कश्मीर",
+        "Ladakh": "लद्दाख",
+        "Lakshadweep": "लक्षद्वीप",
+        "Puducherry": "पुडुचेरी"
+    },
+    'gu': {
+        "Andhra Pradesh": "આંધ્ર પ્રદેશ",
+        "Arunachal Pradesh": "અરુણાચલ પ્રદેશ",
+        "Assam": "આસામ",
+        "Bihar": "બિહાર",
+        "Chhattisgarh": "છત્તીસગઢ",
+        "Goa": "ગોવા",
+        "Gujarat": "ગુજરાત",
+        "Haryana": "હરિયાણા",
+        "Himachal Pradesh": "હિમાચલ પ્રદેશ",
+        "Jharkhand": "ઝારખંડ",
+        "Karnataka": "કર્ણાટક",
+        "Kerala": "કેરળ",
+        "Madhya Pradesh": "મધ્ય પ્રદેશ",
+        "Maharashtra": "મહારાષ્ટ્ર",
+        "Manipur": "મણિપુર",
+        "Meghalaya": "મેઘાલય",
+        "Mizoram": "મિઝોરમ",
+        "Nagaland": "નાગાલેન્ડ",
+        "Odisha": "ઓડિશા",
+        "Punjab": "પંજાબ",
+        "Rajasthan": "રાજસ્થાન",
+        "Sikkim": "સિક્કિમ",
+        "Tamil Nadu": "તમિલનાડુ",
+        "Telangana": "તેલંગાણા",
+        "Tripura": "ત્રિપુરા",
+        "Uttar Pradesh": "ઉત્તર પ્રદેશ",
+        "Uttarakhand": "ઉત્તરાખંડ",
+        "West Bengal": "પશ્ચિમ બંગાળ",
+        "Andaman and Nicobar Islands": "આંદામાન અને નિકોબાર ટાપુઓ",
+        "Chandigarh": "ચંદીગઢ",
+        "Dadra and Nagar Haveli and Daman and Diu": "દાદરા અને નગર હવેલી અને દમણ અને દીવ",
+        "Delhi": "દિલ્હી",
+        "Jammu and Kashmir": "જમ્મુ અને કાશ્મીર",
+        "Ladakh": "લદ્દાખ",
+        "Lakshadweep": "લક્ષદ્વીપ",
+        "Puducherry": "પુડુચેરી"
+    }
+}
+
+# Abbreviations and common alternative names
+STATE_ALIASES = {
+    "Andhra Pradesh": ["AP", "Andhra"],
+    "Arunachal Pradesh": ["AR", "Arunachal"],
+    "Assam": ["AS"],
+    "Bihar": ["BR"],
+    "Chhattisgarh": ["CG", "CT", "Chattisgarh"],
+    "Goa": ["GA"],
+    "Gujarat": ["GJ", "Gujrat"],
+    "Haryana": ["HR"],
+    "Himachal Pradesh": ["HP", "Himachal"],
+    "Jharkhand": ["JH"],
+    "Karnataka": ["KA"],
+    "Kerala": ["KL", "Keralam"],
+    "Madhya Pradesh": ["MP", "एमपी", "એમપી"],
+    "Maharashtra": ["MH"],
+    "Manipur": ["MN"],
+    "Meghalaya": ["ML"],
+    "Mizoram": ["MZ"],
+    "Nagaland": ["NL"],
+    "Odisha": ["OD", "OR", "Orissa"],
+    "Punjab": ["PB"],
+    "Rajasthan": ["RJ"],
+    "Sikkim": ["SK"],
+    "Tamil Nadu": ["TN"],
+    "Telangana": ["TS", "TG"],
+    "Tripura": ["TR"],
+    "Uttar Pradesh": ["UP", "यूपी", "યુપી"],
+    "Uttarakhand": ["UK", "UT", "Uttaranchal"],
+    "West Bengal": ["WB", "Bengal"],
+    "Andaman and Nicobar Islands": ["AN", "Andaman", "Andaman Nicobar"],
+    "Chandigarh": ["CH"],
+    "Dadra and Nagar Haveli and Daman and Diu": ["DNH", "DD", "Dadra", "Daman", "Diu"],
+    "Delhi": ["DL", "New Delhi", "NCT of Delhi", "नई दिल्ली", "નવી દિલ્હી"],
+    "Jammu and Kashmir": ["JK", "J&K", "J and K", "Kashmir", "Jammu", "जे एंड के"],
+    "Ladakh": ["LA"],
+    "Lakshadweep": ["LD"],
+    "Puducherry": ["PY", "Pondicherry", "Pondy"]
+}
+
+# Report priority rules (priority.py). Points of matching rules add up,
+# except that within a group only the highest-scoring match counts; the
+# total picks the first level whose threshold it reaches. Fields are
+# cyber_reports columns plus the signals suspect_reports (most earlier
+# reports naming one of the same suspect identifiers) and state_reports_1h
+# (reports from the same state in the preceding hour).
+PRIORITY_LEVELS = [("CRITICAL", 80), ("HIGH", 50), ("MEDIUM", 20), ("LOW", 0)]
+
+PRIORITY_RULES = [
+    {"name": "amount_10_lakh", "group": "amount", "field": "amount_involved", "op": ">=", "value": 1000000, "points": 80},
+    {"name": "amount_1_lakh", "group": "amount", "field": "amount_involved", "op": ">=", "value": 100000, "points": 50},
+    {"name": "amount_10k", "group": "amount", "field": "amount_involved", "op": ">=", "value": 10000, "points": 30},
+    {"name": "amount_lost", "group": "amount", "field": "amount_involved", "op": ">", "value": 0, "points": 15},
+    {"name": "investment_scam", "field": "incident_type", "op": "in", "value": ["Investment/Trading Scam"], "points": 20},
+    {"name": "malware", "field": "incident_type", "op": "in", "value": ["Malware/Ransomware"], "points": 20},
+    {"name": "financial_fraud", "field": "incident_type", "op": "in", "value": ["Online Financial Fraud"], "points": 10},
+    {"name": "payment_medium", "field": "fraud_medium", "op": "in", "value": ["UPI/Digital Payment", "Bank/ATM"], "points": 10},
+    {"name": "repeat_suspect", "group": "suspect", "field": "suspect_reports", "op": ">=", "value": 5, "points": 40},
+    {"name": "known_suspect", "group": "suspect", "field": "suspect_reports", "op": ">=", "value": 1, "points": 20},
+    {"name": "state_surge", "field": "state_reports_1h", "op": ">=", "value": 25, "points": 20},
+]
+
 # Multilingual Messages
 MESSAGES = {
     'en': {
@@ -222,6 +391,7 @@ Reply 1 or 2:""",
 📋 Reference ID: {reference_id}
 
 Your report has been registered with I4C.
+To check its status later, send: status {reference_id}
 
 🛡️ *Cyber Safety Tips:*
 • Never share OTP/PIN with anyone
@@ -234,6 +404,28 @@ Your report has been registered with I4C.
 
 Thank you for helping make India cyber-safe! 🇮🇳""",
         
+        'status_reply': """📋 Reference ID: {reference_id}
+📌 Status: *{status}*
+🕒 Last updated: {updated}
+
+📞 *Helpline:* 1930 (24/7)""",
+
+        'status_not_found': "❓ No report found with reference ID {reference_id}. Please check the ID, or call 1930.",
+
+        'status_notification': """🔔 *Update on your report*
+
+📋 Reference ID: {reference_id}
+📌 Status: *{status}*
+
+To check its status later, send: status {reference_id}
+📞 *Helpline:* 1930 (24/7)""",
+
+        'state_candidates': """🔎 Did you mean:
+
+{options}
+
+Reply with the number, or type 'more' to see the full list.""",
+        
         'invalid_input': "❌ Invalid input. Please try again.",
         'error': "⚠️ Something went wrong. Please try again or call 1930.",
     },
@@ -351,6 +543,7 @@ I4C साइबर अपराध को रोकने के लिए ड
 📋 संदर्भ ID: {reference_id}
 
 आपकी रिपोर्ट I4C के साथ पंजीकृत हो गई है।
+बाद में स्थिति जानने के लिए भेजें: status {reference_id}
 
 🛡️ *साइबर सुरक्षा टिप्स:*
 • किसी के साथ भी OTP/PIN साझा न करें
@@ -363,6 +556,28 @@ I4C साइबर अपराध को रोकने के लिए ड
 
 भारत को साइबर-सुरक्षित बनाने में मदद के लिए धन्यवाद! 🇮🇳""",
         
+        'status_reply': """📋 संदर्भ ID: {reference_id}
+📌 स्थिति: *{status}*
+🕒 अंतिम अपडेट: {updated}
+
+📞 *हेल्पलाइन:* 1930 (24/7)""",
+
+        'status_not_found': "❓ संदर्भ ID {reference_id} के साथ कोई रिपोर्ट नहीं मिली। कृपया ID जांचें, या 1930 पर कॉल करें।",
+
+        'status_notification': """🔔 *आपकी रिपोर्ट पर अपडेट*
+
+📋 संदर्भ ID: {reference_id}
+📌 स्थिति: *{status}*
+
+बाद में स्थिति जानने के लिए भेजें: status {reference_id}
+📞 *हेल्पलाइन:* 1930 (24/7)""",
+
+        'state_candidates': """🔎 क्या आपका मतलब है:
+
+{options}
+
+नंबर के साथ जवाब दें, या पूरी सूची देखने के लिए 'more' टाइप करें।""",
+        
         'invalid_input': "❌ अमान्य इनपुट। कृपया पुन: प्रयास करें।",
         'error': "⚠️ कुछ गलत हो गया। कृपया पुन: प्रयास करें या 1930 पर कॉल करें।",
     },
@@ -399,6 +614,7 @@ I4C साइबर अपराध को रोकने के लिए ड
 📋 સંદર્ભ ID: {reference_id}
 
 તમારી રિપોર્ટ I4C સાથે નોંધાઈ છે।
+પછીથી સ્થિતિ જાણવા માટે મોકલો: status {reference_id}
 
 🛡️ *સાયબર સલામતી ટિપ્સ:*
 • કોઈની સાથે પણ OTP/PIN શેર કરશો નહીં
@@ -410,5 +626,27 @@ I4C साइबर अपराध को रोकने के लिए ड
 🌐 *ઓનલાઇન રિપોર્ટ:* https://cybercrime.gov.in
 
 ભારતને સાયબર-સુરક્ષિત બનાવવામાં મદદ કરવા બદલ આભાર! 🇮🇳""",
+        
+        'status_reply': """📋 સંદર્ભ ID: {reference_id}
+📌 સ્થિતિ: *{status}*
+🕒 છેલ્લું અપડેટ: {updated}
+
+📞 *હેલ્પલાઇન:* 1930 (24/7)""",
+
+        'status_not_found': "❓ સંદર્ભ ID {reference_id} સાથે કોઈ રિપોર્ટ મળી નથી. કૃપા કરીને ID તપાસો, અથવા 1930 પર કૉલ કરો.",
+
+        'status_notification': """🔔 *તમારી રિપોર્ટ પર અપડેટ*
+
+📋 સંદર્ભ ID: {reference_id}
+📌 સ્થિતિ: *{status}*
+
+પછીથી સ્થિતિ જાણવા માટે મોકલો: status {reference_id}
+📞 *હેલ્પલાઇન:* 1930 (24/7)""",
+
+        'state_candidates': """🔎 શું તમારો મતલબ છે:
+
+{options}
+
+નંબર સાથે જવાબ આપો, અથવા સંપૂર્ણ યાદી જોવા માટે 'more' ટાઇપ કરો.""",
     }
 }
@@ -0,0 +1,314 @@
+"""
+WhatsApp conversation flow shared by the Flask (app.py) and ASGI
+(asgi_app.py) serving modes. Persistence is passed in by the caller so
+each mode can use its own sync or async database access.
+"""
+import hashlib
+import re
+import secrets
+from datetime import datetime, timedelta
+
+from xml.sax.saxutils import escape
+
+import metrics
+from state_matcher import match_state, display_name
+
+# Import configuration
+try:
+    from config import MESSAGES, FRAUD_MEDIUMS, INCIDENT_TYPES, INDIAN_STATES, STATUS_NAMES
+except ImportError:
+    print("⚠️ Config not imported, using basic config")
+    MESSAGES = {}
+    FRAUD_MEDIUMS = {}
+    INCIDENT_TYPES = {}
+    INDIAN_STATES = []
+    STATUS_NAMES = {}
+
+# User conversation state (in-memory)
+user_state = {}
+
+ERROR_REPLY = "Error occurred. Please try again or call 1930."
+
+# "status I4C-20250101093000-1A2B3C" (or the Hindi/Gujarati word), at any
+# step; IDs issued before the random suffix was added are just I4C-<timestamp>
+STATUS_QUERY = re.compile(r"^\s*(status|स्थिति|સ્થિતિ)\s*[:\-]?\s*(I4C-\d{14}(?:-[0-9A-F]{6})?)\s*$", re.I)
+STATUS_KEYWORD_LANGUAGE = {"स्थिति": "hi", "સ્થિતિ": "gu"}
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def generate_reference_id():
+    # The random suffix keeps IDs unique when several reports land in one second
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"I4C-{timestamp}-{secrets.token_hex(3).upper()}"
+
+def reference_created_range(reference_id):
+    """created_at bounds for a reference ID (either format), which embeds
+    its report's creation time (a day either side for clock adjustments),
+    or None if the timestamp isn't a real date"""
+    try:
+        stamp = datetime.strptime(reference_id[4:18], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+    return ((stamp - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
+            (stamp + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"))
+
+def hash_evidence(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def get_message(lang, key, **kwargs):
+    lang = lang if lang in MESSAGES else 'en'
+    msg = MESSAGES.get(lang, {}).get(key, f"Message: {key}")
+    return msg.format(**kwargs) if kwargs else msg
+
+def format_state_list(page=0, per_page=10):
+    start = page * per_page
+    end = start + per_page
+    states = INDIAN_STATES[start:end]
+
+    if not states:
+        return "No more states available."
+
+    msg = "📍 *Your Location*\n\nPlease select your state:\n\n"
+
+    for i, state in enumerate(states, 1):
+        msg += f"{i}. {state}\n"
+
+    if end < len(INDIAN_STATES):
+        msg += "\nType 'more' to see more states."
+
+    msg += "\nOr just type your state name."
+
+    return msg
+
+def render_twiml(body):
+    # Same markup twilio's MessagingResponse produces for a single message,
+    # without importing the twilio package on the request path
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<Response><Message><Body>{escape(body)}</Body></Message></Response>')
+
+# =============================================================================
+# CONVERSATION FLOW
+# =============================================================================
+
+def advance(phone, msg):
+    """Apply one inbound message to the conversation state.
+
+    Returns (reply, report, outcome). When report is not None the citizen
+    has finished and the caller must persist it and then call
+    complete_report() to get the confirmation reply.
+    """
+    if phone not in user_state:
+        user_state[phone] = {"language": "en", "step": "welcome"}
+
+    state = user_state[phone]
+    lang = state.get("language", "en")
+
+    # Welcome
+    if state.get("step") == "welcome" or msg.lower() in ["start", "hi", "hello"]:
+        state["step"] = "language"
+        return get_message("en", "welcome"), None, "ok"
+
+    # Language
+    elif state.get("step") == "language":
+        lang_map = {"1": "en", "2": "hi", "3": "gu"}
+        msg_clean = msg.strip()
+
+        if msg_clean in lang_map:
+            state["language"] = lang_map[msg_clean]
+            lang = state["language"]
+            state["step"] = "consent"
+            return get_message(lang, "consent"), None, "ok"
+        return get_message(lang, "invalid_input"), None, "invalid"
+
+    # Consent
+    elif state.get("step") == "consent":
+        if msg == "1":
+            state["consent"] = True
+            state["step"] = "fraud_medium"
+            return get_message(lang, "fraud_medium"), None, "ok"
+        elif msg == "2":
+            user_state.pop(phone, None)
+            return "Thank you. Call 1930 for help.", None, "ok"
+        return get_message(lang, "invalid_input"), None, "invalid"
+
+    # Fraud Medium
+    elif state.get("step") == "fraud_medium":
+        if msg in FRAUD_MEDIUMS.get(lang, {}):
+            state["fraud_medium"] = FRAUD_MEDIUMS['en'][msg]
+            state["step"] = "incident_type"
+            return get_message(lang, "incident_type"), None, "ok"
+        return get_message(lang, "invalid_input"), None, "invalid"
+
+    # Incident Type
+    elif state.get("step") == "incident_type":
+        if msg in INCIDENT_TYPES.get(lang, {}):
+            state["incident_type"] = INCIDENT_TYPES['en'][msg]
+            state["state_page"] = 0
+            state["step"] = "location_state"
+            return format_state_list(0), None, "ok"
+        return get_message(lang, "invalid_input"), None, "invalid"
+
+    # State
+    elif state.get("step") == "location_state":
+        page = state.get("state_page", 0)
+        per_page = 10
+        start = page * per_page
+        end = start + per_page
+        current_states = INDIAN_STATES[start:end]
+        candidates = state.get("state_candidates")
+        selected_state = None
+        # If user typed "more"
+        if msg.lower() == "more":
+            state.pop("state_candidates", None)
+            if candidates:
+                # Back from "did you mean" to the page they were on
+                return format_state_list(page), None, "ok"
+            if end >= len(INDIAN_STATES):
+                return "No more states available.", None, "ok"
+            state["state_page"] = page + 1
+            return format_state_list(state["state_page"]), None, "ok"
+        # If user picked one of the suggested states
+        elif candidates and msg.isdigit() and 1 <= int(msg) <= len(candidates):
+            selected_state = candidates[int(msg) - 1]
+        # If user selected a number
+        elif msg.isdigit() and 1 <= int(msg) <= len(current_states):
+            selected_state = current_states[int(msg) - 1]
+        # If user typed a state name
+        elif not msg.isdigit():
+            selected_state, candidates = match_state(msg)
+            if not selected_state and candidates:
+                state["state_candidates"] = candidates
+                options = "\n".join(
+                    f"{i}. {display_name(s, lang)}" for i, s in enumerate(candidates, 1)
+                )
+                return get_message(lang, "state_candidates", options=options), None, "ok"
+
+        if selected_state:
+            state["location_state"] = selected_state
+            state["state_page"] = 0
+            state.pop("state_candidates", None)
+            state["step"] = "location_city"
+            return get_message(lang, "location_city"), None, "ok"
+        return get_message(lang, "invalid_input"), None, "invalid"
+
+    # City
+    elif state.get("step") == "location_city":
+        state["location_city"] = msg.title()
+        state["step"] = "description"
+        return get_message(lang, "description"), None, "ok"
+
+    # Description
+    elif state.get("step") == "description":
+        state["description"] = msg
+        state["evidence_hash"] = hash_evidence(msg)
+        state["step"] = "suspect_details"
+        return get_message(lang, "suspect_details"), None, "ok"
+
+    # Suspect
+    elif state.get("step") == "suspect_details":
+        state["suspect_other"] = msg
+        state["step"] = "amount"
+        return get_message(lang, "amount"), None, "ok"
+
+    # Amount
+    elif state.get("step") == "amount":
+        try:
+            state["amount"] = float(msg.replace(",", "").replace("₹", ""))
+        except:
+            state["amount"] = 0
+        state["step"] = "evidence"
+        return get_message(lang, "evidence"), None, "ok"
+
+    # Evidence
+    elif state.get("step") == "evidence":
+        state["evidence_text"] = msg
+        state["step"] = "anonymous"
+        return get_message(lang, "anonymous"), None, "ok"
+
+    # Anonymous
+    elif state.get("step") == "anonymous":
+        if msg in ["1", "2"]:
+            state["anonymous"] = "YES" if msg == "1" else "NO"
+            state["phone"] = "ANONYMOUS" if msg == "1" else phone
+            # State is only dropped once the caller has saved the report
+            return None, state, "ok"
+        return get_message(lang, "invalid_input"), None, "invalid"
+
+    state["step"] = "welcome"
+    return get_message(lang, "welcome"), None, "ok"
+
+def status_query(msg):
+    """(reference_id, language of the keyword or None) for a status request, else None"""
+    match = STATUS_QUERY.match(msg)
+    if not match:
+        return None
+    return match.group(2).upper(), STATUS_KEYWORD_LANGUAGE.get(match.group(1))
+
+def status_reply(phone, query, report):
+    """Reply to a status request; report is the lookup_status() row or None.
+    Doesn't touch the conversation state, so a report in progress carries on."""
+    reference_id, keyword_lang = query
+    lang = (keyword_lang or (report or {}).get("language_preference")
+            or user_state.get(phone, {}).get("language", "en"))
+    if report is None:
+        return get_message(lang, "status_not_found", reference_id=reference_id)
+    names = STATUS_NAMES.get(lang) or STATUS_NAMES.get("en", {})
+    updated = str(report.get("updated_at") or report["created_at"])[:16]
+    return get_message(lang, "status_reply", reference_id=reference_id,
+                       status=names.get(report["status"], report["status"]), updated=updated)
+
+def complete_report(phone, report, reference_id):
+    user_state.pop(phone, None)
+    return get_message(report.get("language", "en"), "confirmation", reference_id=reference_id)
+
+def _record_failure(e):
+    print(f"Error: {e}")
+    metrics.EXCEPTIONS.inc("whatsapp_bot", type(e).__name__)
+    return ERROR_REPLY, "error"
+
+def process_message(phone, msg, save_report, lookup_status=None):
+    """Run one turn with a blocking save_report(data) -> reference_id and
+    lookup_status(reference_id) -> status row or None"""
+    query = status_query(msg) if lookup_status else None
+    if query:
+        try:
+            report = lookup_status(query[0])
+            reply, outcome = status_reply(phone, query, report), "ok" if report else "not_found"
+        except Exception as e:
+            reply, outcome = _record_failure(e)
+        metrics.CONVERSATION_STEPS.inc("status", outcome)
+        return reply
+
+    step = user_state.get(phone, {}).get("step", "welcome")
+    try:
+        reply, report, outcome = advance(phone, msg)
+        if report is not None:
+            reply = complete_report(phone, report, save_report(report))
+    except Exception as e:
+        reply, outcome = _record_failure(e)
+    metrics.CONVERSATION_STEPS.inc(step, outcome)
+    return reply
+
+async def process_message_async(phone, msg, save_report, lookup_status=None):
+    """Run one turn with awaitable save_report and lookup_status"""
+    query = status_query(msg) if lookup_status else None
+    if query:
+        try:
+            report = await lookup_status(query[0])
+            reply, outcome = status_reply(phone, query, report), "ok" if report else "not_found"
+        except Exception as e:
+            reply, outcome = _record_failure(e)
+        metrics.CONVERSATION_STEPS.inc("status", outcome)
+        return reply
+
+    step = user_state.get(phone, {}).get("step", "welcome")
+    try:
+        reply, report, outcome = advance(phone, msg)
+        if report is not None:
+            reply = complete_report(phone, report, await save_report(report))
+    except Exception as e:
+        reply, outcome = _record_failure(e)
+    metrics.CONVERSATION_STEPS.inc(step, outcome)
+    return reply
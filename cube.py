@@ -0,0 +1,334 @@
+"""
+Analytics cube for arbitrary slices of the reports table.
+
+Reports are pre-aggregated into cells over DIMENSIONS (state, fraud
+medium, incident type, status and month of created_at), each holding a
+report count and rupee total. Cells are stored column-wise in NumPy
+arrays: one int32 code array per dimension (with a value dictionary) and
+count/amount arrays. A query filters with vectorised masks and rolls the
+matching cells up to the requested dimensions with np.unique/bincount, so
+it touches thousands of cells rather than millions of rows.
+
+Refresh is incremental, driven by the live feed (live_feed.py):
+- report_created adds the new report as a cell row;
+- report_updated marks that report's month stale; stale months are
+  re-aggregated (one partition on Postgres) once they are older than
+  CUBE_REFRESH_SECONDS, at the next query;
+- reset, and every CUBE_REBUILD_SECONDS (retention drops rows without
+  events), rebuilds everything.
+
+NumPy is only imported when the cube is first queried.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import live_feed
+import metrics
+
+DIMENSIONS = ("location_state", "fraud_medium", "incident_type", "status", "month")
+MEASURES = ("count", "amount")
+REFRESH_SECONDS = float(os.getenv("CUBE_REFRESH_SECONDS", "15"))
+REBUILD_SECONDS = float(os.getenv("CUBE_REBUILD_SECONDS", "3600"))
+MAX_ROWS = 10000
+
+_MONTH = DIMENSIONS.index("month")
+
+CELLS = metrics.gauge(
+    "i4c_cube_cells", "Aggregated cells held by the analytics cube")
+REFRESHES = metrics.counter(
+    "i4c_cube_refreshes_total", "Analytics cube refreshes by kind", ("kind",))
+
+np = None
+
+
+def _numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("The analytics cube needs NumPy: pip install numpy")
+        np = numpy
+    return np
+
+
+def event_cell(payload):
+    """Dimension values of a live feed report event"""
+    created_at = payload.get("created_at") or ""
+    return (payload.get("location_state"), payload.get("fraud_medium"),
+            payload.get("incident_type"), payload.get("status"), created_at[:7])
+
+
+def month_bounds(month):
+    """created_at range of a 'YYYY-MM' month, or None if it isn't one"""
+    try:
+        start = datetime.strptime(month, "%Y-%m")
+    except (TypeError, ValueError):
+        return None
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+# =============================================================================
+# CUBE
+# =============================================================================
+
+class Cube:
+    def __init__(self, repository):
+        self.repository = repository
+        self._values = [[] for _ in DIMENSIONS]   # per dimension: code -> value
+        self._lookup = [{} for _ in DIMENSIONS]   # per dimension: value -> code
+        self._codes = None                        # int32 [len(DIMENSIONS), cells]
+        self._count = None
+        self._amount = None
+        self._compacted = 0                       # cells after the last compaction
+        self._pending = []                        # [(codes, amount)] not yet folded in
+        self._stale = set()                       # months to re-aggregate
+        self._stale_since = None
+        self._rebuild = True
+        self._built_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()             # guards everything above
+        self._refresh_lock = threading.Lock()     # one refresh at a time
+
+    # -- encoding ----------------------------------------------------------------
+
+    def _encode(self, cell):
+        codes = []
+        for dim, value in enumerate(cell):
+            code = self._lookup[dim].get(value)
+            if code is None:
+                code = self._lookup[dim][value] = len(self._values[dim])
+                self._values[dim].append(value)
+            codes.append(code)
+        return codes
+
+    def _arrays(self, rows):
+        """(codes, count, amount) arrays from repository.cube_cells() rows"""
+        np = _numpy()
+        with self._lock:
+            codes = [self._encode([row[dim] for dim in DIMENSIONS]) for row in rows]
+        return (np.array(codes, dtype=np.int32).reshape(-1, len(DIMENSIONS)).T,
+                np.array([row["count"] for row in rows], dtype=np.int64),
+                np.array([row["amount"] or 0 for row in rows], dtype=np.float64))
+
+    # -- live feed -----------------------------------------------------------------
+
+    def on_event(self, event_type, payload):
+        with self._lock:
+            if event_type == "reset":
+                self._rebuild = True
+                return
+            if event_type not in ("report_created", "report_updated"):
+                return
+            if self._refreshing or event_type == "report_updated":
+                # A refresh in flight may or may not have read this report, and
+                # an update doesn't say which cell it left: re-aggregate the month
+                self._stale.add(event_cell(payload)[_MONTH])
+                if self._stale_since is None:
+                    self._stale_since = time.monotonic()
+            elif self._codes is not None and not self._rebuild:
+                self._pending.append((self._encode(event_cell(payload)),
+                                      float(payload.get("amount_involved") or 0)))
+
+    # -- refresh -------------------------------------------------------------------
+
+    def _fold_pending(self):
+        """Append pending report rows; caller holds _lock"""
+        if not self._pending:
+            return
+        np = _numpy()
+        codes = np.array([c for c, _ in self._pending], dtype=np.int32).T
+        self._codes = np.concatenate([self._codes, codes], axis=1)
+        self._count = np.concatenate([self._count, np.ones(len(self._pending), dtype=np.int64)])
+        self._amount = np.concatenate([self._amount, [a for _, a in self._pending]])
+        self._pending = []
+        # Folded reports are one row each; merge them into their cells
+        # once they make up half the cube
+        if self._codes.shape[1] > 2 * max(self._compacted, 1000):
+            self._compact()
+
+    def _compact(self):
+        np = _numpy()
+        self._codes, inverse = np.unique(self._codes, axis=1, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        self._count = np.bincount(inverse, weights=self._count).astype(np.int64)
+        self._amount = np.bincount(inverse, weights=self._amount)
+        self._compacted = self._codes.shape[1]
+        CELLS.set(self._compacted)
+
+    def _full_rebuild(self):
+        with self._lock:
+            self._refreshing = True
+            self._rebuild = False
+            self._pending = []
+            self._stale = set()
+            self._stale_since = None
+        try:
+            codes, count, amount = self._arrays(self.repository.cube_cells())
+        except Exception:
+            with self._lock:
+                self._refreshing = False
+                self._rebuild = True
+            raise
+        with self._lock:
+            self._codes, self._count, self._amount = codes, count, amount
+            self._compacted = codes.shape[1]
+            self._built_at = time.monotonic()
+            self._refreshing = False
+        CELLS.set(self._compacted)
+        REFRESHES.inc("full")
+
+    def _refresh_months(self):
+        np = _numpy()
+        with self._lock:
+            months = self._stale
+            self._stale = set()
+            self._stale_since = None
+            self._refreshing = True
+        fresh = []
+        try:
+            for month in months:
+                bounds = month_bounds(month)
+                if bounds is None:
+                    # Malformed created_at: no range query covers it
+                    raise ValueError(f"not a month: {month!r}")
+                fresh.append(self._arrays(self.repository.cube_cells(*bounds)))
+        except ValueError:
+            with self._lock:
+                self._refreshing = False
+                self._rebuild = True
+            return
+        except Exception:
+            with self._lock:
+                self._refreshing = False
+                self._stale.update(months)
+                self._stale_since = self._stale_since or time.monotonic()
+            raise
+
+        with self._lock:
+            self._fold_pending()
+            codes = [self._lookup[_MONTH][m] for m in months if m in self._lookup[_MONTH]]
+            keep = ~np.isin(self._codes[_MONTH], codes)
+            self._codes = np.concatenate([self._codes[:, keep]] + [c for c, _, _ in fresh], axis=1)
+            self._count = np.concatenate([self._count[keep]] + [n for _, n, _ in fresh])
+            self._amount = np.concatenate([self._amount[keep]] + [a for _, _, a in fresh])
+            self._compacted = self._codes.shape[1]
+            self._refreshing = False
+        CELLS.set(self._compacted)
+        REFRESHES.inc("month", amount=len(months))
+
+    def ensure_fresh(self):
+        """Build on first use, then apply rebuilds and month refreshes that are due"""
+        now = time.monotonic()
+        with self._lock:
+            built = self._codes is not None
+            rebuild = self._rebuild or (built and now - self._built_at >= REBUILD_SECONDS)
+            months_due = self._stale_since is not None and now - self._stale_since >= REFRESH_SECONDS
+
+        if not built:
+            # Queries can't be answered until the first build finishes
+            with self._refresh_lock:
+                if self._codes is None:
+                    self._full_rebuild()
+        elif rebuild or months_due:
+            # Other queries keep answering from the current cells meanwhile
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    if rebuild:
+                        self._full_rebuild()
+                    else:
+                        self._refresh_months()
+                finally:
+                    self._refresh_lock.release()
+
+    # -- queries -------------------------------------------------------------------
+
+    def query(self, dimensions=(), filters=None, month_from=None, month_to=None,
+              sort="count", limit=100):
+        """Roll up to `dimensions`, keeping cells whose values are in `filters`
+        ({dimension: [values]}) and whose month is within month_from..month_to.
+
+        Raises ValueError on an unknown dimension or sort measure.
+        """
+        np = _numpy()
+        for dim in list(dimensions) + list(filters or {}):
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dim}")
+        if sort not in MEASURES:
+            raise ValueError(f"sort must be one of {', '.join(MEASURES)}")
+        if len(set(dimensions)) != len(dimensions):
+            raise ValueError("Dimensions must not repeat")
+
+        started = time.perf_counter()
+        self.ensure_fresh()
+        with self._lock:
+            self._fold_pending()
+            codes, count, amount = self._codes, self._count, self._amount
+            values = [list(v) for v in self._values]
+            wanted = {}
+            for name, allowed in (filters or {}).items():
+                dim = DIMENSIONS.index(name)
+                wanted[dim] = [self._lookup[dim][v] for v in allowed if v in self._lookup[dim]]
+            stale = sorted(self._stale)
+
+        mask = np.ones(codes.shape[1], dtype=bool)
+        for dim, allowed in wanted.items():
+            mask &= np.isin(codes[dim], allowed)
+        if month_from or month_to:
+            months = [code for code, month in enumerate(values[_MONTH])
+                      if month and (not month_from or month >= month_from)
+                      and (not month_to or month <= month_to)]
+            mask &= np.isin(codes[_MONTH], months)
+
+        count, amount = count[mask], amount[mask]
+        result = {
+            "dimensions": list(dimensions),
+            "totals": {"count": int(count.sum()), "amount": round(float(amount.sum()), 2)},
+            "rows": [],
+            "stale_months": stale,
+        }
+        if dimensions:
+            dims = [DIMENSIONS.index(d) for d in dimensions]
+            groups, inverse = np.unique(codes[dims][:, mask], axis=1, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            group_count = np.bincount(inverse, weights=count, minlength=groups.shape[1])
+            group_amount = np.bincount(inverse, weights=amount, minlength=groups.shape[1])
+            measure = group_count if sort == "count" else group_amount
+            order = np.argsort(-measure, kind="stable")[:min(limit, MAX_ROWS)]
+            result["groups"] = int(groups.shape[1])
+            for i in order:
+                row = {name: values[dim][groups[pos, i]]
+                       for pos, (name, dim) in enumerate(zip(dimensions, dims))}
+                row["count"] = int(group_count[i])
+                row["amount"] = round(float(group_amount[i]), 2)
+                result["rows"].append(row)
+        result["query_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "built": self._codes is not None,
+                "cells": 0 if self._codes is None else int(self._codes.shape[1]),
+                "pending": len(self._pending),
+                "stale_months": sorted(self._stale),
+                "dimension_values": {dim: len(v) for dim, v in zip(DIMENSIONS, self._values)},
+            }
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def get_cube(repository):
+    """The process's cube over repository, subscribed to the live feed"""
+    global _cube
+    if _cube is None:
+        with _cube_lock:
+            if _cube is None:
+                cube = Cube(repository)
+                live_feed.broker.add_callback(cube.on_event)
+                _cube = cube
+    return _cube
@@ -1,16 +1,14 @@
-import psycopg2
 import os
+import sqlite3
 from datetime import datetime
 
-def init_database():
-    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
-    c = conn.cursor()
+import partitions
 
-    # Main reports table with all I4C required fields
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS cyber_reports (
-        id SERIAL PRIMARY KEY,
-        
+SQLITE_PRIMARY_KEY = "id INTEGER PRIMARY KEY AUTOINCREMENT"
+
+# cyber_reports columns after id; on Postgres the table is partitioned by
+# month on created_at (see partitions.py)
+REPORT_COLUMNS_DDL = """
         -- User Information
         phone TEXT,
         location_city TEXT,
@@ -44,12 +42,18 @@ def init_database():
         evidence_hash TEXT,
         media_files TEXT,  -- JSON array of file paths
         
+        -- Near-duplicate detection (dedup.py)
+        similarity_signature TEXT,  -- base64 MinHash of description + suspect details
+        cluster_id TEXT,  -- reference_id of the first report in its cluster
+        
         -- Metadata
         anonymous TEXT DEFAULT 'NO',
         reference_id TEXT UNIQUE NOT NULL,
         status TEXT DEFAULT 'NEW',  -- NEW, IN_PROGRESS, ESCALATED, RESOLVED, CLOSED
         priority TEXT DEFAULT 'MEDIUM',  -- LOW, MEDIUM, HIGH, CRITICAL
+        priority_reason TEXT,  -- rules that set it (priority.py), or 'manual'
         assigned_to TEXT,
+        claim_expires_at TEXT,  -- lease on a claimed report (work queue); NULL if assigned by hand
         
         -- I4C Integration
         i4c_synced INTEGER DEFAULT 0,
@@ -65,11 +69,107 @@ def init_database():
         consent_given INTEGER DEFAULT 0,
         data_retention_date TEXT,
         deletion_requested INTEGER DEFAULT 0
-    )
+"""
+
+REPORT_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_reports_status ON cyber_reports(status)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_created ON cyber_reports(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_fraud_medium ON cyber_reports(fraud_medium)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_location ON cyber_reports(location_state, location_city)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_reference ON cyber_reports(reference_id)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_cluster ON cyber_reports(cluster_id)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_triage ON cyber_reports(priority, status, created_at)",
+    # Repeat-suspect counts at ingest (priority.py); most reports name no suspect
+    "CREATE INDEX IF NOT EXISTS idx_reports_suspect_phone ON cyber_reports(suspect_phone) WHERE suspect_phone IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_reports_suspect_upi ON cyber_reports(suspect_upi_id) WHERE suspect_upi_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_reports_suspect_email ON cyber_reports(suspect_email) WHERE suspect_email IS NOT NULL",
+    # Claim-next-case scans open reports only, in priority then age order
+    "CREATE INDEX IF NOT EXISTS idx_reports_work_queue ON cyber_reports(priority, created_at) WHERE status = 'NEW'",
+]
+
+# Columns added after the first release; existing databases get them on init
+ADDED_REPORT_COLUMNS = [
+    ("similarity_signature", "TEXT"),
+    ("cluster_id", "TEXT"),
+    ("priority_reason", "TEXT"),
+    ("claim_expires_at", "TEXT"),
+]
+
+def add_missing_report_columns(c, sqlite=False):
+    """ALTER an existing cyber_reports to add ADDED_REPORT_COLUMNS"""
+    if sqlite:
+        c.execute("PRAGMA table_info(cyber_reports)")
+        existing = {row[1] for row in c.fetchall()}
+    else:
+        c.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'cyber_reports' AND table_schema = current_schema()
+        """)
+        existing = {row["column_name"] if isinstance(row, dict) else row[0]
+                    for row in c.fetchall()}
+
+    for name, column_type in ADDED_REPORT_COLUMNS:
+        if name not in existing:
+            c.execute(f"ALTER TABLE cyber_reports ADD COLUMN {name} {column_type}")
+            print(f"➕ Added cyber_reports.{name}")
+            if name == "cluster_id":
+                # Every existing report starts as its own cluster
+                c.execute("UPDATE cyber_reports SET cluster_id = reference_id")
+
+def create_reports_table(c, sqlite=False, id_column="id SERIAL"):
+    """Create cyber_reports with its indexes (and on Postgres its partitions and trigger)"""
+    if sqlite:
+        c.execute(f"""
+        CREATE TABLE IF NOT EXISTS cyber_reports (
+            {SQLITE_PRIMARY_KEY},
+            {REPORT_COLUMNS_DDL}
+        )
+        """)
+        add_missing_report_columns(c, sqlite=True)
+        for sql in REPORT_INDEXES:
+            c.execute(sql)
+        return
+
+    # Unique constraints on a partitioned table must include the partition
+    # key; the "C" collation makes text order match time order for pruning
+    columns = (REPORT_COLUMNS_DDL
+               .replace("reference_id TEXT UNIQUE NOT NULL", "reference_id TEXT NOT NULL")
+               .replace("created_at TEXT NOT NULL", 'created_at TEXT COLLATE "C" NOT NULL'))
+    c.execute(f"""
+    CREATE TABLE IF NOT EXISTS cyber_reports (
+        {id_column},
+        {columns},
+        PRIMARY KEY (id, created_at),
+        UNIQUE (reference_id, created_at)
+    ) PARTITION BY RANGE (created_at)
     """)
 
+    if not partitions.is_partitioned(c):
+        print("⚠️ cyber_reports is not partitioned yet, run: python partitions.py migrate")
+    else:
+        c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {partitions.DEFAULT_PARTITION}
+        PARTITION OF cyber_reports DEFAULT
+        """)
+        partitions.ensure_partitions(c)
+
+    add_missing_report_columns(c)
+    for sql in REPORT_INDEXES:
+        c.execute(sql)
+    create_report_events_trigger(c)
+
+def create_schema(c, sqlite=False):
+    """Create all tables and indexes; DDL is written for Postgres"""
+    def execute(sql):
+        if sqlite:
+            sql = sql.replace("id SERIAL PRIMARY KEY", SQLITE_PRIMARY_KEY)
+        c.execute(sql)
+
+    # Main reports table with all I4C required fields
+    create_reports_table(c, sqlite)
+
     # Admin users table
-    c.execute("""
+    execute("""
     CREATE TABLE IF NOT EXISTS admin_users (
         id SERIAL PRIMARY KEY,
         username TEXT UNIQUE NOT NULL,
@@ -84,7 +184,7 @@ def init_database():
     """)
 
     # Case notes/comments table
-    c.execute("""
+    execute("""
     CREATE TABLE IF NOT EXISTS case_notes (
         id SERIAL PRIMARY KEY,
         report_id INTEGER NOT NULL,
@@ -92,13 +192,16 @@ def init_database():
         note TEXT NOT NULL,
         note_type TEXT DEFAULT 'COMMENT',  -- COMMENT, STATUS_UPDATE, ESCALATION
         created_at TEXT NOT NULL,
-        FOREIGN KEY (report_id) REFERENCES cyber_reports(id),
+        {report_fk}
         FOREIGN KEY (admin_id) REFERENCES admin_users(id)
     )
-    """)
+    """.format(
+        # Postgres can't reference id alone on the partitioned cyber_reports
+        report_fk="FOREIGN KEY (report_id) REFERENCES cyber_reports(id)," if sqlite else ""
+    ))
 
     # Audit log for DPDP compliance
-    c.execute("""
+    execute("""
     CREATE TABLE IF NOT EXISTS audit_log (
         id SERIAL PRIMARY KEY,
         action TEXT NOT NULL,
@@ -113,7 +216,7 @@ def init_database():
     """)
 
     # Analytics cache table
-    c.execute("""
+    execute("""
     CREATE TABLE IF NOT EXISTS analytics_cache (
         id SERIAL PRIMARY KEY,
         metric_name TEXT NOT NULL,
@@ -123,8 +226,30 @@ def init_database():
     )
     """)
 
+    # Outbound WhatsApp notifications on status changes (notifications.py);
+    # a citizen is told about each status of a report at most once
+    execute("""
+    CREATE TABLE IF NOT EXISTS notifications (
+        id SERIAL PRIMARY KEY,
+        report_id INTEGER NOT NULL,
+        reference_id TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        language TEXT DEFAULT 'en',
+        status TEXT NOT NULL,  -- report status the message announces
+        state TEXT DEFAULT 'PENDING',  -- PENDING, SENT, FAILED
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at TEXT NOT NULL,  -- due time; pushed ahead while a sender holds it
+        last_error TEXT,
+        provider_sid TEXT,  -- Twilio message SID
+        created_at TEXT NOT NULL,
+        sent_at TEXT,
+        UNIQUE (report_id, status)
+    )
+    """)
+    execute("CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications(next_attempt_at) WHERE state = 'PENDING'")
+
     # User consent records for DPDP
-    c.execute("""
+    execute("""
     CREATE TABLE IF NOT EXISTS user_consents (
         id SERIAL PRIMARY KEY,
         phone TEXT NOT NULL,
@@ -135,12 +260,42 @@ def init_database():
     )
     """)
 
-    # Create indexes for performance
-    c.execute("CREATE INDEX IF NOT EXISTS idx_reports_status ON cyber_reports(status)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_reports_created ON cyber_reports(created_at)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_reports_fraud_medium ON cyber_reports(fraud_medium)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_reports_location ON cyber_reports(location_state, location_city)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_reports_reference ON cyber_reports(reference_id)")
+
+def create_report_events_trigger(c):
+    """NOTIFY the dashboard live feed (live_feed.py) on report inserts, status changes and claims"""
+    from live_feed import NOTIFY_CHANNEL, EVENT_FIELDS
+    fields = ", ".join(f"'{field}', NEW.{field}" for field in EVENT_FIELDS)
+
+    # Bulk loads can opt out with: SET i4c.live_feed = 'off'
+    c.execute(f"""
+    CREATE OR REPLACE FUNCTION notify_report_event() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('i4c.live_feed', true) = 'off' THEN
+            RETURN NULL;
+        END IF;
+        PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+            'type', CASE TG_OP WHEN 'INSERT' THEN 'report_created' ELSE 'report_updated' END,
+            'data', json_build_object({fields})
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    c.execute("DROP TRIGGER IF EXISTS report_events ON cyber_reports")
+    c.execute("""
+    CREATE TRIGGER report_events
+    AFTER INSERT OR UPDATE OF status, priority, assigned_to ON cyber_reports
+    FOR EACH ROW EXECUTE FUNCTION notify_report_event()
+    """)
+
+def init_database():
+    import psycopg2
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    c = conn.cursor()
+
+    create_schema(c)
+    # A duplicate admin below aborts the transaction; keep the schema changes
+    conn.commit()
 
     # Insert default admin user (password: admin123)
     # In production, use proper password hashing with bcrypt
@@ -160,13 +315,47 @@ def init_database():
             datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ))
     except psycopg2.IntegrityError:
+        conn.rollback()
         print("Default admin user already exists")
 
     conn.commit()
     conn.close()
     print("✅ Database initialized successfully with all I4C requirements!")
-    print("📊 Tables created: cyber_reports, admin_users, case_notes, audit_log, analytics_cache, user_consents")
+    print("📊 Tables created: cyber_reports, admin_users, case_notes, audit_log, analytics_cache, notifications, user_consents")
     print("🔐 Default admin credentials: username=admin, password=admin123 (CHANGE IN PRODUCTION!)")
 
+def init_sqlite_database(path=None):
+    """Create the embedded SQLite database used by storage.SQLiteRepository"""
+    from config import Config
+    path = path or os.getenv("DATABASE_PATH", Config.DATABASE_PATH)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    c = conn.cursor()
+
+    create_schema(c, sqlite=True)
+
+    import hashlib
+    admin_pass = hashlib.sha256("admin123".encode()).hexdigest()
+    c.execute("""
+        INSERT OR IGNORE INTO admin_users (username, password_hash, full_name, email, role, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (
+        "admin",
+        admin_pass,
+        "System Administrator",
+        "admin@i4c.gov.in",
+        "SUPER_ADMIN",
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ))
+
+    conn.commit()
+    conn.close()
+    print(f"✅ SQLite database initialized at {path}")
+
 if __name__ == "__main__":
-    init_database()
+    backend = os.getenv("STORAGE_BACKEND") or ("postgres" if os.getenv("DATABASE_URL") else "sqlite")
+    if backend == "sqlite":
+        init_sqlite_database()
+    else:
+        init_database()
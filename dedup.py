@@ -0,0 +1,367 @@
+"""
+Near-duplicate complaint detection.
+
+Each report gets a MinHash signature over word shingles of its normalised
+description plus the phone numbers, UPI IDs, emails and domains found in
+the description and suspect details. An LSH index (16 bands of 4 rows)
+finds earlier reports with a similar signature without comparing against
+all of them; the best match above SIMILARITY_THRESHOLD puts the new report
+in that report's cluster.
+
+cluster_id is the reference_id of the first report in a cluster, so a
+singleton's cluster_id is its own reference_id. Signatures are stored with
+the report (similarity_signature) and the index is rebuilt from the most
+recent DEDUP_MAX_ENTRIES of them at startup; each worker then picks up
+the other workers' reports every DEDUP_SYNC_SECONDS.
+
+Reports saved before this existed are signed with:
+    python dedup.py backfill
+and picked up by running workers at their next restart.
+"""
+import base64
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import metrics
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 2
+SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+REPRESENTED_SIMILARITY = 0.9
+MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "200000"))
+SYNC_SECONDS = float(os.getenv("DEDUP_SYNC_SECONDS", "2"))
+SYNC_LOOKBACK_SECONDS = 30
+
+_MERSENNE = (1 << 61) - 1
+_MASK32 = 0xFFFFFFFF
+
+# Fixed seed so signatures stay comparable across processes and restarts
+_rng = random.Random(1930)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE))
+                 for _ in range(NUM_PERM)]
+
+_PHONE = re.compile(r"(?:\+?91[\s-]?)?([6-9]\d{9})\b")
+_UPI_OR_EMAIL = re.compile(r"[\w.\-]+@[\w.\-]+")
+_DOMAIN = re.compile(r"(?:https?://)?(?:www\.)?([a-z0-9\-]+(?:\.[a-z0-9\-]+)*\.[a-z]{2,})", re.I)
+_DIGITS = re.compile(r"\d+")
+
+CANDIDATES = metrics.histogram(
+    "i4c_dedup_candidates", "LSH candidates compared per new report", buckets=metrics.ROW_BUCKETS)
+LINK_LATENCY = metrics.histogram(
+    "i4c_dedup_link_duration_seconds", "Time to sign a report and look up its cluster")
+LINKED = metrics.counter(
+    "i4c_dedup_reports_total", "Reports checked for near-duplicates by outcome", ("outcome",))
+
+# =============================================================================
+# SIGNATURES
+# =============================================================================
+
+def identifiers(text):
+    """Suspect identifiers in free text: phone numbers, UPI IDs/emails, domains"""
+    text = text.lower()
+    found = {f"phone:{m}" for m in _PHONE.findall(text)}
+    found.update(f"id:{m.strip('.')}" for m in _UPI_OR_EMAIL.findall(text))
+    # Not the domains of those: every report with a gmail.com address would
+    # share a feature
+    found.update(f"site:{m}" for m in _DOMAIN.findall(_UPI_OR_EMAIL.sub(" ", text)))
+    return found
+
+
+def suspect_fields(text):
+    """First phone number, UPI ID and email in free text, by cyber_reports column"""
+    text = text.lower()
+    fields = {}
+    phone = _PHONE.search(text)
+    if phone:
+        fields["suspect_phone"] = phone.group(1)
+    for match in _UPI_OR_EMAIL.findall(text):
+        handle = match.strip(".")
+        # UPI handles end in a bank code (name@okaxis), emails in a domain
+        column = "suspect_email" if "." in handle.partition("@")[2] else "suspect_upi_id"
+        fields.setdefault(column, handle)
+    return fields
+
+
+def words(text):
+    """Lowercased words; digit runs collapse so OTPs and amounts don't matter"""
+    text = _DIGITS.sub("#", unicodedata.normalize("NFC", text.casefold()))
+    cleaned = "".join(ch if unicodedata.category(ch)[0] in ("L", "M", "N") or ch == "#" else " "
+                      for ch in text)
+    return cleaned.split()
+
+
+def shingles(description, suspect_details=""):
+    tokens = words(description)
+    found = {" ".join(tokens[i:i + SHINGLE_SIZE])
+             for i in range(max(len(tokens) - SHINGLE_SIZE + 1, 0))}
+    if 0 < len(tokens) < SHINGLE_SIZE:
+        found.add(tokens[0])
+    found.update(identifiers(f"{description} {suspect_details}"))
+    return found
+
+
+def signature(features):
+    """MinHash signature (array of NUM_PERM uint32) of a set of strings, or None"""
+    if not features:
+        return None
+    hashes = [zlib.crc32(f.encode()) for f in features]
+    sig = array("I")
+    for a, b in _PERMUTATIONS:
+        sig.append(min(((a * h + b) % _MERSENNE) & _MASK32 for h in hashes))
+    return sig
+
+
+def report_signature(data):
+    description = (data.get("description") or "").strip()
+    # "skip" and one-word replies carry nothing to match on
+    if len(description) < 12:
+        return None
+    return signature(shingles(description, data.get("suspect_other") or ""))
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two feature sets"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def encode(sig):
+    return base64.b64encode(sig.tobytes()).decode("ascii")
+
+
+def decode(text):
+    sig = array("I")
+    sig.frombytes(base64.b64decode(text))
+    return sig if len(sig) == NUM_PERM else None
+
+# =============================================================================
+# LSH INDEX
+# =============================================================================
+
+class LSHIndex:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # reference_id -> (signature, cluster_id)
+        self._buckets = {}              # (band, band hash) -> set of reference_ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, reference_id):
+        return reference_id in self._entries
+
+    @staticmethod
+    def _band_keys(sig):
+        return [(band, hash(tuple(sig[band * ROWS:(band + 1) * ROWS]))) for band in range(BANDS)]
+
+    def _candidates(self, keys):
+        found = set()
+        for key in keys:
+            found.update(self._buckets.get(key, ()))
+        return found
+
+    def add(self, reference_id, sig, cluster_id):
+        """Index a report; returns False when its cluster already has a
+        near-identical member, so a mass-forwarded message costs one entry
+        instead of growing its buckets with every copy"""
+        keys = self._band_keys(sig)
+        cluster_id = cluster_id or reference_id
+        with self._lock:
+            if reference_id in self._entries:
+                return False
+            for other in self._candidates(keys):
+                other_sig, other_cluster = self._entries[other]
+                if other_cluster == cluster_id and similarity(sig, other_sig) >= REPRESENTED_SIMILARITY:
+                    return False
+            self._entries[reference_id] = (sig, cluster_id)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(reference_id)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+        return True
+
+    def _evict_oldest(self):
+        reference_id, (sig, _) = self._entries.popitem(last=False)
+        for key in self._band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(reference_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def best_match(self, sig):
+        """(cluster_id, similarity) of the closest indexed report, or (None, 0)"""
+        keys = self._band_keys(sig)
+        with self._lock:
+            entries = [self._entries[ref] for ref in self._candidates(keys)]
+        CANDIDATES.observe(len(entries))
+
+        best_cluster, best_score = None, 0.0
+        for other, cluster_id in entries:
+            score = similarity(sig, other)
+            if score > best_score:
+                best_cluster, best_score = cluster_id, score
+        return best_cluster, best_score
+
+# =============================================================================
+# INGEST
+# =============================================================================
+
+index = LSHIndex()
+
+_sync_thread = None
+_sync_pid = None
+_sync_lock = threading.Lock()
+_synced_until = None
+
+
+def link(data):
+    """Sign a finished report and point it at its near-duplicate cluster.
+
+    Sets data["similarity_signature"] and data["cluster_id"] (None for a new
+    cluster; storage then uses the report's own reference_id). Returns the
+    signature for remember().
+    """
+    started = time.perf_counter()
+    try:
+        sig = report_signature(data)
+        data["similarity_signature"] = encode(sig) if sig is not None else None
+        data["cluster_id"] = None
+        if sig is None:
+            LINKED.inc("skipped")
+            return None
+
+        cluster_id, score = index.best_match(sig)
+        if cluster_id is not None and score >= SIMILARITY_THRESHOLD:
+            data["cluster_id"] = cluster_id
+            LINKED.inc("linked")
+        else:
+            LINKED.inc("new_cluster")
+        return sig
+    finally:
+        # Skipped reports too, so the count matches every report checked
+        LINK_LATENCY.observe(time.perf_counter() - started)
+
+
+def remember(reference_id, sig, data):
+    """Add a saved report to the in-memory index"""
+    if sig is not None:
+        index.add(reference_id, sig, data.get("cluster_id"))
+
+
+def ingest(rows):
+    """Index rows of (reference_id, cluster_id, similarity_signature, created_at)"""
+    global _synced_until
+    for row in rows:
+        row = dict(row)
+        sig = decode(row["similarity_signature"]) if row["similarity_signature"] else None
+        if sig is not None:
+            index.add(row["reference_id"], sig, row["cluster_id"])
+        if _synced_until is None or row["created_at"] > _synced_until:
+            _synced_until = row["created_at"]
+
+
+def _lookback(created_at):
+    """created_at is stamped before the INSERT commits, so re-read a margin
+    to catch reports that committed after newer ones"""
+    try:
+        since = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S") - timedelta(seconds=SYNC_LOOKBACK_SECONDS)
+    except ValueError:
+        return created_at
+    return since.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _run(repository):
+    global _synced_until
+    loaded = False
+    while True:
+        try:
+            if not loaded:
+                started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                # Oldest first so the most recent reports survive eviction
+                ingest(reversed(repository.recent_signatures(index.max_entries)))
+                # With nothing signed yet (before a backfill) sync from the
+                # load time rather than reloading everything every time
+                if _synced_until is None:
+                    _synced_until = started
+                loaded = True
+                print(f"🧬 Near-duplicate index loaded with {len(index)} reports")
+            else:
+                ingest(repository.signatures_since(_lookback(_synced_until)))
+        except Exception as e:
+            print(f"Dedup index sync error: {e}")
+            metrics.EXCEPTIONS.inc("dedup_sync", type(e).__name__)
+        time.sleep(SYNC_SECONDS)
+
+
+def ensure_loaded(repository):
+    """Load the index in the background once per process and keep it in sync
+    with reports saved by other workers"""
+    global _sync_thread, _sync_pid
+    pid = os.getpid()
+    if _sync_pid == pid:
+        return
+    with _sync_lock:
+        if _sync_pid == pid:
+            return
+        _sync_thread = threading.Thread(target=_run, args=(repository,),
+                                        name="dedup-index", daemon=True)
+        _sync_thread.start()
+        _sync_pid = pid
+
+
+def check():
+    """Health-probe detail for the near-duplicate index"""
+    return {"indexed_reports": len(index), "synced_until": _synced_until}
+
+# =============================================================================
+# BACKFILL
+# =============================================================================
+
+def backfill(repository, batch_size=500):
+    """Sign and cluster reports saved before dedup existed, oldest first"""
+    ingest(reversed(repository.recent_signatures(index.max_entries)))
+    after_id, signed = 0, 0
+    while True:
+        rows = repository.unsigned_reports(after_id, batch_size)
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            data = {"description": row["incident_description"],
+                    "suspect_other": row["suspect_other_details"]}
+            sig = link(data)
+            remember(row["reference_id"], sig, data)
+            updates.append((data["similarity_signature"],
+                            data["cluster_id"] or row["reference_id"], row["id"]))
+            signed += sig is not None
+        repository.set_clusters(updates)
+        after_id = rows[-1]["id"]
+    return signed
+
+
+def main():
+    import argparse
+    from app import repository
+
+    parser = argparse.ArgumentParser(description="Near-duplicate complaint clusters")
+    parser.add_argument("command", choices=["backfill"])
+    parser.parse_args()
+
+    started = time.perf_counter()
+    signed = backfill(repository)
+    print(f"✅ Signed {signed} reports in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
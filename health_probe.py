@@ -0,0 +1,100 @@
+"""
+Background health prober.
+
+Checks registered with register_check() run on a daemon thread every
+HEALTH_PROBE_INTERVAL seconds. The liveness/readiness endpoints only read
+the last snapshot, so probes from a load balancer never touch the database.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+probe_interval = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))
+# A snapshot older than this many intervals means the prober itself is stuck
+STALE_AFTER_INTERVALS = 3
+
+_checks = {}
+_snapshot = None
+_lock = threading.Lock()
+_thread = None
+_thread_pid = None
+_started_at = time.time()
+
+
+def register_check(name, fn, critical=True):
+    """Register a probe; fn returns a detail dict (or None) and raises on failure"""
+    _checks[name] = (fn, critical)
+
+
+def probe_once():
+    """Run every registered check and publish the resulting snapshot"""
+    global _snapshot
+    started = time.perf_counter()
+    results = {}
+    for name, (fn, critical) in list(_checks.items()):
+        check_started = time.perf_counter()
+        try:
+            detail = fn() or {}
+            ok, error = True, None
+        except Exception as e:
+            detail, ok, error = {}, False, str(e)
+        results[name] = {
+            "ok": ok,
+            "critical": critical,
+            "latency_ms": round((time.perf_counter() - check_started) * 1000, 3),
+            "error": error,
+            **detail,
+        }
+
+    snapshot = {
+        "checks": results,
+        "ready": all(r["ok"] for r in results.values() if r["critical"]),
+        "checked_at": datetime.now().isoformat(),
+        "checked_monotonic": time.monotonic(),
+        "probe_latency_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+    with _lock:
+        _snapshot = snapshot
+    return snapshot
+
+
+def _run():
+    while True:
+        try:
+            probe_once()
+        except Exception as e:
+            print(f"Health probe error: {e}")
+        time.sleep(probe_interval)
+
+
+def ensure_started():
+    """Start the prober thread once per process (safe to call on every request)"""
+    global _thread, _thread_pid
+    pid = os.getpid()
+    if _thread_pid == pid:
+        return
+    with _lock:
+        if _thread_pid == pid:
+            return
+        # A forked worker inherits the flag but not the thread, so key on pid
+        _thread = threading.Thread(target=_run, name="health-prober", daemon=True)
+        _thread.start()
+        _thread_pid = pid
+
+
+def snapshot():
+    """Last published snapshot plus its age; None until the first probe finishes"""
+    with _lock:
+        current = _snapshot
+    if current is None:
+        return None
+    age_s = time.monotonic() - current["checked_monotonic"]
+    result = {k: v for k, v in current.items() if k != "checked_monotonic"}
+    result["age_seconds"] = round(age_s, 3)
+    result["stale"] = age_s > probe_interval * STALE_AFTER_INTERVALS
+    return result
+
+
+def uptime_seconds():
+    return round(time.time() - _started_at, 3)
@@ -0,0 +1,308 @@
+"""
+Live report feed for the admin dashboard (server-sent events).
+
+Report inserts and status, priority and assignment changes are published to an in-process
+broker that fans each event out to every connected dashboard tab:
+
+- SQLite: SQLiteRepository publishes after each commit.
+- Postgres: a trigger on cyber_reports (db_init.py) sends NOTIFY on the
+  report_events channel, and one LISTEN connection per process relays the
+  notifications into the broker, so events from every worker reach every
+  tab without any extra queries.
+
+The broker keeps the last LIVE_FEED_HISTORY events so a reconnecting
+EventSource resumes from its Last-Event-ID. Event IDs are only meaningful
+to the process that issued them; when an ID can't be resumed the client
+gets a "reset" event and should refetch the lists it shows.
+"""
+import asyncio
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+import metrics
+
+NOTIFY_CHANNEL = "report_events"
+
+# Fields sent with every report event; the Postgres trigger sends the same set
+EVENT_FIELDS = ("id", "reference_id", "status", "priority", "assigned_to", "fraud_medium",
+                "incident_type", "location_state", "amount_involved",
+                "cluster_id", "created_at", "updated_at")
+
+HISTORY_SIZE = int(os.getenv("LIVE_FEED_HISTORY", "500"))
+MAX_PENDING = int(os.getenv("LIVE_FEED_MAX_PENDING", "100"))
+HEARTBEAT_SECONDS = float(os.getenv("LIVE_FEED_HEARTBEAT", "15"))
+RETRY_MS = 3000
+
+SUBSCRIBERS = metrics.gauge(
+    "i4c_live_feed_subscribers", "Dashboard tabs connected to the live feed")
+EVENTS = metrics.counter(
+    "i4c_live_feed_events_total", "Events published to the live feed", ("type",))
+OVERFLOWS = metrics.counter(
+    "i4c_live_feed_overflows_total", "Subscribers disconnected for falling behind")
+
+# =============================================================================
+# BROKER
+# =============================================================================
+
+class Subscription:
+    """Pending events for one client, waited on from a thread or an event loop"""
+
+    def __init__(self, max_pending, loop=None):
+        self.max_pending = max_pending
+        self.overflowed = False
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._loop = loop
+        if loop is None:
+            self._ready = threading.Event()
+        else:
+            self._ready = asyncio.Event()
+
+    def deliver(self, event, force=False):
+        with self._lock:
+            if self.overflowed:
+                return
+            if len(self._events) >= self.max_pending and not force:
+                # A slow client stops receiving instead of growing memory; it
+                # reconnects and replays what it missed from the history
+                self.overflowed = True
+                OVERFLOWS.inc()
+            else:
+                self._events.append(event)
+        if self._loop is None:
+            self._ready.set()
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # Event loop already closed; the stream is gone
+                self.overflowed = True
+
+    def _drain(self):
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            self._ready.clear()
+        return events
+
+    def wait(self, timeout):
+        """Block up to timeout seconds; returns the pending events (maybe none)"""
+        self._ready.wait(timeout)
+        return self._drain()
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._drain()
+
+
+class Broker:
+    def __init__(self, history=HISTORY_SIZE, max_pending=MAX_PENDING):
+        # Distinguishes this process's event IDs from another worker's or
+        # from before a restart
+        self.boot_id = secrets.token_hex(4)
+        self.max_pending = max_pending
+        self._seq = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def _event(self, event_type, data):
+        self._seq += 1
+        return (self._seq, f"{self.boot_id}-{self._seq}", event_type, data)
+
+    def publish(self, event_type, payload):
+        data = json.dumps(payload, default=str)
+        with self._lock:
+            event = self._event(event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.deliver(event)
+        for callback in self._callbacks:
+            try:
+                callback(event_type, payload)
+            except Exception as e:
+                print(f"Live feed callback error: {e}")
+                metrics.EXCEPTIONS.inc("live_feed_callback", type(e).__name__)
+        EVENTS.inc(event_type)
+        return event[1]
+
+    def add_callback(self, fn):
+        """Call fn(event_type, payload) in the publishing thread for every event"""
+        self._callbacks.append(fn)
+
+    def _replay(self, last_event_id):
+        """Events after last_event_id, or a reset event when it can't be resumed"""
+        if not last_event_id:
+            return []
+        boot_id, _, seq = last_event_id.rpartition("-")
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if boot_id != self.boot_id or not seq.isdigit() or int(seq) < oldest - 1:
+            # Carries the latest ID: once the client has refetched its lists
+            # it is caught up to this point
+            return [(self._seq, f"{self.boot_id}-{self._seq}", "reset", "{}")]
+        seq = int(seq)
+        return [event for event in self._history if event[0] > seq]
+
+    def subscribe(self, last_event_id=None, loop=None):
+        sub = Subscription(self.max_pending, loop)
+        with self._lock:
+            for event in self._replay(last_event_id):
+                sub.deliver(event, force=True)
+            self._subscribers.add(sub)
+        SUBSCRIBERS.inc()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub not in self._subscribers:
+                return
+            self._subscribers.discard(sub)
+        SUBSCRIBERS.dec()
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+broker = Broker()
+
+
+def publish(event_type, payload):
+    return broker.publish(event_type, payload)
+
+
+def report_event(row):
+    """Trim a cyber_reports row (dict) to the fields sent on the feed"""
+    return {field: row.get(field) for field in EVENT_FIELDS}
+
+# =============================================================================
+# SERVER-SENT EVENTS
+# =============================================================================
+
+def format_event(event):
+    _, event_id, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+def stream(last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """SSE text chunks for a threaded server; unsubscribes when the client goes away"""
+    # Subscribing inside the generator ties the subscription to its cleanup
+    sub = broker.subscribe(last_event_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            events = sub.wait(heartbeat)
+            # A comment line keeps proxies from closing an idle connection and
+            # surfaces a disconnected client as a write error
+            yield "".join(format_event(e) for e in events) if events else ": keepalive\n\n"
+            if sub.overflowed:
+                return
+    finally:
+        broker.unsubscribe(sub)
+
+
+async def stream_async(last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """Same as stream() for the ASGI app"""
+    sub = broker.subscribe(last_event_id, loop=asyncio.get_running_loop())
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            events = await sub.wait_async(heartbeat)
+            yield "".join(format_event(e) for e in events) if events else ": keepalive\n\n"
+            if sub.overflowed:
+                return
+    finally:
+        broker.unsubscribe(sub)
+
+# =============================================================================
+# POSTGRES LISTENER
+# =============================================================================
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+# Primary's WAL position after the last relayed batch, past every change in
+# it (replica.py keeps reads off a replica that hasn't replayed this far)
+primary_lsn = 0
+
+
+def parse_lsn(text):
+    """'16/B374D848' -> a comparable int"""
+    high, _, low = text.partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def relay(payload):
+    """Publish one NOTIFY payload from the report_events trigger"""
+    try:
+        message = json.loads(payload)
+        publish(message["type"], message["data"])
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ Ignoring malformed {NOTIFY_CHANNEL} payload: {e}")
+
+
+def _listen(database_url):
+    global primary_lsn
+    import select
+    import psycopg2
+
+    backoff = 1
+    connected_before = False
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(database_url)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            if connected_before:
+                # Anything committed while we were disconnected was missed
+                publish("reset", {})
+            connected_before = True
+            backoff = 1
+            print(f"📡 Listening on {NOTIFY_CHANNEL}")
+            while True:
+                if select.select([conn], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    batch = conn.notifies[:]
+                    del conn.notifies[:]
+                    # NOTIFY arrives after commit, so this is at or past every commit
+                    # in the batch (the query may bring in more notifies)
+                    cur.execute("SELECT pg_current_wal_lsn()")
+                    primary_lsn = parse_lsn(cur.fetchone()[0])
+                    for notify in batch:
+                        relay(notify.payload)
+        except Exception as e:
+            print(f"Live feed listener error: {e}")
+            metrics.EXCEPTIONS.inc("live_feed_listener", type(e).__name__)
+        finally:
+            if conn is not None:
+                conn.close()
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 30)
+
+
+def ensure_listener(database_url):
+    """Start the process's LISTEN thread once (safe to call per request)"""
+    global _listener, _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        _listener = threading.Thread(target=_listen, args=(database_url,),
+                                     name="live-feed-listener", daemon=True)
+        _listener.start()
+        _listener_pid = pid
@@ -0,0 +1,193 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are aggregated in memory behind one lock
+per metric, so recording is a dict lookup plus an add and is safe to call
+from any request thread.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000, 10000)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _series_key(item):
+    return tuple(str(v) for v in item[0])
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def series(self):
+        """{label values: value} for every series recorded so far"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items(), key=_series_key)
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(((key, list(series)) for key, series in self._values.items()),
+                           key=_series_key)
+        for key, series in items:
+            cumulative = 0
+            bounds = [str(b) for b in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _register(metric):
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name, help_text, labels=()):
+    return _register(Counter(name, help_text, labels))
+
+
+def gauge(name, help_text, labels=()):
+    return _register(Gauge(name, help_text, labels))
+
+
+def histogram(name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def render():
+    """Render every registered metric in Prometheus text format"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# =============================================================================
+# SQL NORMALISATION
+# =============================================================================
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_normalized_cache = {}
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and literals so one statement maps to one label"""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    cached = _normalized_cache.get(sql)
+    if cached is not None:
+        return cached
+    text = _STRING_LITERAL.sub("?", sql)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    if len(_normalized_cache) < 1000:
+        _normalized_cache[sql] = text
+    return text
+
+# =============================================================================
+# APPLICATION METRICS
+# =============================================================================
+
+REQUEST_LATENCY = histogram(
+    "i4c_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status"))
+QUERY_LATENCY = histogram(
+    "i4c_db_query_duration_seconds", "SQL statement latency", ("statement",))
+QUERY_ROWS = histogram(
+    "i4c_db_query_rows", "Rows returned or affected per SQL statement",
+    ("statement",), buckets=ROW_BUCKETS)
+DB_CONNECTIONS_OPENED = counter(
+    "i4c_db_connections_opened_total", "Database connections opened")
+DB_CONNECTIONS_OPEN = gauge(
+    "i4c_db_connections_open", "Database connections currently open")
+CONVERSATION_STEPS = counter(
+    "i4c_conversation_steps_total", "WhatsApp messages handled by conversation step and outcome",
+    ("step", "outcome"))
+EXCEPTIONS = counter(
+    "i4c_exceptions_total", "Exceptions caught by location and type", ("where", "type"))
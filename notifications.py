@@ -0,0 +1,309 @@
+"""
+Outbound WhatsApp notifications on case status changes.
+
+When an admin moves a report to one of NOTIFY_STATUSES and the citizen
+didn't file anonymously, update_report_status queues a row in the
+notifications table (at most one per report and status). Each worker
+process runs a sender thread that claims due rows NOTIFY_BATCH_SIZE at a
+time (SKIP LOCKED on Postgres, so two workers never hold the same row),
+renders them in the report's language from MESSAGES['status_notification']
+and posts them to the Twilio Messages API over one keep-alive
+requests.Session, NOTIFY_CONCURRENCY requests in flight at most.
+
+Claiming pushes a row's next_attempt_at SEND_LEASE ahead, so a worker that
+dies mid-batch leaves its rows to be sent again later. Network errors and
+5xx responses retry with exponential backoff up to NOTIFY_MAX_ATTEMPTS. A
+429 pauses the sender for Retry-After (or the backoff); the rejected rows
+and the rest of the batch go back unsent, without using up an attempt, so
+rate limiting alone never fails a notification. Other 4xx errors
+fail the row at once: a bad number doesn't get better with retries.
+
+Without Twilio credentials rows stay queued until they are configured.
+NOTIFY_SENDER=0 keeps a process from sending (e.g. to send from cron
+instead), and TWILIO_API_BASE points the sender at a local stand-in for
+testing.
+    python notifications.py drain     # send what's due now, then exit
+    python notifications.py stats
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import metrics
+from conversation import STATUS_NAMES, get_message
+
+try:
+    from config import Config
+except ImportError:
+    Config = None
+
+NOTIFY_STATUSES = ("ESCALATED", "RESOLVED")
+BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "100"))
+CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "4"))
+MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+POLL_SECONDS = float(os.getenv("NOTIFY_POLL_SECONDS", "5"))
+BACKOFF_SECONDS = float(os.getenv("NOTIFY_BACKOFF_SECONDS", "30"))
+MAX_BACKOFF_SECONDS = 3600
+SEND_LEASE = timedelta(minutes=5)
+REQUEST_TIMEOUT = (5, 15)   # connect, read
+
+NOTIFICATIONS = metrics.counter(
+    "i4c_notifications_total", "Outbound WhatsApp notifications by outcome", ("outcome",))
+SEND_LATENCY = metrics.histogram(
+    "i4c_notification_send_duration_seconds", "Twilio Messages API request time")
+
+_session = None
+_executor = None
+_client_pid = None
+_paused_until = 0.0     # monotonic time a 429 holds sends until
+_wake = threading.Event()
+_sender_pid = None
+_sender_lock = threading.Lock()
+
+
+def configured():
+    return bool(Config and Config.TWILIO_ACCOUNT_SID and Config.TWILIO_AUTH_TOKEN)
+
+
+def sender_enabled():
+    # Read when a sender would start, not at import: scripts turn it off
+    # after something has already imported this module
+    return os.getenv("NOTIFY_SENDER", "1") != "0"
+
+
+def _stamp(moment):
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+# =============================================================================
+# QUEUE
+# =============================================================================
+
+def queue(repository, report_id, status):
+    """Queue the citizen's notification of a status change; returns whether
+    one was queued. Never raises: the status change has already committed."""
+    if status not in NOTIFY_STATUSES:
+        return False
+    try:
+        queued = repository.queue_notification(report_id, status, _stamp(datetime.now()))
+    except Exception as e:
+        print(f"Notification queue error: {e}")
+        metrics.EXCEPTIONS.inc("notifications", type(e).__name__)
+        return False
+    if queued:
+        NOTIFICATIONS.inc("queued")
+        _wake.set()
+    return queued
+
+
+def render(row):
+    """Message text for a notifications row, in the report's language"""
+    lang = row["language"] or "en"
+    names = STATUS_NAMES.get(lang) or STATUS_NAMES.get("en", {})
+    return get_message(lang, "status_notification", reference_id=row["reference_id"],
+                       status=names.get(row["status"], row["status"]))
+
+# =============================================================================
+# TWILIO
+# =============================================================================
+
+def _client():
+    """(session, executor) for this process: the session keeps up to
+    CONCURRENCY connections to Twilio alive between batches"""
+    global _session, _executor, _client_pid
+    pid = os.getpid()
+    if _client_pid != pid:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CONCURRENCY)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.auth = (Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
+        _session = session
+        _executor = ThreadPoolExecutor(CONCURRENCY, thread_name_prefix="notify")
+        _client_pid = pid
+    return _session, _executor
+
+
+def messages_url():
+    base = Config.TWILIO_API_BASE.rstrip("/")
+    return f"{base}/2010-04-01/Accounts/{Config.TWILIO_ACCOUNT_SID}/Messages.json"
+
+
+def whatsapp_address(phone):
+    return phone if phone.startswith("whatsapp:") else f"whatsapp:{phone}"
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`, with jitter so rows that
+    failed together don't retry together"""
+    return min(BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), MAX_BACKOFF_SECONDS) * random.uniform(1, 1.25)
+
+
+def _retry_after(response, attempts):
+    try:
+        return max(float(response.headers["Retry-After"]), 1.0)
+    except (KeyError, ValueError):
+        return backoff(attempts)
+
+
+def _pause(seconds):
+    global _paused_until
+    _paused_until = max(_paused_until, time.monotonic() + seconds)
+
+
+def _error_text(response):
+    try:
+        body = response.json()
+        return f"HTTP {response.status_code} ({body.get('code')}): {body.get('message')}"
+    except ValueError:
+        return f"HTTP {response.status_code}: {response.text[:200]}"
+
+
+def send_one(session, row):
+    """POST one message; returns (outcome, Twilio SID or error, retry delay)"""
+    import requests
+
+    paused = _paused_until - time.monotonic()
+    if paused > 0:
+        return "deferred", None, paused
+    attempts = row["attempts"] + 1
+    started = time.perf_counter()
+    try:
+        response = session.post(messages_url(), timeout=REQUEST_TIMEOUT, data={
+            "From": Config.TWILIO_WHATSAPP_NUMBER,
+            "To": whatsapp_address(row["phone"]),
+            "Body": render(row),
+        })
+    except requests.RequestException as e:
+        return "retry", f"{type(e).__name__}: {e}", backoff(attempts)
+    finally:
+        SEND_LATENCY.observe(time.perf_counter() - started)
+
+    if response.status_code in (200, 201):
+        return "sent", response.json().get("sid"), None
+    if response.status_code == 429:
+        delay = _retry_after(response, attempts)
+        _pause(delay)
+        return "rate_limited", _error_text(response), delay
+    if response.status_code >= 500:
+        return "retry", _error_text(response), backoff(attempts)
+    return "failed", _error_text(response), None
+
+
+def _result(row, outcome, detail, delay, now):
+    """RECORD_NOTIFICATION_SQL params for a send outcome"""
+    if outcome == "sent":
+        return ("SENT", 1, _stamp(now), None, detail, _stamp(now), row["id"])
+    retry_at = _stamp(now + timedelta(seconds=delay or 0))
+    if outcome in ("deferred", "rate_limited"):
+        # Twilio turned it away unsent: try again once the pause is over
+        return ("PENDING", 0, retry_at, detail, None, None, row["id"])
+    if outcome == "failed" or row["attempts"] + 1 >= MAX_ATTEMPTS:
+        return ("FAILED", 1, retry_at, detail, None, None, row["id"])
+    return ("PENDING", 1, retry_at, detail, None, None, row["id"])
+
+
+def send_batch(repository):
+    """Claim and send one batch of due notifications; returns how many were claimed"""
+    now = datetime.now()
+    rows = repository.claim_notifications(BATCH_SIZE, _stamp(now), _stamp(now + SEND_LEASE))
+    if not rows:
+        return 0
+    session, executor = _client()
+    outcomes = list(executor.map(lambda row: send_one(session, row), rows))
+
+    now = datetime.now()
+    results = []
+    for row, (outcome, detail, delay) in zip(rows, outcomes):
+        result = _result(row, outcome, detail, delay, now)
+        results.append(result)
+        NOTIFICATIONS.inc("failed" if result[0] == "FAILED" else outcome)
+    repository.record_notifications(results)
+    return len(rows)
+
+# =============================================================================
+# SENDER
+# =============================================================================
+
+def _run(repository):
+    while True:
+        try:
+            paused = _paused_until - time.monotonic()
+            if paused > 0:
+                time.sleep(paused)
+                continue
+            if send_batch(repository) == BATCH_SIZE:
+                # More may be due already
+                continue
+        except Exception as e:
+            print(f"Notification sender error: {e}")
+            metrics.EXCEPTIONS.inc("notifications", type(e).__name__)
+        _wake.wait(POLL_SECONDS)
+        _wake.clear()
+
+
+def ensure_started(repository):
+    """Start this process's sender once (safe to call per request); without
+    Twilio credentials notifications stay queued"""
+    global _sender_pid
+    pid = os.getpid()
+    if _sender_pid == pid or not sender_enabled() or not configured():
+        return
+    with _sender_lock:
+        if _sender_pid == pid:
+            return
+        threading.Thread(target=_run, args=(repository,), name="notification-sender",
+                         daemon=True).start()
+        _sender_pid = pid
+
+
+def check(repository):
+    """Health-probe detail; raises when notifications are queued with no way to send them"""
+    queued = {row["state"]: {"count": row["count"], "oldest": row["oldest"]}
+              for row in repository.notification_stats()}
+    if queued.get("PENDING") and not configured():
+        raise RuntimeError(f"{queued['PENDING']['count']} notifications queued, Twilio isn't configured")
+    return {"queued": queued, "paused_seconds": round(max(_paused_until - time.monotonic(), 0), 1)}
+
+
+def drain(repository):
+    """Send everything due now, waiting out rate-limit pauses; returns rows claimed"""
+    claimed = 0
+    while True:
+        paused = _paused_until - time.monotonic()
+        if paused > 0:
+            time.sleep(paused)
+        sent = send_batch(repository)
+        claimed += sent
+        if not sent:
+            return claimed
+
+
+def main():
+    import argparse
+    # This process drains the queue itself; don't start app's sender thread too
+    os.environ["NOTIFY_SENDER"] = "0"
+    from app import repository
+
+    parser = argparse.ArgumentParser(description="Outbound WhatsApp notifications")
+    parser.add_argument("command", choices=["drain", "stats"])
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        for row in repository.notification_stats():
+            print(f"{row['state']:<10}{row['count']:>10,}  oldest {row['oldest']}")
+        return
+    if not configured():
+        parser.error("set TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN")
+    started = time.perf_counter()
+    claimed = drain(repository)
+    print(f"📨 Processed {claimed} notifications in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Monthly range partitioning of cyber_reports (Postgres).
+
+cyber_reports is partitioned on created_at, which stays TEXT in
+'YYYY-MM-DD HH:MM:SS' form with the "C" collation so byte order is
+chronological and the API keeps returning the same strings. Each month
+is a partition named cyber_reports_yYYYYmMM; rows outside every month
+land in cyber_reports_default.
+
+Retention drops whole partitions once every report in them is past
+Config.DATA_RETENTION_DAYS instead of deleting rows.
+
+Usage:
+    python partitions.py list
+    python partitions.py maintain          # create upcoming months, drop expired ones
+    python partitions.py migrate           # convert an existing unpartitioned table
+
+The app creates upcoming months itself (hourly, from the health prober),
+so maintain only needs a scheduled job for retention.
+"""
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+
+PARENT = "cyber_reports"
+DEFAULT_PARTITION = "cyber_reports_default"
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+MAINTAIN_EVERY_SECONDS = 3600
+
+_PARTITION_NAME = re.compile(r"^cyber_reports_y(\d{4})m(\d{2})$")
+
+# =============================================================================
+# MONTH HELPERS
+# =============================================================================
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name):
+    """First day of the month a partition covers, or None for other tables"""
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def retention_cutoff(today=None, retention_days=None):
+    """Partitions for months ending on or before this date can be dropped"""
+    if retention_days is None:
+        from config import Config
+        retention_days = Config.DATA_RETENTION_DAYS
+    return (today or date.today()) - timedelta(days=retention_days)
+
+# =============================================================================
+# CATALOG
+# =============================================================================
+
+def is_partitioned(c):
+    c.execute("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class cl ON cl.oid = pt.partrelid
+        WHERE cl.relname = %s AND pg_table_is_visible(cl.oid)
+    """, (PARENT,))
+    return c.fetchone() is not None
+
+
+def list_partitions(c):
+    """Names of the partitions currently attached to cyber_reports"""
+    c.execute("""
+        SELECT child.relname AS name
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+        ORDER BY child.relname
+    """, (PARENT,))
+    return [row["name"] if isinstance(row, dict) else row[0] for row in c.fetchall()]
+
+# =============================================================================
+# MAINTENANCE
+# =============================================================================
+
+def create_partition(c, month):
+    """Create the partition for month; rows already in the default partition move into it"""
+    name = partition_name(month)
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+
+    # A new partition can't overlap rows sitting in the default partition,
+    # so build it standalone, move those rows and then attach it
+    c.execute(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s LIMIT 1",
+              (lower, upper))
+    if c.fetchone() is None:
+        c.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT}
+            FOR VALUES FROM ('{lower}') TO ('{upper}')
+        """)
+        return name
+
+    c.execute(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    c.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE created_at >= %s AND created_at < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (lower, upper))
+    c.execute(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+    return name
+
+
+def ensure_partitions(c, first_month=None, months_ahead=MONTHS_AHEAD, today=None):
+    """Make sure every month from first_month (default: this month) to months_ahead exists"""
+    current = month_start(today or date.today())
+    month = month_start(first_month) if first_month else current
+    last = add_months(current, months_ahead)
+    existing = set(list_partitions(c))
+    created = []
+    while month <= last:
+        if partition_name(month) not in existing:
+            created.append(create_partition(c, month))
+        month = add_months(month, 1)
+    return created
+
+
+def drop_expired_partitions(c, today=None, retention_days=None):
+    """Detach and drop partitions whose whole month is past retention"""
+    cutoff = retention_cutoff(today, retention_days)
+    dropped = []
+    for name in list_partitions(c):
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        # Case notes and queued or sent notifications (citizens' phone
+        # numbers) belong to the purged complaints too
+        c.execute(f"DELETE FROM case_notes WHERE report_id IN (SELECT id FROM {name})")
+        c.execute(f"DELETE FROM notifications WHERE report_id IN (SELECT id FROM {name})")
+        c.execute(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+        c.execute(f"DROP TABLE {name}")
+        dropped.append(name)
+    return dropped
+
+
+def maintain(conn, today=None):
+    c = conn.cursor()
+    created = ensure_partitions(c, today=today)
+    conn.commit()
+    dropped = drop_expired_partitions(c, today=today)
+    conn.commit()
+    return created, dropped
+
+
+_last_maintained = None
+
+
+def check(connect):
+    """Health-probe check: keeps upcoming months created and reports headroom"""
+    global _last_maintained
+    conn = connect()
+    try:
+        c = conn.cursor()
+        if not is_partitioned(c):
+            conn.commit()
+            return {"partitioned": False}
+        created = []
+        if _last_maintained is None or time.monotonic() - _last_maintained >= MAINTAIN_EVERY_SECONDS:
+            created = ensure_partitions(c)
+            conn.commit()
+            _last_maintained = time.monotonic()
+        months = [m for m in map(partition_month, list_partitions(c)) if m]
+        c.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION}) AS used")
+        row = c.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    return {
+        "partitioned": True,
+        "partitions": len(months),
+        "newest_month": max(months).isoformat() if months else None,
+        "oldest_month": min(months).isoformat() if months else None,
+        "created": created,
+        "default_partition_used": bool(row["used"] if isinstance(row, dict) else row[0]),
+    }
+
+# =============================================================================
+# MIGRATION
+# =============================================================================
+
+def migrate(conn, create_schema_fn):
+    """Convert an existing unpartitioned cyber_reports table in one transaction.
+
+    Writes are blocked while rows are copied (reads continue), so run it in a
+    quiet period.
+    """
+    c = conn.cursor()
+    if is_partitioned(c):
+        print("✅ cyber_reports is already partitioned")
+        return False
+
+    started = time.perf_counter()
+    c.execute(f"LOCK TABLE {PARENT} IN EXCLUSIVE MODE")
+    c.execute(f"SELECT MIN(created_at) AS oldest, COUNT(*) AS count FROM {PARENT}")
+    row = c.fetchone()
+    oldest, count = (row["oldest"], row["count"]) if isinstance(row, dict) else row
+
+    old = f"{PARENT}_unpartitioned"
+    # Keep the id sequence; it would be dropped with the old table otherwise
+    c.execute(f"ALTER SEQUENCE {PARENT}_id_seq OWNED BY NONE")
+    # A foreign key can't reference (id) alone on a partitioned table
+    c.execute("ALTER TABLE case_notes DROP CONSTRAINT IF EXISTS case_notes_report_id_fkey")
+    c.execute(f"ALTER TABLE {PARENT} RENAME TO {old}")
+    # Free the index and constraint names for the new table (renaming an
+    # index renames the constraint it backs)
+    c.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (old,))
+    for row in c.fetchall():
+        index = row["indexname"] if isinstance(row, dict) else row[0]
+        c.execute(f"ALTER INDEX {index} RENAME TO {index[:50]}_unpartitioned")
+    c.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s ORDER BY ordinal_position
+    """, (old,))
+    columns = ", ".join(row["column_name"] if isinstance(row, dict) else row[0]
+                        for row in c.fetchall())
+
+    create_schema_fn(c, id_column=f"id INTEGER NOT NULL DEFAULT nextval('{PARENT}_id_seq')")
+
+    first_month = None
+    if oldest:
+        try:
+            first_month = datetime.strptime(oldest[:7], "%Y-%m").date()
+        except ValueError:
+            pass
+    ensure_partitions(c, first_month=first_month)
+
+    c.execute("SET LOCAL i4c.live_feed = 'off'")
+    c.execute(f"INSERT INTO {PARENT} ({columns}) SELECT {columns} FROM {old}")
+    copied = c.rowcount
+    if copied != count:
+        raise RuntimeError(f"copied {copied} of {count} rows, rolling back")
+
+    c.execute(f"DROP TABLE {old}")
+    c.execute(f"ALTER SEQUENCE {PARENT}_id_seq OWNED BY {PARENT}.id")
+    conn.commit()
+    c.execute(f"ANALYZE {PARENT}")
+    conn.commit()
+    print(f"✅ Migrated {copied} reports into {len(list_partitions(c))} partitions "
+          f"in {time.perf_counter() - started:.1f}s")
+    return True
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    import argparse
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    import db_init
+
+    parser = argparse.ArgumentParser(description="Manage cyber_reports monthly partitions")
+    parser.add_argument("command", choices=["list", "maintain", "migrate"])
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"), cursor_factory=RealDictCursor)
+    try:
+        if args.command == "migrate":
+            try:
+                migrate(conn, db_init.create_reports_table)
+            except Exception:
+                conn.rollback()
+                raise
+        elif not is_partitioned(conn.cursor()):
+            raise SystemExit("cyber_reports is not partitioned, run 'partitions.py migrate' first")
+        elif args.command == "maintain":
+            created, dropped = maintain(conn)
+            print(f"📅 Created: {', '.join(created) or 'none'}")
+            print(f"🗑️ Dropped: {', '.join(dropped) or 'none'}")
+        else:
+            c = conn.cursor()
+            for name in list_partitions(c):
+                c.execute(f"SELECT COUNT(*) AS count FROM {name}")
+                print(f"{name:<32}{c.fetchone()['count']:>12,}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
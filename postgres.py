@@ -0,0 +1,91 @@
+"""
+Instrumented psycopg2 connections for the Postgres backend.
+
+Kept out of app.py so psycopg2 is only imported once a Postgres connection
+is actually needed (see app.get_db).
+"""
+import time
+
+import psycopg2
+import psycopg2.extensions
+from flask import has_request_context, request
+from psycopg2.extras import RealDictCursor
+
+import metrics
+import slowlog
+
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that records latency and row counts per statement"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except Exception as e:
+            metrics.EXCEPTIONS.inc("db", type(e).__name__)
+            raise
+        finally:
+            statement = metrics.normalize_sql(query)
+            metrics.QUERY_LATENCY.observe(time.perf_counter() - started, statement)
+            metrics.QUERY_ROWS.observe(max(self.rowcount, 0), statement)
+
+
+def current_route():
+    if has_request_context() and request.url_rule:
+        return request.url_rule.rule
+    return None
+
+
+class SlowQueryCursor(InstrumentedCursor):
+    """Metrics cursor that also feeds the slow-query log (SLOW_QUERY_MS)"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        result = super().execute(query, vars)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= slowlog.threshold_ms:
+            plan = self._explain(query, vars) if slowlog.should_explain(query) else None
+            slowlog.record(query, vars, elapsed_ms, current_route(), plan)
+        return result
+
+    def _explain(self, query, vars):
+        # Savepoint keeps a failed EXPLAIN from aborting the caller's transaction
+        cur = self.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+        try:
+            cur.execute("SAVEPOINT slowlog_explain")
+            cur.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", vars)
+            plan = "\n".join(row[0] for row in cur.fetchall())
+            cur.execute("RELEASE SAVEPOINT slowlog_explain")
+            return plan
+        except psycopg2.Error as e:
+            cur.execute("ROLLBACK TO SAVEPOINT slowlog_explain")
+            return f"EXPLAIN failed: {e}"
+        finally:
+            cur.close()
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """Connection that keeps the open/opened connection metrics current"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        metrics.DB_CONNECTIONS_OPENED.inc()
+        metrics.DB_CONNECTIONS_OPEN.inc()
+
+    def close(self):
+        if not self.closed:
+            metrics.DB_CONNECTIONS_OPEN.dec()
+        super().close()
+
+
+def connection_options():
+    """psycopg2.connect() keyword arguments, also used for pools (replica.py)"""
+    return {
+        "connection_factory": InstrumentedConnection,
+        "cursor_factory": SlowQueryCursor if slowlog.enabled else InstrumentedCursor,
+    }
+
+
+def connect(database_url):
+    return psycopg2.connect(database_url, **connection_options())
@@ -0,0 +1,329 @@
+"""
+Rule-based report priority.
+
+PRIORITY_RULES and PRIORITY_LEVELS (config.py) are compiled once into
+predicates. At ingest assess() scores the new report: one comparison per
+rule plus at most four indexed COUNT queries for the signals the rules
+use (suspect_reports, state_reports_1h). The chosen priority is stored
+with priority_reason, the names of the rules that counted, so the triage
+queue can show why a report is where it is. A priority set by an admin is
+stored with priority_reason 'manual' and never re-scored.
+
+When the rules change, re-score the whole table:
+    python priority.py rescore [--dry-run]
+which loads the scored columns once, evaluates every rule over NumPy
+arrays (signals included) and writes only the rows whose priority or
+reason changed, then sends one live feed reset instead of an event per row.
+"""
+import operator
+import os
+import time
+from datetime import datetime, timedelta
+
+import dedup
+import metrics
+import storage
+
+try:
+    from config import PRIORITY_RULES, PRIORITY_LEVELS
+except ImportError:
+    PRIORITY_RULES = []
+    PRIORITY_LEVELS = [("MEDIUM", 0)]
+
+MANUAL = "manual"
+VELOCITY_WINDOW = timedelta(hours=1)
+SUSPECT_COLUMNS = ("suspect_phone", "suspect_upi_id", "suspect_email")
+SIGNALS = ("suspect_reports", "state_reports_1h")
+RESCORE_BATCH = int(os.getenv("PRIORITY_RESCORE_BATCH", "20000"))
+
+_OPERATORS = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+_ORDERING = (">=", ">", "<=", "<")
+
+
+def _number(value):
+    """Numeric rule operand; missing or malformed values (no amount given) count as 0"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+ASSESSED = metrics.counter(
+    "i4c_priority_assigned_total", "Reports scored at ingest by priority", ("priority",))
+
+# =============================================================================
+# RULES
+# =============================================================================
+
+class Rule:
+    def __init__(self, spec):
+        try:
+            self.name = spec["name"]
+            self.field = spec["field"]
+            self.op = spec["op"]
+            self.points = int(spec["points"])
+            value = spec["value"]
+        except KeyError as e:
+            raise ValueError(f"Priority rule {spec!r} is missing {e}")
+        self.group = spec.get("group") or self.name
+
+        if self.op in ("in", "not in"):
+            self.value = frozenset(value)
+            negate = self.op == "not in"
+            self.test = lambda v: (v in self.value) != negate
+        elif self.op in _OPERATORS:
+            compare = _OPERATORS[self.op]
+            self.value = value
+            if self.op in _ORDERING:
+                self.test = lambda v: compare(_number(v), self.value)
+            else:
+                self.test = lambda v: compare(v, self.value)
+        else:
+            raise ValueError(f"Priority rule {self.name}: unknown op {self.op!r}")
+
+    def mask(self, np, column):
+        """Vectorised test over a column array"""
+        if self.op in ("in", "not in"):
+            hit = np.isin(column, list(self.value))
+            return ~hit if self.op == "not in" else hit
+        return _OPERATORS[self.op](column, self.value)
+
+
+class RuleSet:
+    def __init__(self, rules=PRIORITY_RULES, levels=PRIORITY_LEVELS):
+        self.rules = [Rule(spec) for spec in rules]
+        # Highest points first, so the first match in a group is the one that counts
+        self.rules.sort(key=lambda r: -r.points)
+        self.levels = sorted(levels, key=lambda level: -level[1])
+        self.fields = sorted({r.field for r in self.rules})
+        self.signals = [s for s in SIGNALS if s in self.fields]
+
+    def level(self, points):
+        for name, threshold in self.levels:
+            if points >= threshold:
+                return name
+        return self.levels[-1][0]
+
+    def score(self, record):
+        """(priority, points, reason) for a dict of column and signal values"""
+        points, counted, groups = 0, [], set()
+        for rule in self.rules:
+            if rule.group in groups or not rule.test(record.get(rule.field)):
+                continue
+            groups.add(rule.group)
+            points += rule.points
+            counted.append(rule.name)
+        return self.level(points), points, "+".join(sorted(counted))
+
+    def score_columns(self, np, columns):
+        """Vectorised score(): columns maps each field to an array; returns
+        (priority array, reason array)"""
+        size = len(next(iter(columns.values())))
+        points = np.zeros(size, dtype=np.int64)
+        seen_groups = {}
+        counted = []
+        for rule in self.rules:
+            hit = rule.mask(np, columns[rule.field])
+            taken = seen_groups.get(rule.group)
+            if taken is not None:
+                hit &= ~taken
+                seen_groups[rule.group] = taken | hit
+            else:
+                seen_groups[rule.group] = hit.copy()
+            points += np.where(hit, rule.points, 0)
+            counted.append(hit)
+
+        priorities = np.full(size, self.levels[-1][0], dtype=object)
+        for name, threshold in reversed(self.levels):
+            priorities[points >= threshold] = name
+
+        # Few distinct rule combinations occur: build each reason string once
+        if counted:
+            bits = np.zeros(size, dtype=np.int64)
+            for i, hit in enumerate(counted):
+                bits |= hit.astype(np.int64) << i
+            patterns, inverse = np.unique(bits, return_inverse=True)
+            reasons = np.array(["+".join(sorted(r.name for i, r in enumerate(self.rules) if int(p) >> i & 1))
+                                for p in patterns], dtype=object)[inverse.reshape(-1)]
+        else:
+            reasons = np.full(size, "", dtype=object)
+        return priorities, reasons
+
+
+rules = RuleSet()
+
+# =============================================================================
+# INGEST
+# =============================================================================
+
+def signal_queries(record, now=None):
+    """{name: (sql, params)} counting what the rules' signals need"""
+    queries = {}
+    if "suspect_reports" in rules.signals:
+        for column in SUSPECT_COLUMNS:
+            if record.get(column):
+                queries[column] = (storage.SUSPECT_REPORTS_SQL[column], (record[column],))
+    if "state_reports_1h" in rules.signals and record.get("location_state"):
+        since = ((now or datetime.now()) - VELOCITY_WINDOW).strftime("%Y-%m-%d %H:%M:%S")
+        queries["state_reports_1h"] = (storage.STATE_REPORTS_SQL, (record["location_state"], since))
+    return queries
+
+
+def prepare(data):
+    """Fill suspect columns from the free text and return the report as a
+    column dict for signal_queries() and apply()"""
+    text = f"{data.get('description') or ''} {data.get('suspect_other') or ''}"
+    for column, value in dedup.suspect_fields(text).items():
+        key = {"suspect_upi_id": "suspect_upi"}.get(column, column)
+        data.setdefault(key, value)
+    return dict(zip(storage.REPORT_INSERT_COLUMNS, storage.report_insert_params(data, None)))
+
+
+def apply(data, record, counts):
+    """Score record with the signal counts and store the result in data"""
+    record["suspect_reports"] = max([counts.get(c, 0) for c in SUSPECT_COLUMNS] or [0])
+    record["state_reports_1h"] = counts.get("state_reports_1h", 0)
+    priority, _, reason = rules.score(record)
+    data["priority"] = priority
+    data["priority_reason"] = reason
+    ASSESSED.inc(priority)
+    return priority
+
+
+def assess(data, repository):
+    """Set data["priority"] and data["priority_reason"] before saving"""
+    record = prepare(data)
+    counts = repository.signal_counts(signal_queries(record)) if rules.signals else {}
+    return apply(data, record, counts)
+
+# =============================================================================
+# BATCH RE-SCORE
+# =============================================================================
+
+def _timestamps(np, values):
+    """created_at strings -> int64 epoch seconds; malformed values count as 1970"""
+    try:
+        return np.array([v[:19] for v in values], dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        parsed = []
+        for v in values:
+            try:
+                parsed.append(np.datetime64(v[:19], "s").astype(np.int64))
+            except ValueError:
+                parsed.append(0)
+        return np.array(parsed, dtype=np.int64)
+
+
+def _earlier_in_window(np, groups, times, window):
+    """For each row, earlier rows in the same group with time in
+    [time - window, time]; ties on time count rows before it"""
+    times = times - times.min()
+    # One sortable key per row: group-major, then time
+    keys = groups * (int(times.max()) + window + 1) + times
+    order = np.lexsort((np.arange(len(keys)), keys))
+    sorted_keys = keys[order]
+    lower = np.searchsorted(sorted_keys, sorted_keys - window, side="left")
+    counts = np.empty(len(keys), dtype=np.int64)
+    counts[order] = np.arange(len(keys)) - lower
+    return counts
+
+
+def _earlier_same_value(np, values):
+    """For each row, earlier rows (by position) with the same non-empty value"""
+    present = np.array([bool(v) for v in values])
+    counts = np.zeros(len(values), dtype=np.int64)
+    if not present.any():
+        return counts
+    idx = np.nonzero(present)[0]
+    _, inverse = np.unique(np.array([values[i] for i in idx], dtype=object).astype(str),
+                           return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.lexsort((idx, inverse))
+    sorted_groups = inverse[order]
+    first = np.searchsorted(sorted_groups, sorted_groups, side="left")
+    counts[idx[order]] = np.arange(len(order)) - first
+    return counts
+
+
+def load_columns(repository):
+    """Every report's scored columns as NumPy arrays, ordered by id"""
+    import numpy as np
+
+    columns = ["id", "created_at", "priority", "priority_reason", "location_state"]
+    columns += [c for c in SUSPECT_COLUMNS if c not in columns]
+    columns += [f for f in rules.fields if f not in SIGNALS and f not in columns]
+    data = {c: [] for c in columns}
+    after_id = 0
+    while True:
+        rows = repository.scoring_rows(columns, after_id, RESCORE_BATCH)
+        if not rows:
+            break
+        for row in rows:
+            for c in columns:
+                data[c].append(row[c])
+        after_id = rows[-1]["id"]
+
+    numeric = {r.field for r in rules.rules if r.op in _ORDERING}
+    return {
+        c: (np.array([_number(v) for v in values], dtype=np.float64) if c in numeric
+            else np.array(values, dtype=object))
+        for c, values in data.items()
+    }
+
+
+def rescore(repository, dry_run=False):
+    """Re-score every report not prioritised by hand; returns {priority: changed rows}"""
+    import numpy as np
+
+    started = time.perf_counter()
+    columns = load_columns(repository)
+    size = len(columns["id"])
+    if not size:
+        return {}
+
+    if "suspect_reports" in rules.signals:
+        columns["suspect_reports"] = np.maximum.reduce(
+            [_earlier_same_value(np, list(columns[c])) for c in SUSPECT_COLUMNS])
+    if "state_reports_1h" in rules.signals:
+        _, states = np.unique(columns["location_state"].astype(str), return_inverse=True)
+        times = _timestamps(np, list(columns["created_at"]))
+        columns["state_reports_1h"] = _earlier_in_window(
+            np, states.reshape(-1).astype(np.int64), times, int(VELOCITY_WINDOW.total_seconds()))
+
+    priorities, reasons = rules.score_columns(np, columns)
+    changed = ((columns["priority_reason"] != MANUAL)
+               & ((priorities != columns["priority"]) | (reasons != columns["priority_reason"])))
+    updates = [(p, r, int(i)) for p, r, i in zip(priorities[changed], reasons[changed],
+                                                   columns["id"][changed])]
+    summary = {}
+    for p, _, _ in updates:
+        summary[p] = summary.get(p, 0) + 1
+    print(f"🧮 Scored {size} reports in {time.perf_counter() - started:.1f}s, "
+          f"{len(updates)} to update")
+    if updates and not dry_run:
+        repository.set_priorities(updates)
+    return summary
+
+
+def main():
+    import argparse
+    from app import repository
+
+    parser = argparse.ArgumentParser(description="Report priority rules")
+    parser.add_argument("command", choices=["rescore"])
+    parser.add_argument("--dry-run", action="store_true", help="count changes without writing them")
+    args = parser.parse_args()
+
+    for priority, count in sorted(rescore(repository, args.dry_run).items()):
+        print(f"{priority:<10}{count:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Read-replica routing for admin reads (Postgres).
+
+With DATABASE_REPLICA_URL set, the admin list, detail, analytics, cluster
+and triage reads run on a pool of replica connections, so dashboard
+queries stop competing with webhook INSERTs on the primary. Writes, the
+work queue, the analytics cube and the background jobs stay on the
+primary.
+
+A monitor thread measures replication lag every REPLICA_CHECK_SECONDS.
+While the replica is unreachable or more than REPLICA_MAX_LAG_SECONDS
+behind, reads go to the primary, as they do when the pool is exhausted.
+
+Read-your-writes: an admin who just changed a report reads from the
+primary for READ_YOUR_WRITES_SECONDS (tracked in their session by the
+caller). After every report_created and report_updated event the process
+also reads from the primary, but only until the replica has replayed the
+primary's WAL position at the time of the change (live_feed.primary_lsn),
+so the response cache isn't refilled from a replica that is missing the
+change it was invalidated for. The monitor checks again as soon as a change
+arrives and every CATCH_UP_SECONDS until the replica has caught up.
+"""
+import os
+import threading
+import time
+
+import live_feed
+import metrics
+
+REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+CATCH_UP_SECONDS = 0.01
+# psycopg2 pools keep up to POOL_MIN idle connections and close the rest on return
+POOL_MIN = int(os.getenv("REPLICA_POOL_MIN", "4"))
+POOL_MAX = int(os.getenv("REPLICA_POOL_MAX", "10"))
+# A write is on the replica by then unless lag grew past the limit since the last check
+READ_YOUR_WRITES_SECONDS = MAX_LAG_SECONDS + CHECK_SECONDS
+
+# Zero when the replica has replayed everything it received: an idle
+# primary sends no transactions, so the last replay time alone would grow.
+# (After a restart the receive position starts at the segment boundary,
+# behind what was already replayed.)
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_replay_lsn() >= pg_last_wal_receive_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag,
+    CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()
+         ELSE pg_current_wal_lsn()
+    END::text AS replay_lsn
+"""
+
+LAG = metrics.gauge(
+    "i4c_replica_lag_seconds", "Replication lag of the read replica at the last check")
+READS = metrics.counter(
+    "i4c_replica_reads_total", "Routed admin reads by target and reason", ("target", "reason"))
+
+_lag = None             # seconds at the last successful check
+_error = None           # why the last check failed
+_primary_until = 0.0    # monotonic time until which reads stay on the primary
+_write_lsn = 0          # primary WAL position of the last change heard of
+_write_until = 0.0      # gives up waiting for it then (as if the replica were lagging)
+_replayed_lsn = 0       # replica's replay position at the last check
+_wake = threading.Event()
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_monitor_pid = None
+_monitor_lock = threading.Lock()
+
+
+def configured():
+    return bool(REPLICA_URL)
+
+
+def database_url():
+    # Same fix as app.get_database_url for Render's postgres:// URLs
+    if REPLICA_URL and REPLICA_URL.startswith("postgres://"):
+        return REPLICA_URL.replace("postgres://", "postgresql://", 1)
+    return REPLICA_URL
+
+# =============================================================================
+# LAG MONITOR
+# =============================================================================
+
+def _check_lag(conn):
+    global _lag, _error, _replayed_lsn
+    cur = conn.cursor()
+    cur.execute(LAG_SQL)
+    row = cur.fetchone()
+    lag, replay_lsn = (row["lag"], row["replay_lsn"]) if isinstance(row, dict) else row
+    _lag = float(lag)
+    _replayed_lsn = live_feed.parse_lsn(replay_lsn) if replay_lsn else 0
+    _error = None
+    LAG.set(_lag)
+
+
+def _catching_up():
+    return _write_lsn > _replayed_lsn and time.monotonic() < _write_until
+
+
+def _monitor():
+    global _error
+    conn = None
+    while True:
+        try:
+            if conn is None or conn.closed:
+                import postgres
+                conn = postgres.connect(database_url())
+                conn.autocommit = True
+            _check_lag(conn)
+        except Exception as e:
+            _error = f"{type(e).__name__}: {e}"
+            metrics.EXCEPTIONS.inc("replica_monitor", type(e).__name__)
+            if conn is not None:
+                conn.close()
+            conn = None
+            _discard_pool()
+        _wake.wait(CATCH_UP_SECONDS if _catching_up() and _error is None else CHECK_SECONDS)
+        _wake.clear()
+
+
+def ensure_started():
+    """Start the process's lag monitor once (safe to call per request)"""
+    global _monitor_pid
+    pid = os.getpid()
+    if not configured() or _monitor_pid == pid:
+        return
+    with _monitor_lock:
+        if _monitor_pid == pid:
+            return
+        threading.Thread(target=_monitor, name="replica-monitor", daemon=True).start()
+        _monitor_pid = pid
+
+
+def note_write(event_type=None, payload=None):
+    """Keep this process's reads on the primary until a change has replicated"""
+    global _primary_until, _write_lsn, _write_until
+    if event_type in ("report_created", "report_updated") and live_feed.primary_lsn:
+        _write_lsn = max(_write_lsn, live_feed.primary_lsn)
+        _write_until = time.monotonic() + READ_YOUR_WRITES_SECONDS
+        _wake.set()
+    elif event_type in (None, "report_updated", "reset"):
+        # No WAL position to wait for
+        _primary_until = time.monotonic() + READ_YOUR_WRITES_SECONDS
+
+
+live_feed.broker.add_callback(note_write)
+
+# =============================================================================
+# ROUTING
+# =============================================================================
+
+def use_replica(recent_write=False):
+    """Whether a read may go to the replica; counts the decision"""
+    if not configured():
+        return False
+    if recent_write:
+        reason = "read_your_writes"
+    elif time.monotonic() < _primary_until:
+        reason = "recent_write"
+    elif _error is not None or _lag is None:
+        reason = "unavailable"
+    elif _lag > MAX_LAG_SECONDS:
+        reason = "lagging"
+    elif _catching_up():
+        reason = "replaying"
+    else:
+        READS.inc("replica", "ok")
+        return True
+    READS.inc("primary", reason)
+    return False
+
+
+class PooledConnection:
+    """A replica connection that goes back to the pool on close()"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is None:
+            return
+        from psycopg2.pool import PoolError
+
+        conn, self._conn = self._conn, None
+        try:
+            # The pool rolls back the read transaction and drops broken connections
+            self._pool.putconn(conn)
+        except PoolError:
+            # The monitor discarded the pool (replica went away) while this
+            # connection was out; don't fail the read that borrowed it
+            conn.close()
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool_pid != pid:
+        with _pool_lock:
+            if _pool_pid != pid:
+                import postgres
+                from psycopg2.pool import ThreadedConnectionPool
+                _pool = ThreadedConnectionPool(POOL_MIN, POOL_MAX, database_url(),
+                                               **postgres.connection_options())
+                _pool_pid = pid
+    return _pool
+
+
+def _discard_pool():
+    """Drop pooled connections to a replica that went away; the next read
+    after it recovers opens fresh ones"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        pool, _pool, _pool_pid = _pool, None, None
+    if pool is not None:
+        try:
+            pool.closeall()
+        except Exception:
+            pass
+
+
+def connect(primary_connect, recent_write=False):
+    """Replica connection when routing allows, else primary_connect()"""
+    ensure_started()
+    if not use_replica(recent_write):
+        return primary_connect()
+    import psycopg2
+    from psycopg2.pool import PoolError
+
+    try:
+        pool = _get_pool()
+        return PooledConnection(pool, pool.getconn())
+    except PoolError:
+        READS.inc("primary", "pool_exhausted")
+    except psycopg2.OperationalError:
+        # Went away since the last check; the monitor will notice
+        READS.inc("primary", "connect_failed")
+    return primary_connect()
+
+
+def check():
+    """Health-probe detail; raises while reads are held on the primary"""
+    if _error is not None:
+        raise RuntimeError(f"replica unavailable: {_error}")
+    if _lag is None:
+        return {"lag_seconds": None, "status": "starting"}
+    if _lag > MAX_LAG_SECONDS:
+        raise RuntimeError(f"replica {_lag:.1f}s behind (limit {MAX_LAG_SECONDS:g}s)")
+    return {"lag_seconds": round(_lag, 3), "max_lag_seconds": MAX_LAG_SECONDS}
@@ -0,0 +1,170 @@
+"""
+Response cache for the admin read endpoints.
+
+Serialized JSON bodies are kept in a size-bounded LRU with a TTL, keyed on
+route + parameters. Every entry carries tags naming what it was built
+from ("reports" for list pages and counts, "report:<id>" for each report
+it shows, "analytics" for aggregates, "cluster:<cluster_id>" for a
+near-duplicate cluster's members or size, "triage" and "clusters" for
+lists filtered or counted by status, priority or assignee), and writes
+drop only the entries tagged with what they touched:
+
+- report_created -> "reports", "analytics", "cluster:<cluster_id>"
+- report_updated -> "report:<id>", "analytics", "triage", "clusters"
+
+The cache lives in each process; invalidations are shared through the
+live feed (live_feed.py), so with Postgres a write on one worker evicts
+the matching entries on every worker via the report_events NOTIFY.
+
+RESPONSE_CACHE_SIZE (entries, 0 disables) and RESPONSE_CACHE_TTL (seconds)
+configure it. Requests with "X-Cache-Bypass: 1" skip the cache.
+
+status_cache holds the citizens' WhatsApp status lookups the same way
+(STATUS_CACHE_SIZE, STATUS_CACHE_TTL).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import live_feed
+import metrics
+
+BYPASS_HEADER = "X-Cache-Bypass"
+
+HITS = metrics.counter(
+    "i4c_response_cache_hits_total", "Admin responses served from cache", ("route",))
+MISSES = metrics.counter(
+    "i4c_response_cache_misses_total", "Admin responses computed on a cache miss", ("route",))
+EVICTIONS = metrics.counter(
+    "i4c_response_cache_evictions_total", "Cache entries removed by reason", ("reason",))
+ENTRIES = metrics.gauge(
+    "i4c_response_cache_entries", "Entries currently in the response cache")
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = max_entries > 0 and ttl > 0
+        self._entries = OrderedDict()   # key -> (expires_at, body, tags)
+        self._tags = {}                 # tag -> set of keys
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a response computed across one is
+        # not stored, so a read racing a write can't cache the old rows
+        self.generation = 0
+
+    def get(self, key):
+        """Cached body for key, or None"""
+        route = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                EVICTIONS.inc("expired")
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            MISSES.inc(route)
+            return None
+        HITS.inc(route)
+        return entry[1]
+
+    def put(self, key, body, tags, generation):
+        """Store body unless an invalidation happened since generation was read"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                EVICTIONS.inc("size")
+            ENTRIES.set(len(self._entries))
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        ENTRIES.set(len(self._entries))
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self.generation += 1
+            removed = 0
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        if removed:
+            EVICTIONS.inc("invalidated", amount=removed)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            ENTRIES.set(0)
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+            tags = len(self._tags)
+        hits, misses = HITS.series(), MISSES.series()
+        routes = sorted({labels[0] for labels in list(hits) + list(misses)})
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "tags": tags,
+            "routes": {
+                route: {"hits": hits.get((route,), 0), "misses": misses.get((route,), 0)}
+                for route in routes
+            },
+            "evictions": {
+                reason: EVICTIONS.value(reason) for reason in ("expired", "size", "invalidated")
+            },
+        }
+
+
+cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+                      float(os.getenv("RESPONSE_CACHE_TTL", "30")))
+
+# WhatsApp "status <reference ID>" lookups (conversation.py), tagged
+# "report:<id>" like the admin responses so status changes evict them
+status_cache = ResponseCache(int(os.getenv("STATUS_CACHE_SIZE", "5000")),
+                             float(os.getenv("STATUS_CACHE_TTL", "300")))
+
+
+def report_tags(reports):
+    return [f"report:{r['id']}" for r in reports]
+
+
+def updated_report_tags(report_id):
+    """Tags a status, priority or assignee change makes stale: the report
+    can move onto triage pages that don't show it yet"""
+    return [f"report:{report_id}", "analytics", "triage", "clusters"]
+
+
+def on_event(event_type, payload):
+    if event_type == "report_created":
+        cache.invalidate("reports", "analytics", f"cluster:{payload.get('cluster_id')}")
+    elif event_type == "report_updated":
+        cache.invalidate(*updated_report_tags(payload.get('id')))
+        status_cache.invalidate(f"report:{payload.get('id')}")
+    elif event_type == "reset":
+        # The listener lost events while disconnected
+        cache.clear()
+        status_cache.clear()
+
+
+live_feed.broker.add_callback(on_event)
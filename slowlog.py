@@ -0,0 +1,125 @@
+"""
+Slow-query log.
+
+Opt-in with SLOW_QUERY_MS (threshold in milliseconds). Statements slower
+than the threshold are aggregated by normalised SQL with their parameter
+shape, duration and caller route. SLOW_QUERY_EXPLAIN_SAMPLE (0.0-1.0)
+sets the fraction of slow SELECTs that also get an EXPLAIN (ANALYZE,
+BUFFERS) plan captured.
+"""
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime
+
+from metrics import normalize_sql
+
+threshold_ms = float(os.getenv("SLOW_QUERY_MS", "0") or 0)
+explain_sample_rate = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0") or 0)
+enabled = threshold_ms > 0
+
+MAX_STATEMENTS = 500
+MAX_RECENT = 100
+
+_lock = threading.Lock()
+_statements = {}
+_recent = deque(maxlen=MAX_RECENT)
+
+
+def param_shape(params):
+    """Describe parameters by type and size without keeping their values"""
+    if params is None:
+        return None
+
+    def describe(value):
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}({len(value)})"
+        return type(value).__name__
+
+    if isinstance(params, dict):
+        return {key: describe(value) for key, value in params.items()}
+    return [describe(value) for value in params]
+
+
+def should_explain(sql):
+    if explain_sample_rate <= 0:
+        return False
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    if not sql.lstrip().upper().startswith("SELECT"):
+        # EXPLAIN ANALYZE executes the statement, never replay writes
+        return False
+    return random.random() < explain_sample_rate
+
+
+def record(sql, params, duration_ms, route=None, plan=None):
+    statement = normalize_sql(sql)
+    shape = param_shape(params)
+    now = datetime.now().isoformat()
+    print(f"🐢 Slow query {duration_ms:.1f}ms [{route or '-'}]: {statement[:200]}")
+
+    with _lock:
+        entry = _statements.get(statement)
+        if entry is None:
+            if len(_statements) >= MAX_STATEMENTS:
+                # Drop the statement with the least total time to stay bounded
+                victim = min(_statements, key=lambda s: _statements[s]["total_ms"])
+                del _statements[victim]
+            entry = _statements[statement] = {
+                "statement": statement,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "routes": {},
+                "param_shape": shape,
+                "last_seen": now,
+                "explain": None,
+                "explain_at": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["param_shape"] = shape
+        entry["last_seen"] = now
+        if route:
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+        if plan:
+            entry["explain"] = plan
+            entry["explain_at"] = now
+
+        _recent.append({
+            "statement": statement,
+            "duration_ms": round(duration_ms, 3),
+            "route": route,
+            "param_shape": shape,
+            "timestamp": now,
+        })
+
+
+def snapshot(limit=20, order_by="total_ms"):
+    """Top offenders plus the most recent slow statements"""
+    with _lock:
+        entries = [dict(e, routes=dict(e["routes"])) for e in _statements.values()]
+        recent = list(_recent)
+
+    key = order_by if order_by in ("total_ms", "max_ms", "count") else "total_ms"
+    entries.sort(key=lambda e: e[key], reverse=True)
+    for e in entries:
+        e["mean_ms"] = round(e["total_ms"] / e["count"], 3)
+        e["total_ms"] = round(e["total_ms"], 3)
+        e["max_ms"] = round(e["max_ms"], 3)
+
+    return {
+        "enabled": enabled,
+        "threshold_ms": threshold_ms,
+        "explain_sample_rate": explain_sample_rate,
+        "top": entries[:limit],
+        "recent": recent[-limit:][::-1],
+    }
+
+
+def reset():
+    with _lock:
+        _statements.clear()
+        _recent.clear()
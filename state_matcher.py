@@ -0,0 +1,122 @@
+"""
+Free-text state name matching for the location_state step.
+
+The index is built once at import from INDIAN_STATES plus the Hindi and
+Gujarati names and abbreviations in config.py. Exact names and aliases
+resolve with one dict lookup; anything else is scored by trigram overlap
+through an inverted index, so a lookup touches only the aliases that share
+a trigram with the reply.
+"""
+import unicodedata
+
+try:
+    from config import INDIAN_STATES, STATE_NAMES, STATE_ALIASES
+except ImportError:
+    INDIAN_STATES = []
+    STATE_NAMES = {}
+    STATE_ALIASES = {}
+
+# Nukta and zero-width (non-)joiners vary between keyboards for the same name
+_IGNORED_CHARS = {"़", "઼", "‌", "‍"}
+
+MIN_FUZZY_SCORE = 0.35   # below this a reply is treated as not a state name
+CONFIDENT_SCORE = 0.6    # top score needed to accept a fuzzy match outright
+CONFIDENT_MARGIN = 0.15  # ...and its lead over the next-best state
+MIN_PREFIX_LENGTH = 4
+
+
+def normalize(text):
+    """Lowercase letters, marks and digits only: 'J & K' -> 'jandk'"""
+    text = unicodedata.normalize("NFD", text.replace("&", " and ").casefold())
+    return "".join(
+        ch for ch in text
+        if ch not in _IGNORED_CHARS and unicodedata.category(ch)[0] in ("L", "M", "N")
+    )
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StateMatcher:
+    def __init__(self, states, localized_names, aliases):
+        self.states = list(states)
+        self.localized = localized_names
+        self.exact = {}      # normalized key -> state
+        self.keys = []       # [(key, state, trigram set)]
+        self.postings = {}   # trigram -> [index into self.keys]
+
+        for state in self.states:
+            names = [state] + [names[state] for names in localized_names.values() if state in names]
+            for name in names + list(aliases.get(state, [])):
+                key = normalize(name)
+                if not key:
+                    continue
+                self.exact.setdefault(key, state)
+                if len(key) < 3:
+                    # Two-letter codes only make sense as exact matches
+                    continue
+                grams = trigrams(key)
+                index = len(self.keys)
+                self.keys.append((key, state, grams))
+                for gram in grams:
+                    self.postings.setdefault(gram, []).append(index)
+
+    def match(self, text, limit=3):
+        """Returns (state, candidates).
+
+        state is set when the reply resolves to exactly one state; otherwise
+        candidates lists up to `limit` plausible states, best first.
+        """
+        key = normalize(text)
+        if not key:
+            return None, []
+
+        state = self.exact.get(key)
+        if state:
+            return state, []
+
+        if len(key) >= MIN_PREFIX_LENGTH:
+            prefixed = {s for k, s, _ in self.keys if k.startswith(key)}
+            if len(prefixed) == 1:
+                return prefixed.pop(), []
+
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for index in self.postings.get(gram, ()):
+                shared[index] = shared.get(index, 0) + 1
+
+        best = {}
+        for index, overlap in shared.items():
+            _, state, key_grams = self.keys[index]
+            score = 2 * overlap / (len(grams) + len(key_grams))
+            if score > best.get(state, 0):
+                best[state] = score
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        ranked = [(s, score) for s, score in ranked if score >= MIN_FUZZY_SCORE]
+        if not ranked:
+            return None, []
+
+        top_state, top_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        if top_score >= CONFIDENT_SCORE and top_score - runner_up >= CONFIDENT_MARGIN:
+            return top_state, []
+        return None, [s for s, _ in ranked[:limit]]
+
+    def display_name(self, state, lang):
+        local = self.localized.get(lang, {}).get(state)
+        return f"{local} ({state})" if local else state
+
+
+matcher = StateMatcher(INDIAN_STATES, STATE_NAMES, STATE_ALIASES)
+
+
+def match_state(text, limit=3):
+    return matcher.match(text, limit)
+
+
+def display_name(state, lang):
+    return matcher.display_name(state, lang)
@@ -0,0 +1,1143 @@
+"""
+Report storage backends.
+
+PostgresRepository runs against DATABASE_URL through the instrumented
+connections from app.get_db; admin reads may go to a read replica instead
+(app.get_read_db, replica.py). SQLiteRepository runs embedded on a WAL-mode
+database file (DATABASE_PATH) for small deployments, tests and benchmarks.
+Both expose the same methods so the Flask routes don't care which is used.
+
+Backend selection: STORAGE_BACKEND=postgres|sqlite, defaulting to postgres
+when DATABASE_URL is set and sqlite otherwise.
+
+Report inserts, status changes and claims reach the dashboard live feed
+(live_feed.py) from a trigger on Postgres and from SQLiteRepository itself
+after each commit.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import live_feed
+import metrics
+import slowlog
+from conversation import generate_reference_id, reference_created_range
+
+# =============================================================================
+# SHARED SQL (psycopg "%s" placeholders; SQLite gets "?" via qmark())
+# =============================================================================
+
+# Column order of report_insert_params()
+REPORT_INSERT_COLUMNS = (
+    "phone", "location_city", "location_state", "language_preference",
+    "fraud_medium", "incident_type", "incident_description",
+    "suspect_phone", "suspect_email", "suspect_upi_id",
+    "suspect_other_details", "amount_involved",
+    "evidence_text", "evidence_hash", "media_files",
+    "similarity_signature", "cluster_id",
+    "anonymous", "reference_id", "status", "priority", "priority_reason",
+    "consent_given", "data_retention_date", "created_at",
+)
+
+REPORT_COLUMNS_SQL = f"""
+    INSERT INTO cyber_reports ({', '.join(REPORT_INSERT_COLUMNS)})
+    VALUES ({','.join(['%s'] * len(REPORT_INSERT_COLUMNS))})
+"""
+
+INSERT_REPORT_SQL = REPORT_COLUMNS_SQL + "    RETURNING id\n"
+
+COUNT_REPORTS_TEMPLATE = "SELECT COUNT(*) as count FROM cyber_reports{where}"
+
+LIST_REPORTS_TEMPLATE = """
+    SELECT * FROM cyber_reports{where}
+    ORDER BY created_at DESC
+    LIMIT %s OFFSET %s
+"""
+
+COUNT_REPORTS_SQL = COUNT_REPORTS_TEMPLATE.format(where="")
+LIST_REPORTS_SQL = LIST_REPORTS_TEMPLATE.format(where="")
+
+REPORT_BY_ID_SQL = "SELECT * FROM cyber_reports WHERE id = %s"
+
+# WhatsApp status lookups; the created_at range from the reference ID lets
+# Postgres search one or two monthly partitions instead of all of them
+REPORT_STATUS_SQL = """
+    SELECT id, reference_id, status, language_preference, created_at, updated_at
+    FROM cyber_reports
+    WHERE reference_id = %s AND created_at >= %s AND created_at < %s
+"""
+
+
+def report_status_query(reference_id):
+    """(sql, params) for REPORT_STATUS_SQL, or None when the ID can't exist"""
+    bounds = reference_created_range(reference_id)
+    if bounds is None:
+        return None
+    return REPORT_STATUS_SQL, (reference_id, *bounds)
+
+REPORT_EVENT_SQL = f"SELECT {', '.join(live_feed.EVENT_FIELDS)} FROM cyber_reports WHERE id = %s"
+
+REPORT_NOTES_SQL = """
+    SELECT cn.*, au.username, au.full_name
+    FROM case_notes cn
+    JOIN admin_users au ON cn.admin_id = au.id
+    WHERE cn.report_id = %s
+    ORDER BY cn.created_at DESC
+"""
+
+ADMIN_LOGIN_SQL = """
+    SELECT * FROM admin_users
+    WHERE username = %s AND password_hash = %s AND is_active = 1
+"""
+
+# Near-duplicate clusters (dedup.py); cluster_id is the first report's reference_id
+RECENT_SIGNATURES_SQL = """
+    SELECT reference_id, cluster_id, similarity_signature, created_at
+    FROM cyber_reports
+    WHERE similarity_signature IS NOT NULL
+    ORDER BY created_at DESC
+    LIMIT %s
+"""
+
+SIGNATURES_SINCE_SQL = """
+    SELECT reference_id, cluster_id, similarity_signature, created_at
+    FROM cyber_reports
+    WHERE similarity_signature IS NOT NULL AND created_at >= %s
+    ORDER BY created_at
+"""
+
+CLUSTERS_TEMPLATE = """
+    SELECT cluster_id, COUNT(*) as size,
+           SUM(CASE WHEN status = 'NEW' THEN 1 ELSE 0 END) as new_count,
+           MIN(created_at) as first_seen, MAX(created_at) as last_seen,
+           COALESCE(SUM(amount_involved), 0) as amount_total
+    FROM cyber_reports
+    WHERE cluster_id IS NOT NULL{and_where}
+    GROUP BY cluster_id
+    HAVING COUNT(*) >= %s
+    ORDER BY size DESC, last_seen DESC
+    LIMIT %s
+"""
+
+CLUSTER_REPORTS_SQL = """
+    SELECT id, reference_id, status, priority, fraud_medium, incident_type,
+           location_state, amount_involved, incident_description, created_at
+    FROM cyber_reports
+    WHERE cluster_id = %s
+    ORDER BY created_at
+    LIMIT %s
+"""
+
+CLUSTER_SIZE_SQL = """
+    SELECT COUNT(*) as count FROM cyber_reports
+    WHERE cluster_id = (SELECT cluster_id FROM cyber_reports WHERE id = %s)
+"""
+
+UNSIGNED_REPORTS_SQL = """
+    SELECT id, reference_id, incident_description, suspect_other_details, created_at
+    FROM cyber_reports
+    WHERE similarity_signature IS NULL AND id > %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+SET_CLUSTER_SQL = """
+    UPDATE cyber_reports SET similarity_signature = %s, cluster_id = %s
+    WHERE id = %s
+"""
+
+# Priority signals and triage queue (priority.py)
+SUSPECT_REPORTS_SQL = {
+    column: f"SELECT COUNT(*) as count FROM cyber_reports WHERE {column} = %s"
+    for column in ("suspect_phone", "suspect_upi_id", "suspect_email")
+}
+
+STATE_REPORTS_SQL = """
+    SELECT COUNT(*) as count FROM cyber_reports
+    WHERE location_state = %s AND created_at >= %s
+"""
+
+TRIAGE_SQL = """
+    SELECT * FROM cyber_reports
+    WHERE priority = %s AND status = %s
+    ORDER BY created_at
+    LIMIT %s
+"""
+
+SCORING_ROWS_TEMPLATE = """
+    SELECT {columns} FROM cyber_reports
+    WHERE id > %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+SET_PRIORITY_SQL = """
+    UPDATE cyber_reports SET priority = %s, priority_reason = %s
+    WHERE id = %s
+"""
+
+# execute_values() form of SET_PRIORITY_SQL: one statement per page of rows
+SET_PRIORITIES_SQL = """
+    UPDATE cyber_reports AS r
+    SET priority = v.priority, priority_reason = v.priority_reason
+    FROM (VALUES %s) AS v(priority, priority_reason, id)
+    WHERE r.id = v.id
+"""
+
+# Analyst work queue: an open report is NEW and either unassigned or held by
+# a claim whose lease ran out (the analyst went away without releasing it)
+CLAIM_LEASE = timedelta(minutes=int(os.getenv("CLAIM_LEASE_MINUTES", "30")))
+
+CLAIM_CANDIDATE_SQL = """
+    SELECT id, created_at, assigned_to FROM cyber_reports
+    WHERE status = 'NEW' AND priority = %s
+      AND (assigned_to IS NULL OR claim_expires_at < %s)
+    ORDER BY created_at
+    LIMIT 1
+"""
+
+CLAIM_SQL = """
+    UPDATE cyber_reports SET assigned_to = %s, claim_expires_at = %s, updated_at = %s
+    WHERE id = %s AND created_at = %s
+"""
+
+RENEW_CLAIM_SQL = """
+    UPDATE cyber_reports SET claim_expires_at = %s
+    WHERE id = %s AND assigned_to = %s AND claim_expires_at IS NOT NULL
+"""
+
+RELEASE_CLAIM_SQL = """
+    UPDATE cyber_reports SET assigned_to = NULL, claim_expires_at = NULL, updated_at = %s
+    WHERE id = %s AND assigned_to = %s AND claim_expires_at IS NOT NULL
+"""
+
+QUEUE_STATS_SQL = """
+    SELECT priority,
+           SUM(CASE WHEN assigned_to IS NULL THEN 1 ELSE 0 END) as unassigned,
+           SUM(CASE WHEN claim_expires_at >= %s THEN 1 ELSE 0 END) as claimed,
+           SUM(CASE WHEN claim_expires_at < %s THEN 1 ELSE 0 END) as expired
+    FROM cyber_reports
+    WHERE status = 'NEW'
+    GROUP BY priority
+"""
+
+CLAIMS = metrics.counter(
+    "i4c_queue_claims_total", "Claim-next-case requests by outcome", ("outcome",))
+
+
+def claim_times():
+    """(now, lease expiry) as created_at-style strings"""
+    now = datetime.now()
+    return now.strftime("%Y-%m-%d %H:%M:%S"), (now + CLAIM_LEASE).strftime("%Y-%m-%d %H:%M:%S")
+
+# Outbound WhatsApp notifications (notifications.py). Only a report the
+# citizen didn't file anonymously has a number to write to; the UNIQUE
+# (report_id, status) constraint makes a repeated status change a no-op.
+QUEUE_NOTIFICATION_SQL = """
+    INSERT INTO notifications (report_id, reference_id, phone, language, status,
+                               next_attempt_at, created_at)
+    SELECT id, reference_id, phone, COALESCE(language_preference, 'en'), status, %s, %s
+    FROM cyber_reports
+    WHERE id = %s AND status = %s
+      AND COALESCE(anonymous, 'NO') <> 'YES' AND phone IS NOT NULL AND phone <> 'ANONYMOUS'
+    ON CONFLICT (report_id, status) DO NOTHING
+"""
+
+DUE_NOTIFICATIONS_SQL = """
+    SELECT id, report_id, reference_id, phone, language, status, attempts
+    FROM notifications
+    WHERE state = 'PENDING' AND next_attempt_at <= %s
+    ORDER BY next_attempt_at
+    LIMIT %s
+"""
+
+LEASE_NOTIFICATION_SQL = "UPDATE notifications SET next_attempt_at = %s WHERE id = %s"
+
+RECORD_NOTIFICATION_SQL = """
+    UPDATE notifications
+    SET state = %s, attempts = attempts + %s, next_attempt_at = %s,
+        last_error = COALESCE(%s, last_error), provider_sid = %s, sent_at = %s
+    WHERE id = %s
+"""
+
+NOTIFICATION_STATS_SQL = """
+    SELECT state, COUNT(*) as count, MIN(created_at) as oldest
+    FROM notifications
+    WHERE state <> 'SENT'
+    GROUP BY state
+"""
+
+# Analytics cube cells (cube.py); summed as double precision because a REAL
+# sum on Postgres keeps only about 7 significant digits
+CUBE_CELLS_TEMPLATE = """
+    SELECT location_state, fraud_medium, incident_type, status,
+           SUBSTR(created_at, 1, 7) as month, COUNT(*) as count,
+           SUM(CAST(amount_involved AS DOUBLE PRECISION)) as amount
+    FROM cyber_reports{where}
+    GROUP BY location_state, fraud_medium, incident_type, status, SUBSTR(created_at, 1, 7)
+"""
+
+ANALYTICS_TEMPLATES = {
+    "total": "SELECT COUNT(*) as count FROM cyber_reports{where}",
+    "status": """
+        SELECT status, COUNT(*) as count
+        FROM cyber_reports{where} GROUP BY status
+    """,
+    "fraud_medium": """
+        SELECT fraud_medium, COUNT(*) as count
+        FROM cyber_reports{where}
+        GROUP BY fraud_medium ORDER BY count DESC
+    """,
+    "amount": """
+        SELECT COALESCE(SUM(amount_involved), 0) as total
+        FROM cyber_reports{where}
+    """,
+    # STATE BREAKDOWN (Top 5)
+    "state": """
+        SELECT location_state, COUNT(*) as count
+        FROM cyber_reports
+        WHERE location_state IS NOT NULL{and_where}
+        GROUP BY location_state
+        ORDER BY count DESC
+        LIMIT 5
+    """,
+}
+
+ANALYTICS_SQL = {name: sql.format(where="", and_where="")
+                 for name, sql in ANALYTICS_TEMPLATES.items()}
+
+def qmark(sql):
+    return sql.replace("%s", "?")
+
+def created_at_range(date_from=None, date_to=None):
+    """Conditions and params for from <= created_at < to ('YYYY-MM-DD' strings).
+
+    Plain comparisons on created_at let Postgres prune monthly partitions.
+    """
+    conditions, params = [], []
+    if date_from:
+        conditions.append("created_at >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append("created_at < %s")
+        params.append(date_to)
+    return conditions, params
+
+def report_list_queries(page, per_page, date_from=None, date_to=None):
+    """[(sql, params)] for the report count and one page of reports"""
+    page_params = [per_page, (page - 1) * per_page]
+    conditions, params = created_at_range(date_from, date_to)
+    if not conditions:
+        return [(COUNT_REPORTS_SQL, ()), (LIST_REPORTS_SQL, tuple(page_params))]
+    where = " WHERE " + " AND ".join(conditions)
+    return [
+        (COUNT_REPORTS_TEMPLATE.format(where=where), tuple(params)),
+        (LIST_REPORTS_TEMPLATE.format(where=where), tuple(params + page_params)),
+    ]
+
+def analytics_queries(date_from=None, date_to=None):
+    """{name: (sql, params)} for the overview aggregates"""
+    conditions, params = created_at_range(date_from, date_to)
+    if not conditions:
+        return {name: (sql, ()) for name, sql in ANALYTICS_SQL.items()}
+    clause = " AND ".join(conditions)
+    return {
+        name: (sql.format(where=f" WHERE {clause}", and_where=f" AND {clause}"), tuple(params))
+        for name, sql in ANALYTICS_TEMPLATES.items()
+    }
+
+def cluster_query(min_size, limit, date_from=None, date_to=None):
+    """(sql, params) for clusters with at least min_size reports, largest first"""
+    conditions, params = created_at_range(date_from, date_to)
+    and_where = "".join(f" AND {condition}" for condition in conditions)
+    return CLUSTERS_TEMPLATE.format(and_where=and_where), tuple(params + [min_size, limit])
+
+def cube_cells_query(date_from=None, date_to=None):
+    """(sql, params) aggregating reports into cube cells"""
+    conditions, params = created_at_range(date_from, date_to)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return CUBE_CELLS_TEMPLATE.format(where=where), tuple(params)
+
+def report_insert_params(data, reference_id):
+    """Parameters for INSERT_REPORT_SQL from a finished conversation state"""
+    return (
+        data.get("phone", "ANONYMOUS"),
+        data.get("location_city"),
+        data.get("location_state"),
+        data.get("language", "en"),
+        data.get("fraud_medium"),
+        data.get("incident_type"),
+        data.get("description"),
+        data.get("suspect_phone"),
+        data.get("suspect_email"),
+        data.get("suspect_upi"),
+        data.get("suspect_other"),
+        data.get("amount", 0),
+        data.get("evidence_text"),
+        data.get("evidence_hash"),
+        json.dumps(data.get("media_files", [])),
+        data.get("similarity_signature"),
+        # A report without a near-duplicate starts its own cluster (dedup.py)
+        data.get("cluster_id") or reference_id,
+        data.get("anonymous", "NO"),
+        reference_id,
+        "NEW",
+        # Set by priority.assess(); MEDIUM when a report is saved without it
+        data.get("priority", "MEDIUM"),
+        data.get("priority_reason"),
+        1,
+        (datetime.now() + timedelta(days=365)).strftime("%Y-%m-%d"),
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    )
+
+def analytics_overview(results):
+    """Build the overview payload from the rows of each ANALYTICS_SQL query"""
+    return {
+        "total_reports": results["total"][0]['count'],
+        "status_breakdown": [dict(r) for r in results["status"]],
+        "fraud_medium_breakdown": [dict(r) for r in results["fraud_medium"]],
+        "state_breakdown": [dict(r) for r in results["state"]],
+        "daily_trend": [],
+        "total_amount_involved": float(results["amount"][0]['total'])
+    }
+
+# =============================================================================
+# POSTGRES
+# =============================================================================
+
+class PostgresRepository:
+    name = "postgres"
+
+    def __init__(self, connect, read_connect=None):
+        self.connect = connect
+        # Admin reads that may be served by a replica (replica.py)
+        self.read_connect = read_connect or connect
+
+    def release(self):
+        """Nothing to give back: every call closes its connection"""
+
+    def ping(self):
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute("SELECT 1")
+            c.fetchone()
+        finally:
+            conn.close()
+
+    def save_report(self, data):
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            reference_id = generate_reference_id()
+            c.execute(INSERT_REPORT_SQL, report_insert_params(data, reference_id))
+            c.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        return reference_id
+
+    def authenticate_admin(self, username, password_hash):
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute(ADMIN_LOGIN_SQL, (username, password_hash))
+            admin = c.fetchone()
+        finally:
+            conn.close()
+        return dict(admin) if admin else None
+
+    def list_reports(self, page, per_page, date_from=None, date_to=None):
+        (count_sql, count_params), (list_sql, list_params) = report_list_queries(
+            page, per_page, date_from, date_to)
+        conn = self.read_connect()
+        try:
+            c = conn.cursor()
+            c.execute(count_sql, count_params)
+            total = c.fetchone()['count']
+            c.execute(list_sql, list_params)
+            reports = [dict(r) for r in c.fetchall()]
+        finally:
+            conn.close()
+        return reports, total
+
+    def get_report(self, report_id):
+        """Returns (report, notes); report is None when it doesn't exist"""
+        conn = self.read_connect()
+        try:
+            c = conn.cursor()
+            c.execute(REPORT_BY_ID_SQL, (report_id,))
+            report = c.fetchone()
+            if not report:
+                return None, []
+            c.execute(REPORT_NOTES_SQL, (report_id,))
+            notes = [dict(n) for n in c.fetchall()]
+            report = dict(report)
+            c.execute(CLUSTER_SIZE_SQL, (report_id,))
+            report["cluster_size"] = c.fetchone()['count']
+        finally:
+            conn.close()
+        return report, notes
+
+    def report_status(self, reference_id):
+        """Status row for a citizen's reference ID, or None"""
+        query = report_status_query(reference_id)
+        if query is None:
+            return None
+        rows = self._fetch_all(*query)
+        return rows[0] if rows else None
+
+    def update_status(self, report_id, status, priority=None):
+        """Returns False when the report doesn't exist"""
+        updates = ["status = %s", "updated_at = NOW()"]
+        params = [status]
+
+        if priority:
+            # Hand-set priorities are kept by priority.py rescore
+            updates.append("priority = %s, priority_reason = 'manual'")
+            params.append(priority)
+
+        if status == "RESOLVED":
+            updates.append("resolved_at = NOW()")
+
+        params.append(report_id)
+
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute(f"UPDATE cyber_reports SET {', '.join(updates)} WHERE id = %s", params)
+            found = c.rowcount > 0
+            conn.commit()
+        finally:
+            conn.close()
+        return found
+
+    def analytics(self, date_from=None, date_to=None):
+        conn = self.read_connect()
+        try:
+            c = conn.cursor()
+            results = {}
+            for name, (sql, params) in analytics_queries(date_from, date_to).items():
+                c.execute(sql, params)
+                results[name] = c.fetchall()
+        finally:
+            conn.close()
+        return analytics_overview(results)
+
+    def cube_cells(self, date_from=None, date_to=None):
+        return self._fetch_all(*cube_cells_query(date_from, date_to))
+
+    def _fetch_all(self, sql, params, connect=None):
+        conn = (connect or self.connect)()
+        try:
+            c = conn.cursor()
+            c.execute(sql, params)
+            rows = [dict(r) for r in c.fetchall()]
+        finally:
+            conn.close()
+        return rows
+
+    # -- near-duplicate clusters (dedup.py) ------------------------------------
+
+    def recent_signatures(self, limit):
+        """Newest signed reports first"""
+        return self._fetch_all(RECENT_SIGNATURES_SQL, (limit,))
+
+    def signatures_since(self, since):
+        return self._fetch_all(SIGNATURES_SINCE_SQL, (since,))
+
+    def clusters(self, min_size, limit, date_from=None, date_to=None):
+        return self._fetch_all(*cluster_query(min_size, limit, date_from, date_to),
+                               connect=self.read_connect)
+
+    def cluster_reports(self, cluster_id, limit):
+        return self._fetch_all(CLUSTER_REPORTS_SQL, (cluster_id, limit), connect=self.read_connect)
+
+    def unsigned_reports(self, after_id, limit):
+        return self._fetch_all(UNSIGNED_REPORTS_SQL, (after_id, limit))
+
+    def set_clusters(self, updates):
+        """Store [(similarity_signature, cluster_id, report id)]"""
+        conn = self.connect()
+        try:
+            conn.cursor().executemany(SET_CLUSTER_SQL, updates)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # -- priority (priority.py) ------------------------------------------------
+
+    def signal_counts(self, queries):
+        """Run {name: (count sql, params)} and return {name: count}"""
+        if not queries:
+            return {}
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            counts = {}
+            for name, (sql, params) in queries.items():
+                c.execute(sql, params)
+                counts[name] = c.fetchone()['count']
+        finally:
+            conn.close()
+        return counts
+
+    def triage(self, levels, status, limit):
+        """Oldest reports with `status`, highest priority level first"""
+        conn = self.read_connect()
+        try:
+            c = conn.cursor()
+            reports = []
+            for level in levels:
+                if len(reports) >= limit:
+                    break
+                c.execute(TRIAGE_SQL, (level, status, limit - len(reports)))
+                reports.extend(dict(r) for r in c.fetchall())
+        finally:
+            conn.close()
+        return reports
+
+    def scoring_rows(self, columns, after_id, limit):
+        return self._fetch_all(SCORING_ROWS_TEMPLATE.format(columns=", ".join(columns)),
+                               (after_id, limit))
+
+    def set_priorities(self, updates):
+        """Store [(priority, priority_reason, report id)] with one live feed reset"""
+        from psycopg2.extras import execute_values
+
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute("SET LOCAL i4c.live_feed = 'off'")
+            execute_values(c, SET_PRIORITIES_SQL, updates, page_size=1000)
+            c.execute("SELECT pg_notify(%s, %s)",
+                      (live_feed.NOTIFY_CHANNEL, json.dumps({"type": "reset", "data": {}})))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # -- analyst work queue ----------------------------------------------------
+
+    def claim_next(self, levels, analyst):
+        """Assign the oldest open report of the highest priority level to
+        analyst for CLAIM_LEASE; returns the report or None.
+
+        SKIP LOCKED passes over rows another analyst is claiming right now,
+        so concurrent claims each get a different report without waiting.
+        """
+        now, expires = claim_times()
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            candidate = None
+            for level in levels:
+                c.execute(CLAIM_CANDIDATE_SQL + "    FOR UPDATE SKIP LOCKED\n", (level, now))
+                candidate = c.fetchone()
+                if candidate:
+                    break
+            if not candidate:
+                conn.rollback()
+                CLAIMS.inc("empty")
+                return None
+            # created_at in the WHERE prunes the UPDATE to one partition
+            c.execute(CLAIM_SQL + "    RETURNING *\n",
+                      (analyst, expires, now, candidate['id'], candidate['created_at']))
+            report = dict(c.fetchone())
+            conn.commit()
+        finally:
+            conn.close()
+        CLAIMS.inc("reclaimed" if candidate['assigned_to'] else "claimed")
+        return report
+
+    def renew_claim(self, report_id, analyst):
+        """Extend analyst's lease; returns the new expiry, or None when the
+        report isn't claimed by them (released, or reclaimed after expiry)"""
+        _, expires = claim_times()
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute(RENEW_CLAIM_SQL, (expires, report_id, analyst))
+            found = c.rowcount > 0
+            conn.commit()
+        finally:
+            conn.close()
+        return expires if found else None
+
+    def release_claim(self, report_id, analyst):
+        """Put a claimed report back in the queue; False when not claimed by analyst"""
+        now, _ = claim_times()
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute(RELEASE_CLAIM_SQL, (now, report_id, analyst))
+            found = c.rowcount > 0
+            conn.commit()
+        finally:
+            conn.close()
+        return found
+
+    def queue_stats(self):
+        now, _ = claim_times()
+        return self._fetch_all(QUEUE_STATS_SQL, (now, now))
+
+    # -- outbound notifications (notifications.py) -----------------------------
+
+    def queue_notification(self, report_id, status, now):
+        """Queue the citizen's notification of the report reaching status;
+        False when it's anonymous, has moved on, or was already queued"""
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute(QUEUE_NOTIFICATION_SQL, (now, now, report_id, status))
+            queued = c.rowcount > 0
+            conn.commit()
+        finally:
+            conn.close()
+        return queued
+
+    def claim_notifications(self, limit, now, lease_until):
+        """Due notifications, held by this sender until lease_until.
+
+        SKIP LOCKED passes over rows another worker's sender is claiming, so
+        each batch goes out from one process.
+        """
+        from psycopg2.extras import execute_batch
+
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute(DUE_NOTIFICATIONS_SQL + "    FOR UPDATE SKIP LOCKED\n", (now, limit))
+            rows = [dict(r) for r in c.fetchall()]
+            execute_batch(c, LEASE_NOTIFICATION_SQL, [(lease_until, r['id']) for r in rows])
+            conn.commit()
+        finally:
+            conn.close()
+        return rows
+
+    def record_notifications(self, results):
+        """Store [(state, attempts added, next_attempt_at, last_error,
+        provider_sid, sent_at, notification id)]"""
+        from psycopg2.extras import execute_batch
+
+        conn = self.connect()
+        try:
+            execute_batch(conn.cursor(), RECORD_NOTIFICATION_SQL, results)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def notification_stats(self):
+        return self._fetch_all(NOTIFICATION_STATS_SQL, ())
+
+# =============================================================================
+# SQLITE
+# =============================================================================
+
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # durable across app crashes; fsync at checkpoints
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",   # 16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",
+]
+# Connections kept open between requests for the next request's thread
+SQLITE_IDLE_CONNECTIONS = int(os.getenv("SQLITE_IDLE_CONNECTIONS", "8"))
+
+class SQLiteRepository:
+    """Embedded backend.
+
+    A thread holds one connection, whose statement cache holds the compiled
+    form of every constant SQL string below, until release() hands it back
+    at the end of a request; up to SQLITE_IDLE_CONNECTIONS wait for the
+    next thread and the rest are closed. Report inserts go
+    through one writer thread that commits everything queued since its last
+    commit in a single transaction (group commit).
+    """
+    name = "sqlite"
+
+    def __init__(self, path, max_batch=256):
+        self.path = path
+        self.max_batch = max_batch
+        self._local = threading.local()
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+        self._insert_sql = qmark(REPORT_COLUMNS_SQL)
+        self._by_id_sql = qmark(REPORT_BY_ID_SQL)
+        self._event_sql = qmark(REPORT_EVENT_SQL)
+        self._notes_sql = qmark(REPORT_NOTES_SQL)
+        self._login_sql = qmark(ADMIN_LOGIN_SQL)
+        self._migrate()
+
+    def _migrate(self):
+        """Bring an older database file (such as a checkout's cyber_reports.db)
+        up to the current schema; every statement is a no-op once it is"""
+        import db_init
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                db_init.create_schema(conn.cursor(), sqlite=True)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # isolation_level=None: autocommit, transactions are opened explicitly
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        metrics.DB_CONNECTIONS_OPENED.inc()
+        metrics.DB_CONNECTIONS_OPEN.inc()
+        return conn
+
+    def _close(self, conn):
+        conn.close()
+        metrics.DB_CONNECTIONS_OPEN.dec()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._idle_lock:
+                conn = self._idle.pop() if self._idle else None
+            conn = self._local.conn = conn or self._connect()
+        return conn
+
+    def release(self):
+        """Give back this thread's connection (call when a request ends)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            self._close(conn)
+            return
+        with self._idle_lock:
+            if len(self._idle) < SQLITE_IDLE_CONNECTIONS:
+                self._idle.append(conn)
+                return
+        self._close(conn)
+
+    def _execute(self, conn, sql, params=()):
+        started = time.perf_counter()
+        cur = conn.execute(sql, params)
+        elapsed = time.perf_counter() - started
+        statement = metrics.normalize_sql(sql)
+        metrics.QUERY_LATENCY.observe(elapsed, statement)
+        metrics.QUERY_ROWS.observe(max(cur.rowcount, 0), statement)
+        if slowlog.enabled and elapsed * 1000 >= slowlog.threshold_ms:
+            slowlog.record(sql, params, elapsed * 1000)
+        return cur
+
+    def ping(self):
+        self._execute(self._conn(), "SELECT 1").fetchone()
+        return {"pending_writes": self._writes.qsize()}
+
+    # -- batched writes --------------------------------------------------------
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop,
+                                                name="sqlite-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(conn, batch)
+
+    def _flush(self, conn, batch):
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(self._insert_sql, [item["params"] for item in batch])
+            # One writer and AUTOINCREMENT: the batch got consecutive ids
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            conn.execute("COMMIT")
+            for i, item in enumerate(batch):
+                item["id"] = last_id - len(batch) + 1 + i
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Retry row by row so one bad report doesn't fail the whole batch
+            for item in batch:
+                try:
+                    item["id"] = conn.execute(self._insert_sql, item["params"]).lastrowid
+                except sqlite3.Error as e:
+                    item["error"] = e
+        statement = metrics.normalize_sql(self._insert_sql)
+        metrics.QUERY_LATENCY.observe(time.perf_counter() - started, statement)
+        metrics.QUERY_ROWS.observe(len(batch), statement)
+        for item in batch:
+            item["done"].set()
+
+    def save_report(self, data):
+        reference_id = generate_reference_id()
+        item = {
+            "params": report_insert_params(data, reference_id),
+            "done": threading.Event(),
+            "id": None,
+            "error": None,
+        }
+        self._ensure_writer()
+        self._writes.put(item)
+        # Only confirm to the citizen once the report is committed
+        item["done"].wait()
+        if item["error"] is not None:
+            raise item["error"]
+        row = dict(zip(REPORT_INSERT_COLUMNS, item["params"]), id=item["id"])
+        live_feed.publish("report_created", live_feed.report_event(row))
+        return reference_id
+
+    # -- reads and updates -----------------------------------------------------
+
+    def authenticate_admin(self, username, password_hash):
+        row = self._execute(self._conn(), self._login_sql, (username, password_hash)).fetchone()
+        return dict(row) if row else None
+
+    def list_reports(self, page, per_page, date_from=None, date_to=None):
+        (count_sql, count_params), (list_sql, list_params) = report_list_queries(
+            page, per_page, date_from, date_to)
+        conn = self._conn()
+        total = self._execute(conn, qmark(count_sql), count_params).fetchone()['count']
+        rows = self._execute(conn, qmark(list_sql), list_params).fetchall()
+        return [dict(r) for r in rows], total
+
+    def get_report(self, report_id):
+        conn = self._conn()
+        report = self._execute(conn, self._by_id_sql, (report_id,)).fetchone()
+        if not report:
+            return None, []
+        notes = self._execute(conn, self._notes_sql, (report_id,)).fetchall()
+        report = dict(report)
+        report["cluster_size"] = self._execute(
+            conn, qmark(CLUSTER_SIZE_SQL), (report_id,)).fetchone()['count']
+        return report, [dict(n) for n in notes]
+
+    def report_status(self, reference_id):
+        query = report_status_query(reference_id)
+        if query is None:
+            return None
+        rows = self._fetch_all(*query)
+        return rows[0] if rows else None
+
+    def update_status(self, report_id, status, priority=None):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        updates = ["status = ?", "updated_at = ?"]
+        params = [status, now]
+
+        if priority:
+            updates.append("priority = ?, priority_reason = 'manual'")
+            params.append(priority)
+
+        if status == "RESOLVED":
+            updates.append("resolved_at = ?")
+            params.append(now)
+
+        params.append(report_id)
+        conn = self._conn()
+        cur = self._execute(conn, f"UPDATE cyber_reports SET {', '.join(updates)} WHERE id = ?", params)
+        if cur.rowcount == 0:
+            return False
+        row = self._execute(conn, self._event_sql, (report_id,)).fetchone()
+        live_feed.publish("report_updated", dict(row))
+        return True
+
+    def analytics(self, date_from=None, date_to=None):
+        conn = self._conn()
+        results = {
+            name: self._execute(conn, qmark(sql), params).fetchall()
+            for name, (sql, params) in analytics_queries(date_from, date_to).items()
+        }
+        return analytics_overview(results)
+
+    def cube_cells(self, date_from=None, date_to=None):
+        return self._fetch_all(*cube_cells_query(date_from, date_to))
+
+    # -- near-duplicate clusters (dedup.py) ------------------------------------
+
+    def _fetch_all(self, sql, params):
+        return [dict(r) for r in self._execute(self._conn(), qmark(sql), params).fetchall()]
+
+    def recent_signatures(self, limit):
+        """Newest signed reports first"""
+        return self._fetch_all(RECENT_SIGNATURES_SQL, (limit,))
+
+    def signatures_since(self, since):
+        return self._fetch_all(SIGNATURES_SINCE_SQL, (since,))
+
+    def clusters(self, min_size, limit, date_from=None, date_to=None):
+        return self._fetch_all(*cluster_query(min_size, limit, date_from, date_to))
+
+    def cluster_reports(self, cluster_id, limit):
+        return self._fetch_all(CLUSTER_REPORTS_SQL, (cluster_id, limit))
+
+    def unsigned_reports(self, after_id, limit):
+        return self._fetch_all(UNSIGNED_REPORTS_SQL, (after_id, limit))
+
+    def set_clusters(self, updates):
+        """Store [(similarity_signature, cluster_id, report id)]"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(qmark(SET_CLUSTER_SQL), updates)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    # -- priority (priority.py) ------------------------------------------------
+
+    def signal_counts(self, queries):
+        conn = self._conn()
+        return {name: self._execute(conn, qmark(sql), params).fetchone()['count']
+                for name, (sql, params) in queries.items()}
+
+    def triage(self, levels, status, limit):
+        conn = self._conn()
+        reports = []
+        for level in levels:
+            if len(reports) >= limit:
+                break
+            rows = self._execute(conn, qmark(TRIAGE_SQL), (level, status, limit - len(reports)))
+            reports.extend(dict(r) for r in rows.fetchall())
+        return reports
+
+    def scoring_rows(self, columns, after_id, limit):
+        return self._fetch_all(SCORING_ROWS_TEMPLATE.format(columns=", ".join(columns)),
+                               (after_id, limit))
+
+    def set_priorities(self, updates):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(qmark(SET_PRIORITY_SQL), updates)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        live_feed.publish("reset", {})
+
+    # -- analyst work queue ----------------------------------------------------
+
+    def claim_next(self, levels, analyst):
+        # BEGIN IMMEDIATE takes the write lock up front: claims run one at a
+        # time, so two analysts can't both pick the same report
+        now, expires = claim_times()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            candidate = None
+            for level in levels:
+                candidate = self._execute(conn, qmark(CLAIM_CANDIDATE_SQL), (level, now)).fetchone()
+                if candidate:
+                    break
+            if candidate:
+                self._execute(conn, qmark(CLAIM_SQL),
+                              (analyst, expires, now, candidate['id'], candidate['created_at']))
+                report = dict(self._execute(conn, self._by_id_sql, (candidate['id'],)).fetchone())
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        if not candidate:
+            CLAIMS.inc("empty")
+            return None
+        CLAIMS.inc("reclaimed" if candidate['assigned_to'] else "claimed")
+        live_feed.publish("report_updated", live_feed.report_event(report))
+        return report
+
+    def renew_claim(self, report_id, analyst):
+        _, expires = claim_times()
+        cur = self._execute(self._conn(), qmark(RENEW_CLAIM_SQL), (expires, report_id, analyst))
+        return expires if cur.rowcount > 0 else None
+
+    def release_claim(self, report_id, analyst):
+        now, _ = claim_times()
+        conn = self._conn()
+        cur = self._execute(conn, qmark(RELEASE_CLAIM_SQL), (now, report_id, analyst))
+        if cur.rowcount == 0:
+            return False
+        row = self._execute(conn, self._event_sql, (report_id,)).fetchone()
+        live_feed.publish("report_updated", dict(row))
+        return True
+
+    def queue_stats(self):
+        now, _ = claim_times()
+        return self._fetch_all(QUEUE_STATS_SQL, (now, now))
+
+    # -- outbound notifications (notifications.py) -----------------------------
+
+    def queue_notification(self, report_id, status, now):
+        cur = self._execute(self._conn(), qmark(QUEUE_NOTIFICATION_SQL), (now, now, report_id, status))
+        return cur.rowcount > 0
+
+    def claim_notifications(self, limit, now, lease_until):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [dict(r) for r in
+                    self._execute(conn, qmark(DUE_NOTIFICATIONS_SQL), (now, limit)).fetchall()]
+            conn.executemany(qmark(LEASE_NOTIFICATION_SQL), [(lease_until, r['id']) for r in rows])
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def record_notifications(self, results):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(qmark(RECORD_NOTIFICATION_SQL), results)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def notification_stats(self):
+        return self._fetch_all(NOTIFICATION_STATS_SQL, ())
+
+# =============================================================================
+# FACTORY
+# =============================================================================
+
+def create_repository(pg_connect, pg_read_connect=None):
+    """Pick the backend from STORAGE_BACKEND / DATABASE_URL / DATABASE_PATH"""
+    backend = os.getenv("STORAGE_BACKEND")
+    if not backend:
+        backend = "postgres" if os.getenv("DATABASE_URL") else "sqlite"
+
+    if backend == "postgres":
+        return PostgresRepository(pg_connect, pg_read_connect)
+    if backend == "sqlite":
+        from config import Config
+        return SQLiteRepository(os.getenv("DATABASE_PATH", Config.DATABASE_PATH))
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app picks its backend at import: point it at a scratch SQLite database
+# and keep the notification sender from starting
+_DB_DIR = tempfile.mkdtemp(prefix="i4c-tests-")
+os.environ.pop("DATABASE_URL", None)
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["DATABASE_PATH"] = os.path.join(_DB_DIR, "app.db")
+os.environ["NOTIFY_SENDER"] = "0"
+os.environ.pop("TWILIO_ACCOUNT_SID", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_init  # noqa: E402
+
+db_init.init_sqlite_database(os.environ["DATABASE_PATH"])
+
+
+@pytest.fixture
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def admin(app_module):
+    """Test client logged in as an admin"""
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess["admin_id"] = 1
+        sess["admin_username"] = "analyst"
+    return client
+
+
+def new_report(repository, **fields):
+    data = {"fraud_medium": "UPI", "incident_type": "Fraud",
+            "description": "Caller asked for an OTP to unblock my card", "phone": "whatsapp:+910000000001"}
+    data.update(fields)
+    reference_id = repository.save_report(data)
+    return repository.report_status(reference_id)["id"]
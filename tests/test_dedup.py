@@ -0,0 +1,28 @@
+import dedup
+
+
+def test_email_domain_is_not_a_site():
+    found = dedup.identifiers("Mail came from refunds.desk@gmail.com, pay at www.sbi-kyc-update.com")
+    assert "id:refunds.desk@gmail.com" in found
+    assert "site:sbi-kyc-update.com" in found
+    assert "site:gmail.com" not in found
+
+
+def test_unrelated_reports_with_gmail_addresses_share_no_identifier():
+    a = dedup.shingles("Caller offered a work from home job and asked for a deposit, "
+                       "contact was hr.jobs2024@gmail.com")
+    b = dedup.shingles("My electricity bill SMS said the connection would be cut tonight, "
+                       "it asked me to write to power.dept.help@gmail.com")
+    assert not {f for f in a & b if ":" in f}
+    sig_a, sig_b = dedup.signature(a), dedup.signature(b)
+    assert dedup.similarity(sig_a, sig_b) < dedup.SIMILARITY_THRESHOLD
+    assert not set(dedup.LSHIndex._band_keys(sig_a)) & set(dedup.LSHIndex._band_keys(sig_b))
+
+
+def test_link_latency_counts_skipped_reports():
+    def observed():
+        return sum(sum(series[:-1]) for series in dedup.LINK_LATENCY.series().values())
+
+    before = observed()
+    assert dedup.link({"fraud_medium": "UPI"}) is None
+    assert observed() == before + 1
@@ -0,0 +1,119 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import db_init
+import notifications
+import storage
+from conftest import new_report
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def test_rate_limited_row_keeps_its_attempts():
+    row = {"id": 7, "attempts": notifications.MAX_ATTEMPTS - 1}
+    state, added, retry_at, error, _, _, _ = notifications._result(row, "rate_limited", "HTTP 429", 30, NOW)
+    assert (state, added, retry_at, error) == ("PENDING", 0, "2026-01-01 12:00:30", "HTTP 429")
+
+
+def test_last_server_error_fails_the_row():
+    row = {"id": 7, "attempts": notifications.MAX_ATTEMPTS - 1}
+    assert notifications._result(row, "retry", "HTTP 503", 30, NOW)[:2] == ("FAILED", 1)
+
+
+# =============================================================================
+# SENDING
+# =============================================================================
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body or {}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+
+class FakeTwilio:
+    """Stands in for the requests.Session: answers each POST with the next response"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, timeout=None, data=None):
+        self.posts.append(data)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    path = str(tmp_path / "reports.db")
+    db_init.init_sqlite_database(path)
+    monkeypatch.setattr(notifications.Config, "TWILIO_ACCOUNT_SID", "AC00000000")
+    monkeypatch.setattr(notifications.Config, "TWILIO_AUTH_TOKEN", "secret")
+    monkeypatch.setattr(notifications, "_paused_until", 0.0)
+    # Retries come due at once so the next batch picks them up
+    monkeypatch.setattr(notifications, "backoff", lambda attempts: 0)
+    return storage.SQLiteRepository(path)
+
+
+def queue_resolved(repository, count=1):
+    for _ in range(count):
+        report_id = new_report(repository)
+        repository.update_status(report_id, "RESOLVED")
+        assert notifications.queue(repository, report_id, "RESOLVED")
+
+
+def send(monkeypatch, repository, twilio):
+    monkeypatch.setattr(notifications, "_client", lambda: (twilio, SimpleNamespace(map=map)))
+    return notifications.send_batch(repository)
+
+
+def rows(repository):
+    return [dict(r) for r in repository._conn().execute(
+        "SELECT state, attempts, provider_sid FROM notifications ORDER BY id")]
+
+
+def test_server_errors_retry_until_sent(monkeypatch, repository):
+    queue_resolved(repository)
+    twilio = FakeTwilio(FakeResponse(503, {"code": 20500, "message": "down"}),
+                        FakeResponse(201, {"sid": "SM1"}))
+    assert send(monkeypatch, repository, twilio) == 1
+    assert rows(repository) == [{"state": "PENDING", "attempts": 1, "provider_sid": None}]
+    assert send(monkeypatch, repository, twilio) == 1
+    assert rows(repository) == [{"state": "SENT", "attempts": 2, "provider_sid": "SM1"}]
+    assert twilio.posts[0]["To"] == "whatsapp:+910000000001"
+
+
+def test_server_errors_give_up_after_max_attempts(monkeypatch, repository):
+    queue_resolved(repository)
+    twilio = FakeTwilio(*[FakeResponse(500)] * notifications.MAX_ATTEMPTS)
+    for _ in range(notifications.MAX_ATTEMPTS):
+        send(monkeypatch, repository, twilio)
+    assert rows(repository)[0]["state"] == "FAILED"
+    assert send(monkeypatch, repository, twilio) == 0
+
+
+def test_client_error_fails_at_once(monkeypatch, repository):
+    queue_resolved(repository)
+    send(monkeypatch, repository, FakeTwilio(FakeResponse(400, {"code": 21211, "message": "bad To"})))
+    assert rows(repository) == [{"state": "FAILED", "attempts": 1, "provider_sid": None}]
+
+
+def test_429_pauses_the_batch_without_using_attempts(monkeypatch, repository):
+    queue_resolved(repository, count=3)
+    twilio = FakeTwilio(FakeResponse(429, {"code": 20429, "message": "Too Many Requests"},
+                                     {"Retry-After": "30"}))
+    assert send(monkeypatch, repository, twilio) == 3
+
+    # The rest of the batch waited out the pause instead of posting
+    assert len(twilio.posts) == 1
+    assert [r["attempts"] for r in rows(repository)] == [0, 0, 0]
+    assert {r["state"] for r in rows(repository)} == {"PENDING"}
+    assert 29 < notifications._paused_until - notifications.time.monotonic() <= 30
+    # ...and aren't due again until it's over
+    assert send(monkeypatch, repository, twilio) == 0
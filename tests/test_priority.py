@@ -0,0 +1,46 @@
+import pytest
+
+import config
+import db_init
+import priority
+import storage
+
+
+@pytest.fixture
+def repository(tmp_path):
+    path = str(tmp_path / "reports.db")
+    db_init.init_sqlite_database(path)
+    return storage.SQLiteRepository(path)
+
+
+def test_rules_are_the_configured_ones():
+    assert sorted(r.name for r in priority.rules.rules) == sorted(r["name"] for r in config.PRIORITY_RULES)
+
+
+def test_only_the_highest_amount_rule_counts(repository):
+    data = {"amount": 1500000, "fraud_medium": "UPI/Digital Payment",
+            "incident_type": "Online Financial Fraud"}
+    assert priority.assess(data, repository) == "CRITICAL"
+    assert data["priority_reason"] == "amount_10_lakh+financial_fraud+payment_medium"
+
+
+@pytest.mark.parametrize("amount, expected", [
+    (0, "LOW"), (500, "LOW"), (10000, "MEDIUM"), (100000, "HIGH"), ("not a number", "LOW"),
+])
+def test_amount_levels(repository, amount, expected):
+    assert priority.assess({"amount": amount, "fraud_medium": "Social Media"}, repository) == expected
+
+
+def test_suspect_seen_in_earlier_reports(repository):
+    data = {"suspect_phone": "9876543210", "fraud_medium": "Social Media", "incident_type": "Other"}
+    assert priority.assess(dict(data), repository) == "LOW"
+    repository.save_report(dict(data))
+    first = dict(data)
+    assert priority.assess(first, repository) == "MEDIUM"
+    assert first["priority_reason"] == "known_suspect"
+
+    for _ in range(4):
+        repository.save_report(dict(data))
+    repeat = dict(data)
+    priority.assess(repeat, repository)
+    assert repeat["priority_reason"] == "repeat_suspect"
@@ -0,0 +1,25 @@
+import live_feed
+import replica
+
+
+def test_change_holds_reads_only_until_the_replica_replays_it(monkeypatch):
+    monkeypatch.setattr(replica, "REPLICA_URL", "postgresql://replica/fresh")
+    monkeypatch.setattr(replica, "_lag", 0.0)
+    monkeypatch.setattr(replica, "_error", None)
+    monkeypatch.setattr(replica, "_write_lsn", 0)
+    monkeypatch.setattr(replica, "_write_until", 0.0)
+    monkeypatch.setattr(replica, "_primary_until", 0.0)
+    monkeypatch.setattr(replica, "_replayed_lsn", live_feed.parse_lsn("0/1000"))
+    monkeypatch.setattr(live_feed, "primary_lsn", live_feed.parse_lsn("0/2000"))
+    assert replica.use_replica()
+
+    replica.note_write("report_created", {})
+    assert not replica.use_replica()
+
+    monkeypatch.setattr(replica, "_replayed_lsn", live_feed.parse_lsn("0/2000"))
+    assert replica.use_replica()
+    assert replica._primary_until < replica.time.monotonic()
+
+
+def test_parse_lsn_orders_positions():
+    assert live_feed.parse_lsn("1/0") > live_feed.parse_lsn("0/FFFFFFFF")
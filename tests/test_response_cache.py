@@ -0,0 +1,34 @@
+from conftest import new_report
+
+
+def test_status_change_moves_report_onto_cached_triage_page(app_module, admin):
+    report_id = new_report(app_module.repository)
+    escalated = admin.get("/api/admin/triage?status=ESCALATED").get_json()
+    assert report_id not in [r["id"] for r in escalated["reports"]]
+
+    assert admin.put(f"/api/admin/reports/{report_id}/status", json={"status": "ESCALATED"}).status_code == 200
+
+    escalated = admin.get("/api/admin/triage?status=ESCALATED").get_json()
+    assert report_id in [r["id"] for r in escalated["reports"]]
+    new = admin.get("/api/admin/triage?status=NEW").get_json()
+    assert report_id not in [r["id"] for r in new["reports"]]
+
+
+def test_status_change_refreshes_cluster_new_count(app_module, admin):
+    report_id = new_report(app_module.repository)
+
+    def new_count():
+        clusters = admin.get("/api/admin/clusters?min_size=1&limit=500").get_json()["clusters"]
+        report = admin.get(f"/api/admin/reports/{report_id}").get_json()["report"]
+        return next(c["new_count"] for c in clusters if c["cluster_id"] == report["cluster_id"])
+
+    assert new_count() == 1
+    admin.put(f"/api/admin/reports/{report_id}/status", json={"status": "RESOLVED"})
+    assert new_count() == 0
+
+
+def test_status_change_invalidates_report_detail(app_module, admin):
+    report_id = new_report(app_module.repository)
+    assert admin.get(f"/api/admin/reports/{report_id}").get_json()["report"]["status"] == "NEW"
+    admin.put(f"/api/admin/reports/{report_id}/status", json={"status": "IN_PROGRESS"})
+    assert admin.get(f"/api/admin/reports/{report_id}").get_json()["report"]["status"] == "IN_PROGRESS"
@@ -0,0 +1,11 @@
+import metrics
+
+
+def test_requests_give_back_their_sqlite_connection(app_module, admin):
+    admin.get("/api/admin/reports")
+    baseline = metrics.DB_CONNECTIONS_OPEN.value()
+    for page in range(1, 21):
+        # A new page each time so the response cache doesn't answer
+        assert admin.get(f"/api/admin/reports?page={page}").status_code == 200
+    assert metrics.DB_CONNECTIONS_OPEN.value() == baseline
+    assert getattr(app_module.repository._local, "conn", None) is None
@@ -0,0 +1,39 @@
+import pytest
+
+from state_matcher import match_state
+
+
+@pytest.mark.parametrize("reply, state", [
+    ("maharashtra", "Maharashtra"),
+    ("MH", "Maharashtra"),
+    ("J & K", "Jammu and Kashmir"),
+    ("मध्य प्रदेश", "Madhya Pradesh"),
+    ("Jharkand", "Jharkhand"),
+    ("utar pradesh", "Uttar Pradesh"),
+    ("Himachal", "Himachal Pradesh"),
+])
+def test_reply_resolves_to_one_state(reply, state):
+    assert match_state(reply) == (state, [])
+
+
+def test_shared_word_asks_which_state():
+    state, candidates = match_state("Pradesh")
+    assert state is None
+    assert len(candidates) == 3
+    assert all(c.endswith("Pradesh") for c in candidates)
+    assert len(match_state("Pradesh", limit=2)[1]) == 2
+
+
+def test_prefix_of_two_states_is_not_picked():
+    state, candidates = match_state("uttar")
+    assert state is None
+    assert set(candidates) == {"Uttarakhand", "Uttar Pradesh"}
+
+
+def test_short_prefix_is_only_a_suggestion():
+    assert match_state("Guj") == (None, ["Gujarat"])
+
+
+@pytest.mark.parametrize("reply", ["xyz hello", "", "!!!"])
+def test_unrelated_reply_matches_nothing(reply):
+    assert match_state(reply) == (None, [])
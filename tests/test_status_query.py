@@ -0,0 +1,33 @@
+import conversation
+import db_init
+import storage
+
+
+def test_legacy_reference_id_is_a_status_query():
+    assert conversation.status_query("status I4C-20250101093000") == ("I4C-20250101093000", None)
+    assert conversation.status_query("स्थिति: i4c-20250101093000-1a2b3c") == ("I4C-20250101093000-1A2B3C", "hi")
+    assert conversation.status_query("status I4C-2025010109300") is None
+
+
+def test_legacy_reference_id_created_range():
+    assert conversation.reference_created_range("I4C-20250101093000") == \
+        ("2024-12-31 09:30:00", "2025-01-02 09:30:00")
+
+
+def test_legacy_reference_id_lookup_leaves_conversation_alone(tmp_path):
+    path = str(tmp_path / "reports.db")
+    db_init.init_sqlite_database(path)
+    repository = storage.SQLiteRepository(path)
+    reference_id = repository.save_report({"fraud_medium": "UPI", "incident_type": "Fraud"})
+    conn = repository._conn()
+    conn.execute("UPDATE cyber_reports SET reference_id = 'I4C-20250101093000', "
+                 "created_at = '2025-01-01 09:30:00' WHERE reference_id = ?", (reference_id,))
+
+    phone = "whatsapp:+910000000001"
+    conversation.user_state[phone] = {"language": "en", "step": "fraud_medium"}
+    reply = conversation.process_message(phone, "status I4C-20250101093000",
+                                         save_report=None, lookup_status=repository.report_status)
+
+    assert "I4C-20250101093000" in reply
+    assert conversation.STATUS_NAMES["en"]["NEW"] in reply
+    assert conversation.user_state[phone]["step"] == "fraud_medium"
@@ -0,0 +1,40 @@
+import threading
+
+import db_init
+import storage
+from conftest import new_report
+
+LEVELS = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+
+
+def test_concurrent_claims_never_share_a_report(tmp_path):
+    path = str(tmp_path / "reports.db")
+    db_init.init_sqlite_database(path)
+    repository = storage.SQLiteRepository(path)
+    report_ids = {new_report(repository, priority=LEVELS[i % 4]) for i in range(40)}
+
+    claims = {}
+    start = threading.Barrier(8)
+
+    def analyst(name):
+        start.wait()
+        mine = claims[name] = []
+        while True:
+            report = repository.claim_next(LEVELS, name)
+            if report is None:
+                return
+            assert report["assigned_to"] == name
+            mine.append(report["id"])
+
+    threads = [threading.Thread(target=analyst, args=(f"analyst{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    claimed = [report_id for mine in claims.values() for report_id in mine]
+    assert len(claimed) == len(set(claimed))
+    assert set(claimed) == report_ids
+    rows = repository._conn().execute("SELECT id, assigned_to FROM cyber_reports").fetchall()
+    owner = {report_id: name for name, mine in claims.items() for report_id in mine}
+    assert {row["id"]: row["assigned_to"] for row in rows} == owner